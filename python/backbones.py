@@ -0,0 +1,109 @@
+"""
+Registry of vision backbones (image encoders) for training and classification.
+
+Every backbone is a CLIP-architecture model loadable as a
+CLIPVisionModelWithProjection, so preprocessing, the embedding cache, the
+ONNX export and the logistic head work the same for all of them; only
+speed, embedding dimension and accuracy differ. Prepare local weights with
+`prepare_model.py --backbone NAME` and compare them on the training set
+with `benchmark_backbones.py`.
+
+train_classifier.py records the backbone in the classifier metadata and
+exported head, and classify_images.py always embeds with the backbone the
+classifier was trained on.
+
+Stand-in backbones (random-clip-*) have the CLIP vision architecture with
+seeded random weights instead of a hub checkpoint. They are created locally
+on first use (see vision_bundle.load_clip_vision), so training,
+classification, caching, workers and the benchmark suite run without any
+download. Their embeddings carry no meaning; use them only to exercise and
+time the plumbing. Besides the registered sizes, any
+random-clip-<layers>x<hidden> name (e.g. random-clip-6x384) is accepted.
+"""
+
+import re
+from typing import NamedTuple, Optional
+
+
+class Backbone(NamedTuple):
+    name: str
+    model_id: str
+    description: str
+    # CLIPVisionConfig arguments of a random-weight stand-in; None for hub checkpoints
+    config: Optional[dict] = None
+
+    @property
+    def stand_in(self):
+        return self.config is not None
+
+
+STAND_IN_PREFIX = 'random-clip-'
+
+# Patch size, input size and MLP ratio shared by every stand-in (CLIP ViT-B/32's)
+STAND_IN_PATCH_SIZE = 32
+STAND_IN_IMAGE_SIZE = 224
+STAND_IN_MLP_RATIO = 4
+
+
+def stand_in_backbone(layers, hidden, projection_dim=None, name=None, description=None):
+    """
+    Random-weight CLIP vision backbone with the given encoder depth and width.
+
+    Attention heads are 64-d like CLIP's; projection_dim defaults to hidden.
+    The model id encodes the geometry, so embedding caches and ONNX exports
+    of different sizes never mix.
+    """
+    if layers < 1 or hidden < 1 or (hidden > 64 and hidden % 64):
+        raise ValueError(f"Stand-in needs at least one layer and a width of at most 64 or a multiple of 64, "
+                         f"got {layers}x{hidden}")
+
+    projection_dim = projection_dim or hidden
+    config = {
+        'num_hidden_layers': layers,
+        'hidden_size': hidden,
+        'num_attention_heads': max(1, hidden // 64),
+        'intermediate_size': hidden * STAND_IN_MLP_RATIO,
+        'projection_dim': projection_dim,
+        'patch_size': STAND_IN_PATCH_SIZE,
+        'image_size': STAND_IN_IMAGE_SIZE
+    }
+    return Backbone(
+        name or f"{STAND_IN_PREFIX}{layers}x{hidden}",
+        f"random/clip-vit-L{layers}-H{hidden}-P{STAND_IN_PATCH_SIZE}-D{projection_dim}",
+        description or f"Random-weight stand-in: {layers} layers, {hidden}-d",
+        config
+    )
+
+
+DEFAULT_BACKBONE = 'clip-vit-b32'
+
+BACKBONES = {
+    backbone.name: backbone
+    for backbone in [
+        Backbone('clip-vit-b32', 'openai/clip-vit-base-patch32', 'OpenAI CLIP ViT-B/32 (default)'),
+        Backbone('clip-vit-b16', 'openai/clip-vit-base-patch16', 'OpenAI CLIP ViT-B/16: ~4x the compute of B/32'),
+        Backbone('tinyclip-vit-40m', 'wkcn/TinyCLIP-ViT-40M-32-Text-19M-LAION400M',
+                 'TinyCLIP ViT-40M/32: about half the size of B/32'),
+        Backbone('tinyclip-vit-8m', 'wkcn/TinyCLIP-ViT-8M-16-Text-3M-YFCC15M',
+                 'TinyCLIP ViT-8M/16: smallest, fastest'),
+        stand_in_backbone(2, 64, name='random-clip-tiny',
+                          description='Random-weight stand-in, 2 layers x 64-d: offline smoke tests'),
+        stand_in_backbone(4, 256, name='random-clip-small',
+                          description='Random-weight stand-in, 4 layers x 256-d'),
+        stand_in_backbone(12, 768, 512, name='random-clip-b32',
+                          description='Random-weight stand-in with ViT-B/32\'s shape: offline benchmarks'),
+    ]
+}
+
+
+def get_backbone(name):
+    """Look up a backbone by registry name, or build a random-clip-<layers>x<hidden> stand-in"""
+    if name in BACKBONES:
+        return BACKBONES[name]
+
+    match = re.fullmatch(re.escape(STAND_IN_PREFIX) + r'(\d+)x(\d+)', name)
+    if match:
+        return stand_in_backbone(int(match.group(1)), int(match.group(2)))
+
+    raise ValueError(f"Unknown backbone: {name} (available: {', '.join(BACKBONES)}, "
+                     f"or {STAND_IN_PREFIX}<layers>x<hidden>)")
@@ -0,0 +1,208 @@
+"""
+Inference backends for classify_images.py (--backend).
+
+A backend turns a normalized pixel batch (float32 numpy, N x 3 x size x size)
+into unit-normalized CLIP embeddings and, when the classifier head is part
+of the backend, the probability of classes[1] for each image.
+
+    torch  Eager PyTorch CLIP vision tower (default; supports --precision
+           and --workers). Scoring is left to LinearHead.
+    onnx   CLIP vision tower + L2 normalization + logistic head exported to
+           a single ONNX graph, run on onnxruntime's CPU execution provider.
+
+The ONNX export is cached next to the classifier (classifier.onnx), with
+classifier.onnx.json recording the classifier's data_hash and CLIP model id.
+It is re-exported when either changes, i.e. after retraining. Exporting
+needs torch and the onnx package; running a cached export needs only
+onnxruntime.
+"""
+
+import contextlib
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from startup import import_module
+
+BACKENDS = ('torch', 'onnx')
+
+EXPORT_VERSION = 2
+ONNX_OPSET = 17
+
+# Maximum allowed difference between ONNX and PyTorch outputs after export
+EXPORT_TOLERANCE = 1e-4
+
+
+def onnx_path_for(model_path):
+    """Path of the cached ONNX export for a classifier .pkl"""
+    return Path(model_path).with_suffix('.onnx')
+
+
+def onnx_info_path_for(model_path):
+    """Path of the JSON file describing the cached ONNX export"""
+    return Path(model_path).with_suffix('.onnx.json')
+
+
+def read_model_version(model_path, head):
+    """
+    Version the ONNX export is keyed on: data_hash from the classifier's
+    .meta.json, else the head's model_version, else the .pkl mtime
+    """
+    meta_path = Path(model_path).with_suffix('.meta.json')
+    if meta_path.exists():
+        with open(meta_path, 'r') as f:
+            data_hash = json.load(f).get('data_hash')
+        if data_hash:
+            return data_hash
+
+    if head.model_version:
+        return head.model_version
+    return f"mtime:{Path(model_path).stat().st_mtime_ns}"
+
+
+class TorchBackend:
+    """Eager PyTorch vision tower on CPU or CUDA"""
+
+    name = 'torch'
+
+    def __init__(self, model, device):
+        self.model = model
+        self.device = device
+        self.dim = model.config.projection_dim
+        self.image_size = model.config.image_size
+
+    def run(self, pixels):
+        """Returns (embeddings, None); the classifier scores them separately"""
+        torch = import_module('torch')
+        inputs = torch.from_numpy(pixels).to(self.device)
+
+        with torch.no_grad():
+            features = self.model.get_image_features(pixel_values=inputs).cpu().numpy()
+
+        return features / np.linalg.norm(features, axis=1, keepdims=True), None
+
+
+class OnnxBackend:
+    """Exported vision tower + classifier head on onnxruntime's CPU provider"""
+
+    name = 'onnx'
+
+    def __init__(self, onnx_path, dim, image_size):
+        ort = import_module('onnxruntime')
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(onnx_path), options, providers=['CPUExecutionProvider'])
+        self.dim = dim
+        self.image_size = image_size
+
+    def run(self, pixels):
+        """Returns (embeddings, probabilities of classes[1])"""
+        embeddings, probabilities = self.session.run(
+            ['embeddings', 'probabilities'], {'pixel_values': pixels}
+        )
+        return embeddings, probabilities
+
+
+def export_onnx(model, head, onnx_path):
+    """
+    Export model + L2 normalization + head as one ONNX graph.
+
+    Inputs:  pixel_values (batch, 3, H, W) float32
+    Outputs: embeddings (batch, dim) float32, probabilities (batch,) float32
+
+    Returns:
+        (embedding dimension, input image size)
+    """
+    torch = import_module('torch')
+
+    class ClassifierGraph(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.tower = model
+            self.register_buffer('coef', torch.from_numpy(head.coef.copy()))
+            self.register_buffer('intercept', torch.tensor(head.intercept, dtype=torch.float32))
+
+        def forward(self, pixel_values):
+            features = self.tower.get_image_features(pixel_values)
+            embeddings = features / features.norm(dim=1, keepdim=True)
+            probabilities = torch.sigmoid(embeddings @ self.coef + self.intercept)
+            return embeddings, probabilities
+
+    device = next(model.parameters()).device
+    graph = ClassifierGraph().to(device).eval()
+    size = model.config.image_size
+    sample = torch.randn(2, 3, size, size, generator=torch.Generator().manual_seed(0)).to(device)
+
+    # Export into a temporary directory next to the cache, so an interrupted
+    # export never looks cached and external-data sidecars never leak out
+    with tempfile.TemporaryDirectory(dir=onnx_path.parent, prefix='.onnx-export-') as tmp_dir:
+        tmp_path = Path(tmp_dir) / onnx_path.name
+        # The exporter prints progress to stdout, which carries the JSON
+        # results (and the --serve protocol)
+        with torch.no_grad(), contextlib.redirect_stdout(sys.stderr):
+            torch.onnx.export(
+                graph,
+                (sample,),
+                str(tmp_path),
+                input_names=['pixel_values'],
+                output_names=['embeddings', 'probabilities'],
+                dynamic_axes={'pixel_values': {0: 'batch'}, 'embeddings': {0: 'batch'}, 'probabilities': {0: 'batch'}},
+                opset_version=ONNX_OPSET
+            )
+            expected = [output.cpu().numpy() for output in graph(sample)]
+
+        # Newer exporters may store the weights as external data next to the
+        # graph; fold them in so the cached export is one self-contained file
+        onnx = import_module('onnx')
+        onnx.save_model(onnx.load(str(tmp_path)), str(tmp_path), save_as_external_data=False)
+        os.replace(tmp_path, onnx_path)
+
+    # Check the exported graph reproduces PyTorch before trusting it
+    actual = OnnxBackend(onnx_path, model.config.projection_dim, size).run(sample.cpu().numpy())
+    diff = max(float(np.abs(a - e).max()) for a, e in zip(actual, expected))
+    print(f"ONNX export max difference vs PyTorch: {diff:.2e}", file=sys.stderr)
+    if diff > EXPORT_TOLERANCE:
+        onnx_path.unlink()
+        raise RuntimeError(f"ONNX export differs from PyTorch by {diff:.2e} (tolerance {EXPORT_TOLERANCE})")
+
+    return model.config.projection_dim, size
+
+
+def load_onnx_backend(model_path, head, model_id, get_model):
+    """
+    Open the cached ONNX export for a classifier, exporting it first if it
+    is missing or was built for a different data_hash or CLIP model.
+
+    Args:
+        model_path: Classifier .pkl the export sits next to
+        head: LinearHead baked into the graph
+        model_id: Embedding model id of the vision tower (backbone, plus any layer truncation)
+        get_model: Callable returning (vision tower, device); only called to export
+    """
+    onnx_path = onnx_path_for(model_path)
+    info_path = onnx_info_path_for(model_path)
+    expected = {
+        'version': EXPORT_VERSION,
+        'model_id': model_id,
+        'model_version': read_model_version(model_path, head),
+        'opset': ONNX_OPSET
+    }
+
+    info = None
+    if onnx_path.exists() and info_path.exists():
+        with open(info_path, 'r') as f:
+            info = json.load(f)
+
+    if info is None or any(info.get(key) != value for key, value in expected.items()):
+        print(f"Exporting ONNX classifier graph to {onnx_path}...", file=sys.stderr)
+        model, _ = get_model()
+        dim, image_size = export_onnx(model, head, onnx_path)
+        info = dict(expected, dim=dim, image_size=image_size)
+        with open(info_path, 'w') as f:
+            json.dump(info, f, indent=2)
+
+    return OnnxBackend(onnx_path, info['dim'], info['image_size'])
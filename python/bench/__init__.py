@@ -0,0 +1,10 @@
+"""
+Classification benchmark suite (see bench/run.py).
+
+Run the modules from the python/ directory so the flat script modules
+(classify_images, backends, ...) are importable:
+
+    python -m bench.corpus --out bench/corpus
+    python -m bench.run --json bench-results.json
+    python -m bench.compare bench-results.json bench-baseline.json
+"""
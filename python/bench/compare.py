@@ -0,0 +1,118 @@
+"""
+Compare benchmark results against a stored baseline.
+
+Configurations are matched by backend, worker count and batch size. A
+configuration regresses when its throughput drops, or its p90 batch
+latency rises, by more than the tolerance (a fraction: 0.1 is 10%).
+Configurations present in only one of the files are listed but never
+count as regressions. Exits 1 when anything regressed, so CI can gate on it.
+
+Results from different machines aren't comparable; a warning is printed
+when the host or corpus differs from the baseline's.
+
+Usage:
+    python -m bench.compare results.json baseline.json [--tolerance 0.1]
+"""
+
+import argparse
+import json
+import sys
+
+DEFAULT_TOLERANCE = 0.1
+
+
+def run_key(run):
+    """Identifies a configuration across result files"""
+    return f"{run['backend']}/w{run['workers']}/b{run['batch_size']}"
+
+
+def relative_change(current, baseline):
+    return (current - baseline) / baseline if baseline else 0.0
+
+
+def compare_results(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare every configuration in results with the baseline's.
+
+    Returns:
+        One dict per configuration with the key, both runs (None when
+        missing from a file), throughput and latency changes, and the list
+        of regressed metrics
+    """
+    for section in ('host', 'corpus'):
+        if results.get(section) != baseline.get(section):
+            print(f"Warning: {section} differs from the baseline; timings may not be comparable", file=sys.stderr)
+
+    current_runs = {run_key(run): run for run in results['runs']}
+    baseline_runs = {run_key(run): run for run in baseline['runs']}
+
+    comparisons = []
+    for key in list(baseline_runs) + [key for key in current_runs if key not in baseline_runs]:
+        current = current_runs.get(key)
+        previous = baseline_runs.get(key)
+        comparison = {'key': key, 'current': current, 'baseline': previous, 'regressions': []}
+
+        if current is not None and previous is not None:
+            throughput = relative_change(current['images_per_sec'], previous['images_per_sec'])
+            latency = relative_change(current['latency_ms']['p90'], previous['latency_ms']['p90'])
+            comparison.update(throughput_change=throughput, latency_change=latency)
+            if throughput < -tolerance:
+                comparison['regressions'].append('images_per_sec')
+            if latency > tolerance:
+                comparison['regressions'].append('latency_p90')
+
+        comparisons.append(comparison)
+
+    return comparisons
+
+
+def print_comparison(comparisons, tolerance=DEFAULT_TOLERANCE):
+    """Print one row per configuration and a summary line"""
+    print(f"\n{'Configuration':<18} {'Base img/s':>10} {'Img/s':>8} {'Change':>8} "
+          f"{'Base p90':>9} {'p90 ms':>8} {'Change':>8}  Status")
+    for comparison in comparisons:
+        current, previous = comparison['current'], comparison['baseline']
+        if current is None or previous is None:
+            status = 'removed' if current is None else 'new'
+            print(f"{comparison['key']:<18} {'':>10} {'':>8} {'':>8} {'':>9} {'':>8} {'':>8}  {status}")
+            continue
+
+        status = 'REGRESSED (' + ', '.join(comparison['regressions']) + ')' if comparison['regressions'] else 'ok'
+        print(
+            f"{comparison['key']:<18} {previous['images_per_sec']:>10.1f} {current['images_per_sec']:>8.1f} "
+            f"{comparison['throughput_change']:>+8.1%} {previous['latency_ms']['p90']:>9.1f} "
+            f"{current['latency_ms']['p90']:>8.1f} {comparison['latency_change']:>+8.1%}  {status}"
+        )
+
+    regressed = sum(1 for comparison in comparisons if comparison['regressions'])
+    if regressed:
+        print(f"\n✗ {regressed} configuration(s) regressed by more than {tolerance:.0%}")
+    else:
+        print(f"\n✓ No regressions beyond {tolerance:.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Flag benchmark regressions against a baseline')
+    parser.add_argument('results', type=str, help='Results JSON from python -m bench.run --json')
+    parser.add_argument('baseline', type=str, help='Baseline results JSON')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f'Allowed relative slowdown (default: {DEFAULT_TOLERANCE})')
+    args = parser.parse_args()
+
+    documents = []
+    for path in (args.results, args.baseline):
+        try:
+            with open(path, 'r') as f:
+                documents.append(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"Error: Failed to read {path}: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    comparisons = compare_results(documents[0], documents[1], args.tolerance)
+    print_comparison(comparisons, args.tolerance)
+    if any(comparison['regressions'] for comparison in comparisons):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
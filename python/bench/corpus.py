@@ -0,0 +1,187 @@
+"""
+Deterministic synthetic corpus of meme-like stills for the benchmark.
+
+Images cycle through three kinds and several resolutions:
+
+    text   Caption lines with a dark outline over a photo-like or flat
+           background, like meme and title-card stills
+    solid  A single flat color (black, white or any other), like fades and
+           blank frames
+    photo  Smooth random color fields with gradients and sensor-like noise
+
+Each image is drawn from its own seeded random state, so image i is the
+same whatever the corpus size, and the same seed and Pillow version always
+produce the same bytes. corpus.json records the parameters; an existing
+corpus with matching parameters is reused as-is.
+
+Usage:
+    python -m bench.corpus --out bench/corpus [--count 240] [--seed 0]
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont, __version__ as PILLOW_VERSION
+
+CORPUS_VERSION = 1
+CORPUS_MANIFEST = 'corpus.json'
+
+DEFAULT_CORPUS_DIR = Path(__file__).resolve().parent / 'corpus'
+DEFAULT_COUNT = 240
+DEFAULT_SEED = 0
+
+KINDS = ('text', 'solid', 'photo')
+
+# Typical still sizes: SD, 720p, 1080p and 4K, plus a portrait phone video
+RESOLUTIONS = ((640, 360), (1280, 720), (1920, 1080), (720, 1280), (3840, 2160))
+
+JPEG_QUALITY = 90
+
+WORDS = (
+    'when', 'the', 'code', 'finally', 'compiles', 'me', 'explaining', 'to', 'my', 'cat', 'nobody',
+    'absolutely', 'no', 'one', 'monday', 'morning', 'that', 'feeling', 'when', 'you', 'press',
+    'start', 'game', 'over', 'level', 'boss', 'final', 'form', 'loading', 'please', 'wait'
+)
+
+
+def corpus_params(count, seed):
+    """Parameters recorded in corpus.json; a corpus is reused only if they match"""
+    return {
+        'version': CORPUS_VERSION,
+        'count': count,
+        'seed': seed,
+        'kinds': list(KINDS),
+        'resolutions': [list(size) for size in RESOLUTIONS],
+        'quality': JPEG_QUALITY,
+        'pillow': PILLOW_VERSION
+    }
+
+
+def image_spec(i):
+    """(kind, (width, height)) of image i"""
+    return KINDS[i % len(KINDS)], RESOLUTIONS[(i // len(KINDS)) % len(RESOLUTIONS)]
+
+
+def photo_pixels(rng, width, height):
+    """Photo-like uint8 (H, W, 3) pixels: a blurred coarse color field plus noise"""
+    coarse = rng.randint(0, 256, size=(rng.randint(3, 9), rng.randint(3, 9), 3), dtype=np.uint8)
+    field = Image.fromarray(coarse).resize((width, height), Image.BICUBIC)
+    field = field.filter(ImageFilter.GaussianBlur(radius=max(width, height) / 100))
+
+    pixels = np.asarray(field, dtype=np.int16)
+    # Vertical light falloff, then grain
+    pixels = pixels + np.linspace(-30, 30, height, dtype=np.float32).astype(np.int16)[:, None, None]
+    pixels = pixels + rng.randint(-12, 13, size=pixels.shape, dtype=np.int16)
+    return np.clip(pixels, 0, 255).astype(np.uint8)
+
+
+def caption_font(size):
+    """Pillow's bundled font at size (a fixed-size bitmap font on Pillow < 10.1)"""
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        return ImageFont.load_default()
+
+
+def draw_captions(image, rng):
+    """Draw one to three outlined caption lines, top and bottom like a meme"""
+    width, height = image.size
+    draw = ImageDraw.Draw(image)
+    font = caption_font(max(12, height // 12))
+    lines = rng.randint(1, 4)
+
+    for line in range(lines):
+        text = ' '.join(rng.choice(WORDS, size=rng.randint(2, 6))).upper()
+        left, top, right, bottom = draw.textbbox((0, 0), text, font=font, stroke_width=2)
+        x = max(0, (width - (right - left)) // 2)
+        y = height // 20 if line == 0 else height - (bottom - top) * (lines - line + 1)
+        draw.text((x, y), text, font=font, fill=(255, 255, 255), stroke_width=2, stroke_fill=(0, 0, 0))
+
+
+def make_image(i, seed):
+    """Image i of the corpus as a PIL image"""
+    kind, (width, height) = image_spec(i)
+    rng = np.random.RandomState([seed, i])
+
+    if kind == 'solid':
+        color = [(0, 0, 0), (255, 255, 255), tuple(int(c) for c in rng.randint(0, 256, 3))][rng.randint(3)]
+        return Image.new('RGB', (width, height), color)
+
+    if kind == 'photo' or rng.rand() < 0.5:
+        image = Image.fromarray(photo_pixels(rng, width, height))
+    else:
+        image = Image.new('RGB', (width, height), tuple(int(c) for c in rng.randint(0, 256, 3)))
+
+    if kind == 'text':
+        draw_captions(image, rng)
+    return image
+
+
+def read_params(out_dir):
+    """Parameters of the corpus in out_dir, or None when there isn't one"""
+    manifest_path = Path(out_dir) / CORPUS_MANIFEST
+    if not manifest_path.exists():
+        return None
+    try:
+        with open(manifest_path, 'r') as f:
+            return json.load(f).get('params')
+    except (OSError, ValueError):
+        return None
+
+
+def generate_corpus(out_dir=DEFAULT_CORPUS_DIR, count=DEFAULT_COUNT, seed=DEFAULT_SEED):
+    """
+    Write the corpus to out_dir, unless a matching one is already there.
+
+    Returns:
+        (sorted image paths, corpus params)
+    """
+    out_dir = Path(out_dir)
+    params = corpus_params(count, seed)
+    manifest_path = out_dir / CORPUS_MANIFEST
+
+    if read_params(out_dir) == params:
+        with open(manifest_path, 'r') as f:
+            files = json.load(f)['files']
+        return [out_dir / name for name in files], params
+
+    print(f"Generating {count} synthetic stills in {out_dir}...", file=sys.stderr)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for stale in out_dir.glob('*.jpg'):
+        stale.unlink()
+
+    files = []
+    for i in range(count):
+        kind, (width, height) = image_spec(i)
+        name = f"still_{i:05d}_{kind}_{width}x{height}.jpg"
+        make_image(i, seed).save(out_dir / name, 'JPEG', quality=JPEG_QUALITY)
+        files.append(name)
+
+    with open(manifest_path, 'w') as f:
+        json.dump({'params': params, 'files': files}, f, indent=2)
+
+    return [out_dir / name for name in files], params
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate the synthetic benchmark corpus')
+    parser.add_argument('--out', type=str, default=str(DEFAULT_CORPUS_DIR),
+                        help='Output directory (default: bench/corpus)')
+    parser.add_argument('--count', type=int, default=DEFAULT_COUNT,
+                        help=f'Number of stills (default: {DEFAULT_COUNT})')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help=f'Random seed (default: {DEFAULT_SEED})')
+    args = parser.parse_args()
+
+    if args.count < 1:
+        print("Error: --count must be at least 1", file=sys.stderr)
+        sys.exit(1)
+
+    paths, _ = generate_corpus(args.out, args.count, args.seed)
+    print(f"✓ {len(paths)} stills in {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,288 @@
+"""
+Throughput and latency benchmark for classify_images.py.
+
+Classifies the synthetic corpus (bench/corpus.py) once per combination of
+backend, worker count and batch size, and reports for each:
+
+    images_per_sec   Images classified per second, median over --repeats
+    latency_ms       p50 / p90 / p99 / max time between consecutive batch
+                     results, i.e. how long a streaming caller waits per batch
+    load_seconds     Time to load the model and start the workers
+
+Every configuration runs in a fresh subprocess, so model loading, worker
+pools and backend state never leak between them. The embedding cache,
+result manifests and blocklist are off, so every image is decoded and
+embedded, and one warm-up batch is classified before timing starts.
+
+Without --model, a random linear head for --backbone stands in for the
+trained classifier; the head is a single matmul, so timings are the same.
+The onnx backend only runs with one worker (see start_workers).
+
+Usage:
+    python -m bench.run [--batch-sizes 8,32,64] [--workers 1,4] [--backends torch,onnx]
+                        [--count 240] [--seed 0] [--repeats 3] [--backbone NAME | --model PATH]
+                        [--json results.json] [--baseline baseline.json] [--tolerance 0.1]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from backbones import DEFAULT_BACKBONE, get_backbone
+from backends import BACKENDS
+from bench.compare import DEFAULT_TOLERANCE, compare_results, print_comparison, run_key
+from bench.corpus import DEFAULT_CORPUS_DIR, DEFAULT_COUNT, DEFAULT_SEED, generate_corpus
+from profiling import host_info
+
+BENCH_VERSION = 1
+
+PYTHON_DIR = Path(__file__).resolve().parent.parent
+
+DEFAULT_BATCH_SIZES = (8, 32, 64)
+DEFAULT_WORKERS = (1, 4)
+DEFAULT_BACKENDS = BACKENDS
+DEFAULT_REPEATS = 3
+
+# Classifier .pkl path the onnx export of the random head is cached under
+RANDOM_HEAD_MODEL = 'bench-classifier.pkl'
+
+
+def percentile(values, q):
+    """q-th percentile of values, linearly interpolated"""
+    values = sorted(values)
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def random_head(backbone, dim):
+    """Seeded random LinearHead for a backbone, standing in for a trained classifier"""
+    import numpy as np
+    from linear_head import LinearHead
+
+    rng = np.random.RandomState(0)
+    return LinearHead(rng.randn(dim) / np.sqrt(dim), 0.0, [0, 1], f"bench:{backbone}", backbone)
+
+
+def run_single(config):
+    """
+    Classify the corpus with one configuration, in this process.
+
+    Returns:
+        Result dict for the configuration
+    """
+    import classify_images
+
+    paths = [Path(path) for path in config['paths']]
+    batch_size = config['batch_size']
+
+    classify_images.set_backend(config['backend'])
+    classify_images.set_use_manifests(False)
+
+    load_start = time.perf_counter()
+    if config['model']:
+        model_path = config['model']
+        classifier = classify_images.load_model(model_path)
+        classify_images.match_classifier(classifier)
+    else:
+        model_path = str(Path(config['corpus']) / RANDOM_HEAD_MODEL)
+        classify_images.set_backbone(config['backbone'])
+        model, _ = classify_images.get_clip_model()
+        classifier = random_head(config['backbone'], model.config.projection_dim)
+    classify_images.load_backend(classifier, model_path)
+    classify_images.start_workers(config['workers'])
+    load_seconds = time.perf_counter() - load_start
+
+    try:
+        # Warm up kernels (and the workers) with one batch, and pull the
+        # corpus into the page cache so the first repeat doesn't read from disk
+        for path in paths:
+            path.read_bytes()
+        for _ in classify_images.iter_classifications(classifier, paths[:batch_size], batch_size=batch_size):
+            pass
+
+        rates = []
+        latencies = []
+        for _ in range(config['repeats']):
+            classified = 0
+            start = last = time.perf_counter()
+            for results in classify_images.iter_classifications(classifier, paths, batch_size=batch_size):
+                now = time.perf_counter()
+                latencies.append((now - last) * 1000)
+                last = now
+                classified += len(results)
+            rates.append(classified / (last - start) if last > start else 0.0)
+    finally:
+        classify_images.stop_workers()
+
+    return {
+        'backend': config['backend'],
+        'workers': config['workers'],
+        'batch_size': batch_size,
+        'images': len(paths),
+        'repeats': config['repeats'],
+        'load_seconds': round(load_seconds, 3),
+        'images_per_sec': round(statistics.median(rates), 2),
+        'images_per_sec_runs': [round(rate, 2) for rate in rates],
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 2),
+            'p90': round(percentile(latencies, 90), 2),
+            'p99': round(percentile(latencies, 99), 2),
+            'max': round(max(latencies), 2)
+        }
+    }
+
+
+def run_configuration(config):
+    """Run one configuration in a fresh subprocess; returns its result dict, or None if it failed"""
+    process = subprocess.run(
+        [sys.executable, '-m', 'bench.run', '--single', json.dumps(config)],
+        cwd=PYTHON_DIR, capture_output=True, text=True
+    )
+    if process.returncode != 0:
+        print(process.stderr, file=sys.stderr)
+        return None
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def parse_list(value, cast=str):
+    return [cast(item.strip()) for item in value.split(',') if item.strip()]
+
+
+def print_table(runs):
+    """Print one row per configuration"""
+    print(f"\n{'Configuration':<18} {'Load s':>7} {'Images/s':>9} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8}")
+    for run in runs:
+        latency = run['latency_ms']
+        print(
+            f"{run_key(run):<18} {run['load_seconds']:>7.1f} {run['images_per_sec']:>9.1f} "
+            f"{latency['p50']:>8.1f} {latency['p90']:>8.1f} {latency['p99']:>8.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark classify_images.py on a synthetic corpus')
+    parser.add_argument('--batch-sizes', type=str, default=','.join(map(str, DEFAULT_BATCH_SIZES)),
+                        help='Comma-separated batch sizes (default: 8,32,64)')
+    parser.add_argument('--workers', type=str, default=','.join(map(str, DEFAULT_WORKERS)),
+                        help='Comma-separated worker counts (default: 1,4)')
+    parser.add_argument('--backends', type=str, default=','.join(DEFAULT_BACKENDS),
+                        help='Comma-separated backends (default: torch,onnx)')
+    parser.add_argument('--corpus', type=str, default=str(DEFAULT_CORPUS_DIR),
+                        help='Corpus directory, generated if missing (default: bench/corpus)')
+    parser.add_argument('--count', type=int, default=DEFAULT_COUNT,
+                        help=f'Corpus size (default: {DEFAULT_COUNT})')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help=f'Corpus seed (default: {DEFAULT_SEED})')
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS,
+                        help=f'Timed passes over the corpus per configuration (default: {DEFAULT_REPEATS})')
+    parser.add_argument('--backbone', type=str, default=DEFAULT_BACKBONE,
+                        help=f'Backbone of the random stand-in head, e.g. random-clip-b32 to run offline '
+                             f'(default: {DEFAULT_BACKBONE})')
+    parser.add_argument('--model', type=str, help='Benchmark a trained classifier .pkl instead of a random head')
+    parser.add_argument('--json', type=str, help='Write results as JSON to this file')
+    parser.add_argument('--baseline', type=str, help='Compare against a stored results file; exit 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f'Allowed relative slowdown before a run counts as a regression '
+                             f'(default: {DEFAULT_TOLERANCE})')
+    parser.add_argument('--single', type=str, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_single(json.loads(args.single))))
+        return
+
+    try:
+        batch_sizes = parse_list(args.batch_sizes, int)
+        workers = parse_list(args.workers, int)
+        backends = parse_list(args.backends)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    if args.repeats < 1 or args.count < 1 or not batch_sizes or not workers:
+        print("Error: --repeats, --count, --batch-sizes and --workers must be at least 1", file=sys.stderr)
+        sys.exit(1)
+    unknown = [backend for backend in backends if backend not in BACKENDS]
+    if unknown:
+        print(f"Error: Unknown backend: {', '.join(unknown)}", file=sys.stderr)
+        sys.exit(1)
+    try:
+        get_backbone(args.backbone)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    if args.model and not Path(args.model).exists():
+        print(f"Error: Model file not found at {args.model}", file=sys.stderr)
+        sys.exit(1)
+
+    baseline = None
+    if args.baseline:
+        try:
+            with open(args.baseline, 'r') as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error: Failed to read baseline {args.baseline}: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    paths, corpus = generate_corpus(args.corpus, args.count, args.seed)
+    started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+    runs = []
+    for backend in backends:
+        for worker_count in workers:
+            if backend != 'torch' and worker_count > 1:
+                print(f"Skipping {backend} with {worker_count} workers (torch only)", file=sys.stderr)
+                continue
+            for batch_size in batch_sizes:
+                config = {
+                    'backend': backend,
+                    'workers': worker_count,
+                    'batch_size': batch_size,
+                    'repeats': args.repeats,
+                    'backbone': args.backbone,
+                    'model': str(Path(args.model).resolve()) if args.model else None,
+                    'corpus': str(Path(args.corpus).resolve()),
+                    'paths': [str(path.resolve()) for path in paths]
+                }
+                print(f"Benchmarking {backend}, {worker_count} workers, batch size {batch_size}...",
+                      file=sys.stderr)
+                run = run_configuration(config)
+                if run is None:
+                    print(f"Warning: {backend}/w{worker_count}/b{batch_size} failed, skipping", file=sys.stderr)
+                    continue
+                runs.append(run)
+
+    if not runs:
+        print("Error: Every configuration failed", file=sys.stderr)
+        sys.exit(1)
+
+    print_table(runs)
+
+    results = {
+        'version': BENCH_VERSION,
+        'started_at': started_at,
+        'host': host_info(),
+        'corpus': corpus,
+        'classifier': args.model or f"random head ({args.backbone})",
+        'runs': runs
+    }
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"\n✓ Results written to {args.json}")
+
+    if baseline is not None:
+        comparisons = compare_results(results, baseline, args.tolerance)
+        print_comparison(comparisons, args.tolerance)
+        if any(comparison['regressions'] for comparison in comparisons):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
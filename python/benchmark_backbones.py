@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Benchmark vision backbones on the labeled training data.
+
+For each backbone, embeds every training image (decode, preprocess and
+CLIP forward pass in batches) and reports throughput, then runs the same
+5-fold cross-validated logistic regression as train_classifier.py on those
+embeddings. Use it to pick a backbone for train_classifier.py --backbone.
+
+Usage:
+    python benchmark_backbones.py --data ../training-data [--backbones clip-vit-b32,tinyclip-vit-8m]
+                                  [--batch-size 32] [--device cpu] [--json results.json]
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import cross_validate
+
+from backbones import BACKBONES, get_backbone
+from preprocessing import DECODE_MARGIN, normalize_batch, open_image, resize_and_crop
+from train_classifier import load_labeled_data
+from vision_bundle import load_clip_vision
+
+
+def embed_images(model, device, image_paths, batch_size):
+    """
+    Embed images in batches.
+
+    Returns:
+        (embeddings, ok, model_seconds) where ok marks images that loaded and
+        model_seconds is the time spent in CLIP forward passes alone
+    """
+    size = model.config.image_size
+    embeddings = np.zeros((len(image_paths), model.config.projection_dim), dtype=np.float32)
+    ok = np.zeros(len(image_paths), dtype=bool)
+    model_seconds = 0.0
+
+    for start in range(0, len(image_paths), batch_size):
+        crops = []
+        for i, img_path in enumerate(image_paths[start:start + batch_size], start):
+            try:
+                crops.append(resize_and_crop(open_image(img_path, target=size * DECODE_MARGIN), size))
+                ok[i] = True
+            except Exception as e:
+                print(f"Warning: Failed to process {img_path}: {e}", file=sys.stderr)
+        if not crops:
+            continue
+
+        inputs = normalize_batch(np.stack(crops)).to(device)
+        forward_start = time.perf_counter()
+        with torch.no_grad():
+            features = model.get_image_features(pixel_values=inputs).cpu().numpy()
+        model_seconds += time.perf_counter() - forward_start
+
+        batch_ok = np.flatnonzero(ok[start:start + batch_size]) + start
+        embeddings[batch_ok] = features / np.linalg.norm(features, axis=1, keepdims=True)
+
+    return embeddings, ok, model_seconds
+
+
+def benchmark_backbone(backbone, image_paths, labels, batch_size, device):
+    """Throughput and cross-validated accuracy for one backbone"""
+    load_start = time.perf_counter()
+    model = load_clip_vision(backbone)
+    model.to(device)
+    load_seconds = time.perf_counter() - load_start
+
+    # Warm up kernels so the first batch doesn't skew throughput
+    size = model.config.image_size
+    with torch.no_grad():
+        model.get_image_features(pixel_values=torch.zeros(1, 3, size, size, device=device))
+
+    embed_start = time.perf_counter()
+    embeddings, ok, model_seconds = embed_images(model, device, image_paths, batch_size)
+    embed_seconds = time.perf_counter() - embed_start
+    count = int(ok.sum())
+
+    cv_results = cross_validate(
+        LogisticRegression(max_iter=1000, random_state=42),
+        embeddings[ok],
+        labels[ok],
+        cv=5,
+        scoring=['accuracy', 'f1']
+    )
+
+    return {
+        'backbone': backbone.name,
+        'model_id': backbone.model_id,
+        'embedding_dim': int(model.config.projection_dim),
+        'images': count,
+        'load_seconds': round(load_seconds, 3),
+        'images_per_sec': round(count / embed_seconds, 2) if embed_seconds > 0 else 0.0,
+        'model_images_per_sec': round(count / model_seconds, 2) if model_seconds > 0 else 0.0,
+        'accuracy_mean': float(cv_results['test_accuracy'].mean()),
+        'accuracy_std': float(cv_results['test_accuracy'].std()),
+        'f1_mean': float(cv_results['test_f1'].mean())
+    }
+
+
+def print_table(results):
+    """Print one row per backbone, fastest first"""
+    print(f"\n{'Backbone':<18} {'Dim':>4} {'Load s':>7} {'Images/s':>9} {'CLIP img/s':>11} {'CV accuracy':>15} {'F1':>6}")
+    for r in sorted(results, key=lambda r: -r['images_per_sec']):
+        print(
+            f"{r['backbone']:<18} {r['embedding_dim']:>4} {r['load_seconds']:>7.1f} {r['images_per_sec']:>9.1f} "
+            f"{r['model_images_per_sec']:>11.1f} {r['accuracy_mean']:>8.3f} ± {r['accuracy_std']:.3f} {r['f1_mean']:>6.3f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare vision backbones by throughput and cross-validated accuracy')
+    parser.add_argument('--data', type=str, required=True, help='Path to training data directory')
+    parser.add_argument('--backbones', type=str,
+                        default=','.join(name for name, backbone in BACKBONES.items() if not backbone.stand_in),
+                        help='Comma-separated backbone names (default: all registered except random-weight stand-ins)')
+    parser.add_argument('--batch-size', type=int, default=32, help='Images per CLIP forward pass (default: 32)')
+    parser.add_argument('--device', type=str, default='cpu', help='Device to use (cpu or cuda)')
+    parser.add_argument('--json', type=str, help='Also write results as JSON to this file')
+    args = parser.parse_args()
+
+    try:
+        backbones = [get_backbone(name.strip()) for name in args.backbones.split(',') if name.strip()]
+        image_paths, labels = load_labeled_data(Path(args.data))
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    labels = np.array(labels)
+
+    results = []
+    for backbone in backbones:
+        print(f"\nBenchmarking {backbone.name} ({backbone.model_id})...")
+        results.append(benchmark_backbone(backbone, image_paths, labels, args.batch_size, args.device))
+
+    print_table(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+pHash blocklist shared with the harvest CLI (models/blocklist.json).
+
+Mirrors src/lib/blocklist.ts: entries are added with `harvest --add-to-blocklist`
+or the feedback server's "add to blocklist" button, and any frame whose pHash
+is within the threshold of an entry is excluded. classify_images.py checks
+frames against it before decoding or embedding them.
+
+Hashes are sharp-phash's 64-character bit strings, the format of frame
+hashes in harvest reports and of CLI-added entries: image_hash() ports
+sharp-phash so hashes computed here match them. They are compared
+character by character, like the TypeScript hammingDistance().
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from preprocessing import open_image
+from startup import import_module
+
+DEFAULT_BLOCKLIST_PATH = Path(__file__).resolve().parent.parent / 'models' / 'blocklist.json'
+
+# Hamming distance threshold (blocklist.ts DEFAULT_THRESHOLD)
+DEFAULT_THRESHOLD = 5
+
+# sharp-phash: greyscale thumbnail side, and side of the low-frequency DCT block hashed
+SAMPLE_SIZE = 32
+LOW_SIZE = 8
+
+
+def load_blocklist(path=DEFAULT_BLOCKLIST_PATH):
+    """Blocklist entries from path; empty when the file is missing or unreadable"""
+    path = Path(path)
+    if not path.exists():
+        return []
+
+    try:
+        with open(path, 'r') as f:
+            return json.load(f).get('entries', [])
+    except (OSError, ValueError) as e:
+        print(f"Warning: Failed to load blocklist from {path}: {e}", file=sys.stderr)
+        return []
+
+
+def hamming_distance(hash1, hash2):
+    """Differing bits between two hash strings of the same length"""
+    if len(hash1) != len(hash2):
+        raise ValueError('Hash lengths must match')
+    return sum(bin(int(a, 16) ^ int(b, 16)).count('1') for a, b in zip(hash1, hash2))
+
+
+def check_blocklist(frame_hash, entries, threshold=DEFAULT_THRESHOLD):
+    """First entry within threshold of frame_hash, or None"""
+    for entry in entries:
+        try:
+            if hamming_distance(frame_hash, entry['hash']) <= threshold:
+                return entry
+        except (KeyError, ValueError):
+            continue
+    return None
+
+
+def image_hash(img_path):
+    """
+    64-bit pHash of an image file as a bit string, computed like
+    sharp-phash: DCT of a 32x32 greyscale thumbnail, one bit per
+    coefficient of its 8x8 lowest frequencies (skipping the DC row and
+    column) set when above their mean. pHash only looks at the thumbnail,
+    so the image is decoded at reduced resolution.
+    """
+    ImageOps = import_module('PIL.ImageOps')
+    Image = import_module('PIL.Image')
+    image = ImageOps.exif_transpose(open_image(img_path)).convert('L')
+    # sharp indexes the signal by column first
+    signal = np.asarray(image.resize((SAMPLE_SIZE, SAMPLE_SIZE), Image.LANCZOS), dtype=np.float64).T
+
+    n = np.arange(SAMPLE_SIZE)
+    basis = np.cos((2 * n[None, :] + 1) * n[:, None] * np.pi / (2 * SAMPLE_SIZE))
+    low = (basis @ signal @ basis.T)[1:LOW_SIZE + 1, 1:LOW_SIZE + 1]
+    return ''.join('1' if bit else '0' for bit in (low > low.mean()).ravel())
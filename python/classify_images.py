@@ -3,139 +3,1377 @@
 Classify images using trained CLIP-based classifier.
 
 Usage:
-    python classify_images.py <image_directory>
+    python classify_images.py <image_directory> [--batch-size N] [--cache-dir DIR | --no-cache]
+    python classify_images.py --paths-from <manifest | -> [options]
+    python classify_images.py --report <report.json> [--root OUTPUT] [--spot-check FRACTION]
+    python classify_images.py --serve [--socket PATH]
+
+    Add --workers N to spread CLIP across N forked processes.
+    Add --startup-profile to print an import-time breakdown to stderr.
+    Add --profile PATH to write per-stage wall/CPU time, item counts and
+    peak RSS as JSON (see profiling.py).
+    Add --precision int8|bf16 for faster, approximate CPU inference.
+    Add --backend onnx to run CLIP + classifier as one onnxruntime graph.
+    Add --cascade to decide near-duplicates of training images by pHash
+    and only run CLIP on the rest.
+
+Manifest:
+    One image per line, either a bare path or a JSON object with a "path"
+    key and optionally the frame's pHash as "hash". Only the listed images
+    are decoded and classified.
+
+Blocklist:
+    Frames whose pHash matches models/blocklist.json (see blocklist.py) are
+    labeled exclude with confidence 1.0 and a "blocklist" key holding the
+    entry's description, without being decoded for or embedded by CLIP.
+    Hashes given in the manifest, report or request are used as-is; others
+    are computed. --no-blocklist turns the check off.
+
+Dedupe clusters:
+    With --report, the dedupe clusters of a harvest report are read and only
+    each cluster's canonical frame is embedded; the other members get its
+    label and confidence, with a "canonical" key naming the image it came
+    from. --spot-check classifies that fraction of members anyway and logs
+    how many agree with their canonical.
+
+Incremental runs:
+    Results are recorded in a .classify-manifest.json next to the stills
+    (see result_manifest.py). Unchanged stills scored by the same classifier
+    version come back from it without being decoded or embedded, and CLIP
+    is only loaded if some still isn't recorded. Stills that fail to decode
+    are never recorded. --no-manifest classifies everything and leaves
+    manifests untouched.
+
+    Manifests (and the embedding cache) are also checkpointed every
+    --checkpoint-interval seconds during a run, and on SIGTERM, so a run
+    that times out or crashes resumes where it left off when re-invoked on
+    the same inputs.
 
 Output:
-    JSON array of classification results with confidence scores
+    JSON array of classification results with confidence scores, or with
+    --jsonl one compact JSON result per line, written as each batch finishes
+
+Server mode:
+    With --serve the model stays loaded and requests are read as JSON lines,
+    one per line, from stdin (or from clients of a Unix socket with --socket):
+
+        {"id": 1, "dir": "OUTPUT/VideoName/1"}
+        {"id": 2, "paths": ["OUTPUT/VideoName/1/still_0001.jpg", ...], "hashes": ["1011...", ...]}
+        {"id": 3, "clusters": [{"canonical": "OUTPUT/.../still_0001.jpg",
+                                "members": ["OUTPUT/.../still_0001.jpg", ...],
+                                "hashes": ["1011...", ...]}],
+         "spot_check": 0.05}
+
+    Results stream back as JSON lines tagged with the request id, one per
+    image as soon as its batch is scored, followed by a completion line:
+
+        {"id": 1, "result": {"path": ..., "label": ..., "confidence": ...}}
+        {"id": 1, "done": true, "count": 42,
+         "stats": {"blocklisted": 0, "reused": 30, "classified": 12,
+                   "cascade_decided": 5, "cascade_embedded": 7}}
+
+    stats counts blocklisted frames, results reused from the manifests and
+    images classified; the cascade_* keys appear with --cascade.
+
+    or a single error line:
+
+        {"id": 1, "error": "Directory not found: ..."}
+
+    While a request runs, a progress event is written to stderr as a JSON
+    line after every batch (rate in images/sec, eta in seconds), so the
+    client can tell a slow run from a hung one:
+
+        {"id": 1, "progress": {"done": 64, "total": 500, "rate": 41.3, "eta": 10.6}}
+
+    One-shot runs write the same events (without "id") with --progress.
 """
 
+import argparse
+import io
+import multiprocessing
+import os
+import random
+import signal
+import socketserver
 import sys
 import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import pickle
 import numpy as np
-import torch
-from PIL import Image
-from transformers import CLIPProcessor, CLIPModel
+
+import profiling
+import startup
+from startup import import_module
+from backbones import DEFAULT_BACKBONE, get_backbone
+from backends import BACKENDS, TorchBackend, load_onnx_backend, read_model_version
+from blocklist import DEFAULT_BLOCKLIST_PATH, DEFAULT_THRESHOLD, check_blocklist, image_hash, load_blocklist
+from embedding_cache import EmbeddingCache, DEFAULT_CACHE_DIR, hash_file
+from preprocessing import DECODE_MARGIN, open_image, preprocessing_id, resize_and_crop, normalize_pixels
+from linear_head import LinearHead, head_path_for
+from phash_index import DEFAULT_MAX_DISTANCE, PhashIndex, phash_path_for
+from result_manifest import ResultManifests
+
+DEFAULT_MODEL_PATH = 'models/classifier.pkl'
+
+# Vision backbone and encoder depth (None: all layers); always the ones the
+# classifier was trained on (see match_classifier)
+_backbone = get_backbone(DEFAULT_BACKBONE)
+_depth = None
 
 # Global cache for CLIP model (lazy-loaded)
 _clip_model = None
-_clip_processor = None
 _device = None
 
+# Inference backend wrapping the model (see backends.py and load_backend)
+_backend_name = 'torch'
+_backend = None
+
+# Forked embedding workers (see start_workers), and how many to start once
+# an image actually needs CLIP (see set_workers and ensure_backend)
+_worker_pool = None
+_requested_workers = 1
+
+# Images per CLIP forward pass
+DEFAULT_BATCH_SIZE = 32
+
+# Background decode/preprocess threads, and how many batches they may run ahead
+DEFAULT_IO_THREADS = 4
+DEFAULT_PREFETCH = 2
+_io_threads = DEFAULT_IO_THREADS
+_prefetch_depth = DEFAULT_PREFETCH
+
+# Decode stills near CLIP's input size instead of at full resolution
+_fast_decode = True
+
+# Vision tower inference precision (see vision_bundle.apply_precision)
+PRECISIONS = ('fp32', 'bf16', 'int8')
+_precision = 'fp32'
+
+# Blocklist entries checked before embedding (see set_blocklist)
+_blocklist = []
+_blocklist_threshold = DEFAULT_THRESHOLD
+
+# Reuse results recorded in per-directory manifests (see result_manifest.py),
+# writing them out at least this often during a run
+DEFAULT_CHECKPOINT_INTERVAL = 30.0
+_use_manifests = True
+_checkpoint_interval = DEFAULT_CHECKPOINT_INTERVAL
+
+# pHash first stage (see phash_index.py and load_cascade); None runs CLIP on every image
+_cascade_distance = None
+_cascade = None
+
 def get_clip_model():
-    """Lazy-load and cache CLIP model"""
-    global _clip_model, _clip_processor, _device
+    """
+    Lazy-load and cache the CLIP vision tower (importing torch and
+    transformers on first call). Loads the local bundle from
+    prepare_model.py when present, so no hub access is needed.
+    """
+    global _clip_model, _device, _precision
 
     if _clip_model is None:
-        print("Loading CLIP model...", file=sys.stderr)
-        _device = 'cuda' if torch.cuda.is_available() else 'cpu'
-        _clip_model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-        _clip_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
-        _clip_model.to(_device)
-        _clip_model.eval()
-
-    return _clip_model, _clip_processor, _device
-
-def load_model(model_path='models/classifier.pkl'):
-    """Load trained classifier model"""
-    if not Path(model_path).exists():
+        torch = import_module('torch')
+        # vision_bundle imports transformers at module level; import it first so
+        # the startup profile times it as its own stage
+        import_module('transformers')
+        vision_bundle = import_module('vision_bundle')
+
+        layers = f", {_depth} layers" if _depth is not None else ''
+        print(f"Loading CLIP model ({_backbone.name}{layers}, {_precision})...", file=sys.stderr)
+        with startup.phase('load CLIP model'), profiling.stage('load CLIP model'):
+            _device = 'cuda' if torch.cuda.is_available() else 'cpu'
+            _clip_model = vision_bundle.load_clip_vision(_backbone)
+            if _depth is not None:
+                # Layers past the classifier's depth are never run
+                vision_bundle.truncate_layers(_clip_model, _depth)
+            _clip_model.to(_device)
+            _clip_model, _precision = vision_bundle.apply_precision(_clip_model, _precision, _device)
+
+    return _clip_model, _device
+
+def use_clip_model(model, device):
+    """
+    Embed with an already-loaded vision tower (train_classifier.py's)
+    instead of loading one; call before the backend is created
+    """
+    global _clip_model, _device
+    if _backend is not None and model is not _clip_model:
+        raise ValueError("The backend is already loaded, can't switch CLIP models")
+    _clip_model, _device = model, device
+
+def unload_backend():
+    """
+    Drop the backend, so the next load_backend() wraps the current CLIP
+    model at the current depth (train_classifier.py --probe-depths)
+    """
+    global _backend
+    _backend = None
+
+def load_model(model_path=DEFAULT_MODEL_PATH):
+    """
+    Load trained classifier as a LinearHead.
+
+    Prefers the NumPy head exported next to the pickle, which avoids
+    importing scikit-learn. Falls back to unpickling (and converting) the
+    LogisticRegression when the head is missing or older than the pickle.
+    """
+    model_path = Path(model_path)
+    if not model_path.exists():
         print(f"Error: Model file not found at {model_path}", file=sys.stderr)
         sys.exit(1)
 
+    head_path = head_path_for(model_path)
+    if head_path.exists() and head_path.stat().st_mtime >= model_path.stat().st_mtime:
+        return LinearHead.load(head_path)
+
+    print(f"Classifier head not found at {head_path}, loading {model_path}", file=sys.stderr)
     with open(model_path, 'rb') as f:
-        return pickle.load(f)
+        classifier = pickle.load(f)
+
+    meta_path = model_path.with_suffix('.meta.json')
+    metadata = {}
+    if meta_path.exists():
+        with open(meta_path, 'r') as f:
+            metadata = json.load(f)
+
+    return LinearHead.from_sklearn(
+        classifier, metadata.get('data_hash', ''), metadata.get('backbone', DEFAULT_BACKBONE), metadata.get('depth')
+    )
 
 def load_images(image_dir):
     """Load all images from directory"""
     image_dir = Path(image_dir)
     if not image_dir.exists():
-        print(f"Error: Directory not found: {image_dir}", file=sys.stderr)
-        sys.exit(1)
+        raise FileNotFoundError(f"Directory not found: {image_dir}")
 
     # Get all .jpg and .png files (recursively search subdirectories)
     image_paths = sorted(list(image_dir.glob('**/*.jpg')) + list(image_dir.glob('**/*.png')))
     if not image_paths:
-        print(f"Error: No images found in {image_dir}", file=sys.stderr)
-        sys.exit(1)
+        raise ValueError(f"No images found in {image_dir}")
 
     return image_paths
 
-def get_embeddings(image_paths):
+def parse_manifest(lines):
     """
-    Generate CLIP embeddings for images.
+    Parse manifest lines into image paths and the pHashes given for them.
 
-    Args:
-        image_paths: List of Path objects to image files
+    Each non-empty line is a bare path or a JSON object with a "path" key
+    (and optionally "hash"). Listed files that don't exist are skipped with
+    a warning, so they come back unclassified instead of being scored as
+    blank images.
+
+    Returns:
+        (image_paths, hashes) where hashes maps str(path) to its pHash
+    """
+    image_paths = []
+    hashes = {}
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        entry = json.loads(line) if line.startswith('{') else {'path': line}
+        image_paths.append(entry['path'])
+        if entry.get('hash'):
+            hashes[str(Path(entry['path']))] = entry['hash']
+    return resolve_paths(image_paths), hashes
+
+def resolve_paths(paths):
+    """Turn explicit path strings into Path objects, dropping missing files"""
+    image_paths = []
+    for path in paths:
+        # Keep the caller's spelling of the path so results match their lookup keys
+        image_path = Path(path)
+        if not image_path.is_file():
+            print(f"Warning: Skipping missing image {path}", file=sys.stderr)
+            continue
+        image_paths.append(image_path)
+    return image_paths
+
+def read_manifest(source):
+    """Read a manifest from a file, or from stdin when source is '-'; returns (image_paths, hashes)"""
+    if source == '-':
+        return parse_manifest(sys.stdin)
+    with open(source, 'r') as f:
+        return parse_manifest(f)
+
+def parse_clusters(records):
+    """
+    Turn cluster dicts ({"canonical": path, "members": [paths]}) into
+    (canonical, members) tuples of path strings, members excluding the canonical
+    """
+    clusters = []
+    for record in records:
+        canonical = str(record['canonical'])
+        members = [str(member) for member in record.get('members', []) if str(member) != canonical]
+        clusters.append((canonical, members))
+    return clusters
+
+def parse_cluster_hashes(records):
+    """
+    pHashes sent with cluster dicts ("hashes" parallel to "members"), keyed
+    by str(path) like split_blocklisted expects
+    """
+    return {
+        str(Path(member)): h
+        for record in records
+        for member, h in zip(record.get('members', []), record.get('hashes', []))
+        if h
+    }
+
+def read_report_clusters(report_path, root):
+    """
+    Read the dedupe clusters of a harvest report, resolving frame ids to
+    root / frame.file (the paths the harvest CLI classifies)
+
+    Returns:
+        (clusters, hashes) where hashes maps each frame path to its pHash
+    """
+    with open(report_path, 'r') as f:
+        report = json.load(f)
+
+    records = []
+    hashes = {}
+    for result in report.get('inputs', []):
+        files = {frame['id']: str(Path(root) / frame['file']) for frame in result.get('frames', [])}
+        hashes.update(
+            (files[frame['id']], frame['hash']) for frame in result.get('frames', []) if frame.get('hash')
+        )
+        for cluster in result.get('dedupe', {}).get('clusters', []):
+            records.append({
+                'canonical': files[cluster['canonicalFrameId']],
+                'members': [files[member] for member in cluster['members']]
+            })
+    return parse_clusters(records), hashes
+
+def set_blocklist(path=DEFAULT_BLOCKLIST_PATH, threshold=DEFAULT_THRESHOLD):
+    """Load the blocklist checked before embedding (path None disables it)"""
+    global _blocklist, _blocklist_threshold
+    _blocklist = load_blocklist(path) if path is not None else []
+    _blocklist_threshold = threshold
+    if _blocklist:
+        print(f"Loaded blocklist with {len(_blocklist)} entries", file=sys.stderr)
+
+def split_blocklisted(image_paths, hashes=None):
+    """
+    Separate blocklisted images from the ones to embed.
+
+    Uses the pHash given in hashes (keyed by str(path)) when there is one,
+    else computes it and adds it to hashes; images that can't be hashed are
+    left for the normal path to report.
 
     Returns:
-        numpy array of embeddings (N x 512)
+        (results, remaining) with one exclude result per blocklisted image
     """
-    model, processor, device = get_clip_model()
-    embeddings = []
+    if not _blocklist:
+        return [], image_paths
 
+    hashes = hashes if hashes is not None else {}
+    results = []
+    remaining = []
     for img_path in image_paths:
-        try:
-            # Load and preprocess image
-            image = Image.open(img_path).convert('RGB')
-            inputs = processor(images=image, return_tensors="pt").to(device)
+        frame_hash = hashes.get(str(img_path))
+        if frame_hash is None:
+            try:
+                frame_hash = hashes[str(img_path)] = image_hash(img_path)
+            except Exception:
+                remaining.append(img_path)
+                continue
+
+        entry = check_blocklist(frame_hash, _blocklist, _blocklist_threshold)
+        if entry is None:
+            remaining.append(img_path)
+            continue
+
+        results.append({
+            'path': str(img_path),
+            'label': 'exclude',
+            'confidence': 1.0,
+            'blocklist': entry.get('description', '')
+        })
+
+    return results, remaining
+
+def set_use_manifests(enabled, checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL):
+    """Enable or disable the per-directory result manifests and set how often they are checkpointed"""
+    global _use_manifests, _checkpoint_interval
+    _use_manifests = enabled
+    _checkpoint_interval = checkpoint_interval
+
+def result_version(classifier):
+    """
+    Version recorded with manifest results: the classifier's training data
+    plus everything else that changes its scores (backbone, depth,
+    precision, decode mode, backend and cascade)
+    """
+    version = read_model_version(DEFAULT_MODEL_PATH, classifier)
+    version = f"{version}:{embedding_model_id()}:{preprocessing_id(_fast_decode)}:{_backend_name}"
+    return version if _cascade is None else f"{version}:cascade{_cascade_distance}"
+
+def set_precision(precision):
+    """Choose the vision tower precision; call before the model is loaded"""
+    global _precision
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision: {precision}")
+    _precision = precision
 
-            # Extract features
-            with torch.no_grad():
-                image_features = model.get_image_features(**inputs)
+def set_backbone(name):
+    """Choose the vision backbone by registry name; call before the model is loaded"""
+    global _backbone
+    backbone = get_backbone(name)
+    if _backend is not None and backbone != _backbone:
+        raise ValueError(f"Backbone {_backbone.name} is already loaded, can't switch to {name}")
+    _backbone = backbone
 
-            # Normalize to unit vector
-            embedding = image_features.cpu().numpy()[0]
-            embedding = embedding / np.linalg.norm(embedding)
-            embeddings.append(embedding)
+def set_depth(depth):
+    """Run the vision encoder only up to this layer (None: all); call before the model is loaded"""
+    global _depth
+    if _backend is not None and depth != _depth:
+        raise ValueError(f"CLIP is already loaded with depth {_depth}, can't switch to {depth}")
+    _depth = depth
 
+def match_classifier(classifier):
+    """Embed with the backbone and layer depth the classifier was trained on"""
+    set_backbone(classifier.backbone)
+    set_depth(classifier.depth)
+
+def set_cascade(max_distance):
+    """Enable the pHash first stage with this match distance (None disables it)"""
+    global _cascade_distance
+    if max_distance is not None and not 0 <= max_distance < 64:
+        raise ValueError(f"Cascade distance must be between 0 and 63, got {max_distance}")
+    _cascade_distance = max_distance
+
+def load_cascade(classifier, model_path=DEFAULT_MODEL_PATH):
+    """
+    Load the classifier's pHash index when the cascade is enabled. Call
+    before start_workers so forked workers inherit it.
+    """
+    global _cascade
+
+    if _cascade_distance is None or _cascade is not None:
+        return
+
+    phash_path = phash_path_for(model_path)
+    if not phash_path.exists():
+        raise FileNotFoundError(f"pHash index not found at {phash_path}; retrain to export it")
+
+    _cascade = PhashIndex.load(phash_path)
+    if classifier.model_version and _cascade.model_version != classifier.model_version:
+        print(f"Warning: {phash_path} was built for different training data than the classifier",
+              file=sys.stderr)
+
+def set_backend(name):
+    """Choose the inference backend; call before the model is loaded"""
+    global _backend_name
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend: {name}")
+    _backend_name = name
+
+def load_backend(classifier=None, model_path=DEFAULT_MODEL_PATH):
+    """
+    Lazy-create and cache the inference backend.
+
+    The onnx backend bakes the classifier head into its graph, so it needs
+    the loaded classifier (and the .pkl path its export is cached next to).
+    """
+    global _backend
+
+    if _backend is None:
+        if _backend_name == 'onnx':
+            if classifier is None:
+                raise ValueError("The onnx backend needs a loaded classifier")
+            with profiling.stage('load onnx backend'):
+                _backend = load_onnx_backend(model_path, classifier, embedding_model_id(), get_clip_model)
+        else:
+            model, device = get_clip_model()
+            _backend = TorchBackend(model, device)
+
+    if classifier is not None and classifier.dim != _backend.dim:
+        raise ValueError(
+            f"Classifier expects {classifier.dim}-d embeddings but {_backbone.name} produces {_backend.dim}-d"
+        )
+
+    return _backend
+
+def embedding_model_id():
+    """
+    Embedding cache key for the current model: truncated depths and
+    reduced precisions get their own cache
+    """
+    model_id = _backbone.model_id
+    if _depth is not None:
+        model_id = f"{model_id}@L{_depth}"
+    return model_id if _precision == 'fp32' else f"{model_id}@{_precision}"
+
+def open_embedding_cache(cache_dir, dim=None):
+    """
+    Open the on-disk embedding cache for the current CLIP model and decode
+    mode. Pass the classifier's dim to open it without loading the model.
+    """
+    return EmbeddingCache(cache_dir, embedding_model_id(), dim or load_backend().dim,
+                          preprocessing_id(_fast_decode))
+
+def load_image(img_path):
+    """Read, decode, resize and center crop one image to the backbone's input size (uint8 array)"""
+    size = load_backend().image_size
+    # Read the file in one go so its I/O is profiled separately from decoding
+    with profiling.stage('read', 1):
+        data = io.BytesIO(Path(img_path).read_bytes())
+    with profiling.stage('decode', 1):
+        image = open_image(data, fast=_fast_decode, target=size * DECODE_MARGIN)
+    with profiling.stage('resize + crop', 1):
+        return resize_and_crop(image, size)
+
+def embed_loaded(pixel_values, ok):
+    """
+    Normalize and run one CLIP forward pass over loaded images.
+
+    With the cascade enabled, images the pHash index decides confidently
+    are scored by it and left out of the forward pass.
+
+    Args:
+        pixel_values: uint8 crops for the images that loaded successfully
+        ok: Boolean mask over the whole batch marking which images loaded
+
+    Returns:
+        (embeddings, probabilities, embedded) where embedded marks the images
+        CLIP embedded and all other rows are zero vectors. probabilities holds
+        the cascade's and backend's scores (NaN for images neither scored), or
+        is None when nothing was scored.
+    """
+    backend = load_backend()
+    embeddings = np.zeros((len(ok), backend.dim), dtype=np.float32)
+    probabilities = np.full(len(ok), np.nan, dtype=np.float32)
+    embedded = ok.copy()
+    scored = False
+
+    if pixel_values and _cascade is not None:
+        with profiling.stage('cascade', len(pixel_values)):
+            early = _cascade.predict(pixel_values, _cascade_distance)
+        decided = ~np.isnan(early)
+        probabilities[ok] = early
+        embedded[ok] = ~decided
+        pixel_values = [pixels for pixels, skip in zip(pixel_values, decided) if not skip]
+        scored = True
+
+    if pixel_values:
+        # Normalize the whole stacked batch in one vectorized pass, then run the
+        # backend; embeddings come back as unit vectors
+        with profiling.stage('normalize', len(pixel_values)):
+            pixels = normalize_pixels(np.stack(pixel_values))
+        with profiling.stage('forward', len(pixel_values)):
+            features, scores = backend.run(pixels)
+        embeddings[embedded] = features
+
+        if scores is not None:
+            probabilities[embedded] = scores
+            scored = True
+
+    return embeddings, probabilities if scored else None, embedded
+
+def collect_loaded(image_paths, loaders):
+    """Gather per-image load results (callables), warning about failures"""
+    pixel_values = []
+    ok = np.zeros(len(image_paths), dtype=bool)
+
+    for i, (img_path, load) in enumerate(zip(image_paths, loaders)):
+        try:
+            pixel_values.append(load())
+            ok[i] = True
         except Exception as e:
             print(f"Warning: Failed to process {img_path}: {e}", file=sys.stderr)
-            # Use zero vector as fallback for failed images
-            embeddings.append(np.zeros(512))
 
-    return np.array(embeddings)
+    return pixel_values, ok
 
-def classify_images(image_dir):
-    """Classify all images in directory and return results with confidence"""
-    # Load model
-    model = load_model()
+def embed_batch(image_paths):
+    """
+    Decode, preprocess and embed a batch of images in the calling thread.
+
+    Returns (embeddings, probabilities, embedded) as embed_loaded does;
+    embedded[i] is False for images that failed to load or that the cascade
+    decided, and their rows are zero vectors.
+    """
+    pixel_values, ok = collect_loaded(
+        image_paths, [lambda p=img_path: load_image(p) for img_path in image_paths]
+    )
+    return embed_loaded(pixel_values, ok)
+
+def prefetch(plans, image_paths, io_threads, depth):
+    """
+    Decode and preprocess upcoming batches on a thread pool.
+
+    Keeps up to depth batches queued ahead of the one being embedded, so
+    file reads (slow on network volumes) and JPEG decode overlap the CLIP
+    forward pass instead of leaving the CPU idle.
+
+    Yields:
+        (plan, futures) with one future per pending image of the batch
+    """
+    with ThreadPoolExecutor(max_workers=io_threads, thread_name_prefix='decode') as pool:
+        window = deque()
+        for plan in plans:
+            start, _, _, pending = plan
+            window.append((plan, [pool.submit(load_image, image_paths[start + i]) for i in pending]))
+            if len(window) > depth:
+                yield window.popleft()
+        while window:
+            yield window.popleft()
+
+def dispatch(plans, image_paths, depth):
+    """
+    Hand batches to the worker pool, keeping at most depth of them in flight,
+    so an interrupted run doesn't leave the rest of the corpus queued.
+
+    Yields:
+        (plan, result) with the AsyncResult of the batch's pending images
+        (None when nothing is pending), in input order
+    """
+    window = deque()
+    for plan in plans:
+        start, _, _, pending = plan
+        result = _worker_pool.apply_async(
+            _embed_in_worker, ([image_paths[start + i] for i in pending],)
+        ) if pending else None
+        window.append((plan, result))
+        if len(window) > depth:
+            yield window.popleft()
+    while window:
+        yield window.popleft()
 
-    # Load images
-    image_paths = load_images(image_dir)
+def set_io_options(io_threads=DEFAULT_IO_THREADS, prefetch_depth=DEFAULT_PREFETCH, fast_decode=True):
+    """Configure image decoding and the background decode pool used by iter_embeddings"""
+    global _io_threads, _prefetch_depth, _fast_decode
+    _io_threads = io_threads
+    _prefetch_depth = prefetch_depth
+    _fast_decode = fast_decode
 
-    # Get embeddings (CLIP features)
-    embeddings = get_embeddings(image_paths)
+def available_cpus():
+    """CPU cores this process may run on"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
 
-    # Predict labels and probabilities
-    predictions = model.predict(embeddings)
-    probabilities = model.predict_proba(embeddings)
+def _init_worker(threads):
+    """Pool initializer: give each worker its own slice of the cores"""
+    import_module('torch').set_num_threads(threads)
+
+def _embed_in_worker(paths):
+    """Pool task: embed one batch using the CLIP model inherited from the parent"""
+    return embed_batch(paths)
+
+def start_workers(workers):
+    """
+    Fork a pool of embedding workers.
+
+    CLIP is loaded once in the parent before forking, so every worker shares
+    the weights copy-on-write instead of loading its own copy. Each worker
+    gets cores // workers intra-op threads so they don't oversubscribe.
+    """
+    global _worker_pool
+
+    if workers <= 1 or _worker_pool is not None:
+        return
+
+    if _backend_name != 'torch':
+        print("Warning: --workers only applies to the torch backend, using a single process", file=sys.stderr)
+        return
+
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        print("Warning: --workers needs fork() support, using a single process", file=sys.stderr)
+        return
+
+    _, device = get_clip_model()
+    if device != 'cpu':
+        print(f"Warning: --workers is CPU-only, using a single process on {device}", file=sys.stderr)
+        return
+
+    threads = max(1, available_cpus() // workers)
+    _worker_pool = multiprocessing.get_context('fork').Pool(
+        workers, initializer=_init_worker, initargs=(threads,)
+    )
+    print(f"Started {workers} embedding workers ({threads} threads each)", file=sys.stderr)
+
+def set_workers(workers):
+    """Request worker processes, started by ensure_backend once an image needs CLIP"""
+    global _requested_workers
+    _requested_workers = workers
+
+def ensure_backend(classifier):
+    """
+    Load the backend and start the requested workers, if not done yet.
+
+    One-shot runs only get here once an image misses the manifests and the
+    blocklist, so a fully recorded rerun never loads torch or CLIP.
+    """
+    global _requested_workers
+    load_backend(classifier)
+    if _requested_workers > 1:
+        start_workers(_requested_workers)
+        _requested_workers = 1
+    startup.ready()
+
+def stop_workers(terminate=False):
+    """
+    Shut down the worker pool, if one was started. terminate kills the
+    workers instead of letting them finish their queued batches; use it when
+    the run failed or was interrupted.
+    """
+    global _worker_pool
+
+    if _worker_pool is not None:
+        if terminate:
+            _worker_pool.terminate()
+        else:
+            _worker_pool.close()
+        _worker_pool.join()
+        _worker_pool = None
+
+def plan_batches(image_paths, batch_size, cache=None):
+    """
+    Split image_paths into batches and look each image up in the cache.
+
+    Yields:
+        (start, keys, cached, pending) per batch, where cached maps batch
+        offsets to cached embeddings and pending lists offsets still to embed
+    """
+    for start in range(0, len(image_paths), batch_size):
+        batch_paths = image_paths[start:start + batch_size]
+        keys = [None] * len(batch_paths)
+        cached = {}
+        pending = []
+
+        for i, img_path in enumerate(batch_paths):
+            if cache is not None:
+                with profiling.stage('cache lookup', 1):
+                    try:
+                        keys[i] = hash_file(img_path)
+                    except OSError:
+                        pass
+                    embedding = cache.get(keys[i])
+                if embedding is not None:
+                    cached[i] = embedding
+                    continue
+            pending.append(i)
+
+        yield start, keys, cached, pending
+
+def iter_embeddings(image_paths, batch_size=DEFAULT_BATCH_SIZE, cache=None, counts=None):
+    """
+    Generate CLIP embeddings batch by batch, in input order.
+
+    Images whose content hash is already in the embedding cache skip CLIP
+    entirely, as do images the cascade decides; the rest of each batch is
+    embedded with one forward pass, spread across the worker pool when
+    start_workers() was called.
+
+    Yields:
+        (start, embeddings, probabilities, valid, keys) for
+        image_paths[start:start + len(embeddings)], where probabilities are
+        the backend's classifier scores (NaN for images it didn't score, e.g.
+        cache hits) or None, valid marks the images that were embedded,
+        cached or decided by the cascade (the rest failed to load and have
+        zero vectors), and keys are their content hashes (None without a cache)
+
+    With the cascade enabled, how many images it decided and how many went
+    to CLIP are added to counts (if given, as 'cascade_decided' and
+    'cascade_embedded') and to the profile's counters.
+    """
+    dim = load_backend().dim
+    embedded = 0
+    start_time = time.perf_counter()
+
+    # Per-stage counts for the cascade summary, and time spent producing
+    # embeddings (decode wait excluded) to price the CLIP passes it skipped
+    decided_early = 0
+    embed_seconds = 0.0
+
+    plans = plan_batches(image_paths, batch_size, cache)
+    in_workers = _worker_pool is not None
+    if in_workers:
+        # Workers decode their own batches; keep each one busy plus a few
+        # batches queued, and take results back in input order
+        loaded = dispatch(plans, image_paths, _worker_pool._processes + _prefetch_depth)
+    else:
+        loaded = prefetch(plans, image_paths, _io_threads, _prefetch_depth)
+
+    for (start, keys, cached, pending), work in loaded:
+        batch = np.zeros((len(keys), dim), dtype=np.float32)
+        valid = np.zeros(len(keys), dtype=bool)
+        for i, embedding in cached.items():
+            batch[i] = embedding
+            valid[i] = True
+        probabilities = None
+
+        if pending and in_workers:
+            embed_start = time.perf_counter()
+            computed, scores, ok = work.get()
+            embed_seconds += time.perf_counter() - embed_start
+        elif pending:
+            pixel_values, ok = collect_loaded(
+                [image_paths[start + i] for i in pending],
+                [future.result for future in work]
+            )
+            embed_start = time.perf_counter()
+            computed, scores, ok = embed_loaded(pixel_values, ok)
+            embed_seconds += time.perf_counter() - embed_start
+
+        if pending:
+            batch[pending] = computed
+            valid[pending] = ok
+            embedded += int(ok.sum())
+
+            if scores is not None:
+                probabilities = np.full(len(keys), np.nan, dtype=np.float32)
+                probabilities[pending] = scores
+                valid[pending] |= ~np.isnan(scores)
+                decided_early += int((~ok & ~np.isnan(scores)).sum())
+
+            if cache is not None:
+                for j, i in enumerate(pending):
+                    if ok[j]:
+                        cache.put(keys[i], computed[j])
+
+        yield start, batch, probabilities, valid, keys
+
+    elapsed = time.perf_counter() - start_time
+    rate = embedded / elapsed if elapsed > 0 else 0.0
+    workers = _worker_pool._processes if in_workers else 1
+    print(
+        f"Embedded {embedded} images in {elapsed:.1f}s "
+        f"({rate:.1f} images/sec, batch size {batch_size}, {workers} worker(s), {_backend_name} {_precision})",
+        file=sys.stderr
+    )
+
+    if _cascade is not None:
+        # Cost of the skipped forward passes at this run's per-image embedding time
+        per_image = embed_seconds / embedded if embedded else 0.0
+        total = decided_early + embedded
+        share = decided_early / total if total else 0.0
+        print(
+            f"Cascade: {decided_early} images decided by pHash ({share:.0%}), {embedded} sent to CLIP; "
+            f"~{decided_early * per_image:.1f}s of CLIP time saved",
+            file=sys.stderr
+        )
+        profiling.count('cascade decided', decided_early)
+        profiling.count('cascade embedded', embedded)
+        if counts is not None:
+            counts['cascade_decided'] = counts.get('cascade_decided', 0) + decided_early
+            counts['cascade_embedded'] = counts.get('cascade_embedded', 0) + embedded
+
+    if cache is not None:
+        cache.flush()
+        print(cache.summary(), file=sys.stderr)
+
+def get_embeddings(image_paths, batch_size=DEFAULT_BATCH_SIZE, cache=None):
+    """
+    Generate CLIP embeddings for images.
+
+    Args:
+        image_paths: List of Path objects to image files
+        batch_size: Number of images per forward pass
+        cache: Optional EmbeddingCache to consult and populate
+
+    Returns:
+        numpy array of embeddings (N x 512), in the same order as image_paths.
+        Images that fail to load get a zero vector.
+    """
+    batches = [batch for _, batch, _, _, _ in iter_embeddings(image_paths, batch_size=batch_size, cache=cache)]
+    if not batches:
+        return np.zeros((0, load_backend().dim), dtype=np.float32)
+    return np.concatenate(batches)
+
+def score_embeddings(classifier, image_paths, embeddings, probabilities=None):
+    """
+    Turn embeddings into result dicts with label and confidence.
+
+    Rows already scored by the backend (non-NaN probabilities) keep its
+    score; the rest go through the classifier head in one pass.
+    """
+    with profiling.stage('head', len(embeddings)):
+        if probabilities is None:
+            positive = classifier.predict_proba(embeddings)
+        else:
+            positive = probabilities.copy()
+            missing = np.isnan(positive)
+            if missing.any():
+                positive[missing] = classifier.predict_proba(embeddings[missing])
+
+        # Labels and confidence for the predicted class
+        predictions, confidences = classifier.decide(positive)
 
     # Build results with confidence
     results = []
-    for i, (img_path, pred) in enumerate(zip(image_paths, predictions)):
-        confidence = float(probabilities[i][pred])  # Confidence for predicted class
+    for img_path, pred, confidence in zip(image_paths, predictions, confidences):
         results.append({
             'path': str(img_path),  # Full path for matching with TypeScript
             'label': 'keep' if pred == 0 else 'exclude',
-            'confidence': confidence
+            'confidence': float(confidence)
         })
 
     return results
 
+def iter_classifications(classifier, image_paths, batch_size=DEFAULT_BATCH_SIZE, cache=None, hashes=None,
+                         counts=None):
+    """
+    Classify images batch by batch, yielding each batch's results as soon as
+    it is scored. Blocklisted images and results recorded in the manifests
+    come first, one batch each, and are never embedded; hashes optionally
+    maps str(path) to pHashes already known. The backend is only loaded if
+    something is left to embed.
+
+    counts, if given, is a dict filled with how many images were
+    'blocklisted', 'reused' from the manifests and 'classified', plus the
+    cascade's counts (see iter_embeddings).
+    """
+    hashes = dict(hashes or {})
+    blocked = []
+
+    manifests = None
+    recorded = []
+    if _use_manifests:
+        manifests = ResultManifests(result_version(classifier))
+        with profiling.stage('manifest lookup', len(image_paths)):
+            recorded, image_paths = manifests.lookup(image_paths)
+            # Recorded pHashes spare the blocklist check from decoding reused stills
+            for path, phash in manifests.phashes([result['path'] for result in recorded]).items():
+                hashes.setdefault(path, phash)
+
+    if _blocklist:
+        with profiling.stage('blocklist', len(recorded) + len(image_paths)):
+            blocked, unblocked = split_blocklisted([Path(result['path']) for result in recorded] + list(image_paths),
+                                                   hashes)
+        if blocked:
+            unblocked = {str(img_path) for img_path in unblocked}
+            recorded = [result for result in recorded if result['path'] in unblocked]
+            image_paths = [img_path for img_path in image_paths if str(img_path) in unblocked]
+            print(f"Blocklist: {len(blocked)} images excluded without embedding", file=sys.stderr)
+            yield blocked
+
+    if counts is not None:
+        counts.update(blocklisted=len(blocked), reused=len(recorded), classified=len(image_paths))
+
+    if recorded:
+        print(f"Manifest: {len(recorded)} unchanged images reused, {len(image_paths)} to classify", file=sys.stderr)
+        yield recorded
+
+    if not image_paths:
+        if manifests is not None:
+            manifests.remember_phashes(hashes)
+            manifests.save()
+        return
+
+    ensure_backend(classifier)
+    last_checkpoint = time.monotonic()
+    try:
+        for start, embeddings, probabilities, valid, keys in iter_embeddings(image_paths, batch_size=batch_size,
+                                                                             cache=cache, counts=counts):
+            batch_paths = image_paths[start:start + len(embeddings)]
+            results = score_embeddings(classifier, batch_paths, embeddings, probabilities)
+            if manifests is not None:
+                with profiling.stage('manifest record', int(valid.sum())):
+                    # Stills that failed to load get a placeholder result; leave them to be retried
+                    manifests.record(
+                        [result for result, ok in zip(results, valid) if ok],
+                        digests={str(img_path): key for img_path, key in zip(batch_paths, keys) if key},
+                        phashes=hashes
+                    )
+                if time.monotonic() - last_checkpoint >= _checkpoint_interval:
+                    # A timeout or crash from here on loses at most one interval of work
+                    manifests.save()
+                    if cache is not None:
+                        cache.flush()
+                    last_checkpoint = time.monotonic()
+            yield results
+    finally:
+        # Keep what was scored and embedded even if the run stops early
+        if manifests is not None:
+            manifests.remember_phashes(hashes)
+            manifests.save()
+        if cache is not None:
+            cache.flush()
+
+def iter_cluster_classifications(classifier, clusters, spot_check=0.0, batch_size=DEFAULT_BATCH_SIZE, cache=None,
+                                 hashes=None, counts=None):
+    """
+    Classify only each cluster's canonical image and copy its result to the
+    other members, yielding each batch's results as soon as it is scored.
+
+    A spot_check fraction of members (sampled with a fixed seed) is
+    classified anyway and keeps its own result; how many agree with their
+    canonical is logged to stderr. counts is filled as by iter_classifications.
+    """
+    members = [(member, canonical) for canonical, cluster_members in clusters for member in cluster_members]
+    checked = dict(random.Random(0).sample(members, round(len(members) * spot_check)))
+    followers = {
+        canonical: [member for member in cluster_members if member not in checked]
+        for canonical, cluster_members in clusters
+    }
+
+    image_paths = resolve_paths([canonical for canonical, _ in clusters] + list(checked))
+    labels = {}
+    checked_labels = {}
+    counts = {} if counts is None else counts
+    propagated = 0
+
+    for batch_results in iter_classifications(classifier, image_paths, batch_size=batch_size, cache=cache,
+                                              hashes=hashes, counts=counts):
+        results = []
+        for result in batch_results:
+            results.append(result)
+            if result['path'] in checked:
+                # A blocklisted member says nothing about the classifier's agreement
+                if 'blocklist' not in result:
+                    checked_labels[result['path']] = result['label']
+                continue
+
+            labels[result['path']] = result['label']
+            for member in followers.get(result['path'], []):
+                results.append(dict(result, path=member, canonical=result['path']))
+                propagated += 1
+        yield results
+
+    # Compared only now: blocklisted and manifest-reused results are yielded
+    # first, so a member can arrive before its canonical
+    compared = len(checked_labels)
+    agreed = sum(labels.get(checked[member]) == label for member, label in checked_labels.items())
+
+    print(f"Dedupe: {len(clusters)} clusters, {counts.get('classified', 0)} images classified, "
+          f"{counts.get('reused', 0)} reused from manifests, {counts.get('blocklisted', 0)} blocklisted, "
+          f"{propagated} labels copied from canonicals", file=sys.stderr)
+    if checked:
+        skipped = f" ({len(checked) - compared} blocklisted)" if compared < len(checked) else ''
+        print(f"Spot check: {agreed}/{compared} members agree with their canonical's label{skipped}", file=sys.stderr)
+
+def classify_paths(classifier, image_paths, batch_size=DEFAULT_BATCH_SIZE, cache=None):
+    """Classify a list of image paths with an already-loaded classifier"""
+    results = []
+    for batch_results in iter_classifications(classifier, image_paths, batch_size=batch_size, cache=cache):
+        results.extend(batch_results)
+    return results
+
+def prepare_classification(image_dir=None, cache_dir=DEFAULT_CACHE_DIR, image_paths=None):
+    """
+    Load the classifier, image list and embedding cache for a one-shot run.
+    CLIP itself is loaded later, and only if an image needs embedding (see
+    ensure_backend).
+    """
+    # Load model
+    with startup.phase('load classifier'), profiling.stage('load classifier'):
+        model = load_model()
+    match_classifier(model)
+
+    # Load images (before CLIP, so a bad directory fails fast)
+    if image_paths is None:
+        image_paths = load_images(image_dir)
+
+    load_cascade(model)
+    cache = open_embedding_cache(cache_dir, model.dim) if cache_dir else None
+    return model, image_paths, cache
+
+def classify_images(image_dir=None, batch_size=DEFAULT_BATCH_SIZE, cache_dir=DEFAULT_CACHE_DIR, image_paths=None):
+    """
+    Classify images and return results with confidence.
+
+    Classifies every image under image_dir, or exactly the given
+    image_paths when provided. Pass cache_dir=None to disable the
+    embedding cache.
+    """
+    model, image_paths, cache = prepare_classification(image_dir, cache_dir, image_paths)
+    return classify_paths(model, image_paths, batch_size=batch_size, cache=cache)
+
+def iter_with_progress(batches, total, request_id=None):
+    """
+    Pass result batches through, writing a progress event to stderr before
+    the first and after each one
+    """
+    start_time = time.perf_counter()
+    done = 0
+
+    def report():
+        elapsed = time.perf_counter() - start_time
+        rate = done / elapsed if elapsed > 0 else 0.0
+        event = {'progress': {
+            'done': done,
+            'total': total,
+            'rate': round(rate, 2),
+            'eta': round((total - done) / rate, 1) if rate > 0 else None
+        }}
+        if request_id is not None:
+            event['id'] = request_id
+        write_jsonl(sys.stderr, [event])
+
+    report()
+    for batch_results in batches:
+        # Propagated cluster members and the like count too; never report more than the total
+        done = min(total, done + len(batch_results))
+        report()
+        yield batch_results
+
+def write_jsonl(stream, records):
+    """Write compact JSON lines and flush so the reader sees them immediately"""
+    for record in records:
+        stream.write(json.dumps(record, separators=(',', ':')) + '\n')
+    stream.flush()
+
+class ClassifierServer:
+    """Keeps CLIP and the classifier loaded and answers JSON-lines requests"""
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, cache_dir=DEFAULT_CACHE_DIR, spot_check=0.0):
+        self.batch_size = batch_size
+        self.spot_check = spot_check
+        with startup.phase('load classifier'), profiling.stage('load classifier'):
+            self.classifier = load_model()
+        match_classifier(self.classifier)
+        load_backend(self.classifier)
+        load_cascade(self.classifier)
+        self.cache = open_embedding_cache(cache_dir) if cache_dir else None
+        print("Classifier server ready", file=sys.stderr)
+
+    def handle(self, line, emit):
+        """
+        Process one request line.
+
+        Calls emit(records) with lists of response dicts as results become
+        available: one {"id", "result"} per image, then {"id", "done", "count",
+        "stats"} or a single {"id", "error"}. stats holds the counts filled by
+        iter_classifications.
+        """
+        request_id = None
+        counts = {}
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            if 'clusters' in request:
+                spot_check = request.get('spot_check', self.spot_check)
+                if (isinstance(spot_check, bool) or not isinstance(spot_check, (int, float))
+                        or not 0.0 <= spot_check <= 1.0):
+                    raise ValueError(f"spot_check must be a number between 0 and 1, got {spot_check!r}")
+                clusters = parse_clusters(request['clusters'])
+                total = sum(1 + len(members) for _, members in clusters)
+                batches = iter_cluster_classifications(
+                    self.classifier, clusters, spot_check=spot_check,
+                    batch_size=self.batch_size, cache=self.cache,
+                    hashes=parse_cluster_hashes(request['clusters']), counts=counts
+                )
+            else:
+                hashes = None
+                if 'paths' in request:
+                    image_paths = resolve_paths(request['paths'])
+                    if 'hashes' in request:
+                        hashes = {str(Path(path)): h for path, h in zip(request['paths'], request['hashes']) if h}
+                else:
+                    image_paths = load_images(request['dir'])
+                total = len(image_paths)
+                batches = iter_classifications(self.classifier, image_paths, batch_size=self.batch_size,
+                                               cache=self.cache, hashes=hashes, counts=counts)
+
+            count = 0
+            for batch_results in iter_with_progress(batches, total, request_id):
+                emit([{'id': request_id, 'result': result} for result in batch_results])
+                count += len(batch_results)
+            emit([{'id': request_id, 'done': True, 'count': count, 'stats': counts}])
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+            emit([{'id': request_id, 'error': str(e)}])
+
+    def serve_stdio(self):
+        """Serve requests from stdin until it is closed"""
+        for line in sys.stdin:
+            if not line.strip():
+                continue
+            self.handle(line, lambda records: write_jsonl(sys.stdout, records))
+
+    def serve_socket(self, socket_path):
+        """Serve requests from clients of a Unix socket, one at a time"""
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                stream = io.TextIOWrapper(self.wfile, encoding='utf-8')
+                for line in self.rfile:
+                    if not line.strip():
+                        continue
+                    server.handle(line.decode('utf-8'), lambda records: write_jsonl(stream, records))
+
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+        with socketserver.UnixStreamServer(socket_path, Handler) as unix_server:
+            print(f"Listening on {socket_path}", file=sys.stderr)
+            try:
+                unix_server.serve_forever()
+            finally:
+                os.unlink(socket_path)
+
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python classify_images.py <image_directory>", file=sys.stderr)
+    parser = argparse.ArgumentParser(description='Classify images using trained CLIP-based classifier')
+    parser.add_argument('image_dir', type=str, nargs='?', help='Directory containing images to classify')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'Images per CLIP forward pass (default: {DEFAULT_BATCH_SIZE})')
+    parser.add_argument('--cache-dir', type=str, default=str(DEFAULT_CACHE_DIR),
+                        help='Embedding cache directory (default: ../models/embedding-cache)')
+    parser.add_argument('--no-cache', action='store_true', help='Disable the embedding cache')
+    parser.add_argument('--paths-from', type=str, metavar='MANIFEST',
+                        help="Classify only the images listed in MANIFEST ('-' reads stdin)")
+    parser.add_argument('--report', type=str, metavar='REPORT',
+                        help="Classify the frames of a harvest report, embedding only each dedupe cluster's canonical")
+    parser.add_argument('--root', type=str, default='OUTPUT',
+                        help='With --report, the output root its frame paths are relative to (default: OUTPUT)')
+    parser.add_argument('--spot-check', type=float, default=0.0, metavar='FRACTION',
+                        help='Fraction of duplicate frames to classify anyway, checking the copied labels (default: 0)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Embedding worker processes sharing one copy of CLIP (default: 1)')
+    parser.add_argument('--io-threads', type=int, default=DEFAULT_IO_THREADS,
+                        help=f'Threads decoding and preprocessing upcoming batches (default: {DEFAULT_IO_THREADS})')
+    parser.add_argument('--prefetch', type=int, default=DEFAULT_PREFETCH,
+                        help=f'Batches to decode ahead of the one in CLIP (default: {DEFAULT_PREFETCH})')
+    parser.add_argument('--full-decode', action='store_true',
+                        help='Decode stills at full resolution instead of near CLIP input size')
+    parser.add_argument('--precision', choices=PRECISIONS, default='fp32',
+                        help='Vision tower precision: int8 (dynamic quantization, CPU) or bf16 (autocast) '
+                             'trade a little accuracy for speed (default: fp32)')
+    parser.add_argument('--backend', choices=BACKENDS, default='torch',
+                        help='Inference backend: torch (default) or onnx (CLIP + classifier as one '
+                             'onnxruntime graph, exported next to the classifier on first use)')
+    parser.add_argument('--cascade', action='store_true',
+                        help='Decide images that nearly match labeled training images by pHash '
+                             'and run CLIP only on the rest (needs classifier.phash.npz from training)')
+    parser.add_argument('--cascade-distance', type=int, default=DEFAULT_MAX_DISTANCE,
+                        help=f'Max pHash Hamming distance (of 64 bits) for a confident match '
+                             f'(default: {DEFAULT_MAX_DISTANCE})')
+    parser.add_argument('--blocklist', type=str, default=str(DEFAULT_BLOCKLIST_PATH),
+                        help='pHash blocklist; matching frames are excluded without embedding (default: ../models/blocklist.json)')
+    parser.add_argument('--blocklist-distance', type=int, default=DEFAULT_THRESHOLD,
+                        help=f'Max Hamming distance to a blocklist entry (default: {DEFAULT_THRESHOLD})')
+    parser.add_argument('--no-blocklist', action='store_true', help='Embed blocklisted frames like any other')
+    parser.add_argument('--no-manifest', action='store_true',
+                        help='Classify every image instead of reusing results recorded in .classify-manifest.json')
+    parser.add_argument('--checkpoint-interval', type=float, default=DEFAULT_CHECKPOINT_INTERVAL, metavar='SECONDS',
+                        help=f'Write manifests and the embedding cache at least this often during a run, '
+                             f'so an interrupted run can resume (default: {DEFAULT_CHECKPOINT_INTERVAL:g})')
+    parser.add_argument('--progress', action='store_true',
+                        help='Write a JSON progress event (done, total, rate, eta) to stderr after each batch')
+    parser.add_argument('--jsonl', action='store_true',
+                        help='Stream one compact JSON result per line as each batch is scored')
+    parser.add_argument('--serve', action='store_true',
+                        help='Keep the model loaded and answer JSON-lines requests on stdin/stdout')
+    parser.add_argument('--socket', type=str, help='With --serve, listen on this Unix socket instead of stdin')
+    parser.add_argument('--startup-profile', action='store_true',
+                        help='Print an import-time breakdown to stderr once the model is loaded')
+    parser.add_argument('--profile', type=str, metavar='PATH',
+                        help="Write per-stage wall/CPU time, item counts and peak RSS as JSON to PATH ('-' for stderr)")
+    args = parser.parse_args()
+
+    if args.startup_profile:
+        startup.enable()
+
+    if args.profile:
+        profiling.enable(args.profile)
+
+    if args.batch_size <= 0:
+        print("Error: --batch-size must be positive", file=sys.stderr)
+        sys.exit(1)
+
+    if args.workers <= 0:
+        print("Error: --workers must be positive", file=sys.stderr)
+        sys.exit(1)
+
+    if args.checkpoint_interval <= 0:
+        print("Error: --checkpoint-interval must be positive", file=sys.stderr)
+        sys.exit(1)
+
+    if not 0.0 <= args.spot_check <= 1.0:
+        print("Error: --spot-check must be between 0 and 1", file=sys.stderr)
         sys.exit(1)
 
-    image_dir = sys.argv[1]
+    if args.io_threads <= 0 or args.prefetch < 0:
+        print("Error: --io-threads must be positive and --prefetch non-negative", file=sys.stderr)
+        sys.exit(1)
 
+    set_io_options(args.io_threads, args.prefetch, fast_decode=not args.full_decode)
+    set_precision(args.precision)
+    set_backend(args.backend)
+    set_blocklist(None if args.no_blocklist else args.blocklist, args.blocklist_distance)
+    set_use_manifests(not args.no_manifest, args.checkpoint_interval)
+
+    # Turn the harvest CLI's kill on timeout into a normal exit, so the last
+    # scored batches reach the manifests and embedding cache
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+
+    try:
+        set_cascade(args.cascade_distance if args.cascade else None)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.backend != 'torch' and (args.precision != 'fp32' or args.workers > 1):
+        print("Error: --precision and --workers only apply to the torch backend", file=sys.stderr)
+        sys.exit(1)
+
+    if [args.serve, bool(args.image_dir), bool(args.paths_from), bool(args.report)].count(True) != 1:
+        print("Usage: python classify_images.py <image_directory> | --paths-from <manifest> | --report <report.json> | --serve",
+              file=sys.stderr)
+        sys.exit(1)
+
+    cache_dir = None if args.no_cache else args.cache_dir
+
+    if args.serve:
+        server = ClassifierServer(batch_size=args.batch_size, cache_dir=cache_dir, spot_check=args.spot_check)
+        start_workers(args.workers)
+        startup.ready()
+        completed = False
+        try:
+            if args.socket:
+                server.serve_socket(args.socket)
+            else:
+                server.serve_stdio()
+            completed = True
+        finally:
+            # On SIGTERM or an error, don't wait for queued batches
+            stop_workers(terminate=not completed)
+        return
+
+    completed = False
     try:
-        results = classify_images(image_dir)
-        print(json.dumps(results, indent=2))
+        clusters, hashes = read_report_clusters(args.report, args.root) if args.report else (None, None)
+        if args.paths_from:
+            image_paths, hashes = read_manifest(args.paths_from)
+        else:
+            image_paths = None
+        # Cluster runs resolve their own paths; an empty list skips the directory scan
+        model, image_paths, cache = prepare_classification(args.image_dir, cache_dir,
+                                                           [] if clusters is not None else image_paths)
+        # CLIP (and the workers) load on the first image that needs embedding,
+        # which also ends the startup profile
+        set_workers(args.workers)
+
+        if clusters is not None:
+            batches = iter_cluster_classifications(model, clusters, args.spot_check,
+                                                   batch_size=args.batch_size, cache=cache, hashes=hashes)
+        else:
+            batches = iter_classifications(model, image_paths, batch_size=args.batch_size, cache=cache,
+                                           hashes=hashes)
+
+        if args.progress:
+            total = (sum(1 + len(members) for _, members in clusters) if clusters is not None
+                     else len(image_paths))
+            batches = iter_with_progress(batches, total)
+
+        if args.jsonl:
+            for batch_results in batches:
+                write_jsonl(sys.stdout, batch_results)
+        else:
+            print(json.dumps([result for batch_results in batches for result in batch_results], indent=2))
+        completed = True
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
+    finally:
+        # On SIGTERM or an error, don't wait for queued batches
+        stop_workers(terminate=not completed)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,183 @@
+"""
+Persistent on-disk cache of image embeddings.
+
+Embeddings are keyed by the SHA-256 of the image file contents, so renamed
+or re-extracted stills with identical bytes are never embedded twice. Each
+embedding model and preprocessing tag (preprocessing.preprocessing_id: the
+decode mode and preprocessing version) gets its own subdirectory containing:
+
+    embeddings.f32   Append-only float32 matrix (rows x dim), memory-mapped for reads
+    index.json       Maps content hash -> row number
+
+Used by both classify_images.py and train_classifier.py.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sys
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locking, single writer assumed
+    fcntl = None
+
+INDEX_VERSION = 2
+
+# Default cache location (relative to script location)
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent.parent / 'models' / 'embedding-cache'
+
+
+def hash_file(path, chunk_size=1 << 20):
+    """Compute SHA-256 of a file's contents"""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Appendable, memory-mapped store of unit-normalized embeddings.
+
+    Lookups go through get(); new embeddings are buffered by put() and
+    written to disk by flush(). Hit and miss counts are tracked for
+    reporting.
+    """
+
+    def __init__(self, cache_dir, model_id, dim, preprocessing=None):
+        self.model_id = model_id
+        self.dim = dim
+        self.preprocessing = preprocessing
+        name = model_id if preprocessing is None else f"{model_id}@{preprocessing}"
+        self.dir = Path(cache_dir) / re.sub(r'[^A-Za-z0-9._-]+', '_', name)
+        self.matrix_path = self.dir / 'embeddings.f32'
+        self.index_path = self.dir / 'index.json'
+        self.lock_path = self.dir / 'index.lock'
+
+        self.hits = 0
+        self.misses = 0
+
+        self._index = {}
+        self._pending = {}
+        self._matrix = None
+
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._index = self._read_index()
+
+    @property
+    def _row_bytes(self):
+        return self.dim * 4
+
+    def _row_count(self):
+        """Number of complete rows in the matrix file"""
+        if not self.matrix_path.exists():
+            return 0
+        return self.matrix_path.stat().st_size // self._row_bytes
+
+    def _read_index(self):
+        """Load index from disk, dropping rows that point past the matrix end"""
+        if not self.index_path.exists():
+            return {}
+
+        try:
+            with open(self.index_path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Ignoring unreadable embedding cache index {self.index_path}: {e}", file=sys.stderr)
+            return {}
+
+        if (data.get('model_id') != self.model_id or data.get('dim') != self.dim
+                or data.get('preprocessing') != self.preprocessing):
+            print(f"Warning: Embedding cache at {self.dir} was built for a different model or preprocessing, "
+                  f"ignoring", file=sys.stderr)
+            return {}
+
+        rows = self._row_count()
+        return {key: row for key, row in data.get('rows', {}).items() if row < rows}
+
+    def _get_matrix(self):
+        if self._matrix is None:
+            rows = self._row_count()
+            if rows == 0:
+                return None
+            self._matrix = np.memmap(self.matrix_path, dtype=np.float32, mode='r', shape=(rows, self.dim))
+        return self._matrix
+
+    def __len__(self):
+        return len(self._index) + len(self._pending)
+
+    def get(self, key):
+        """Return cached embedding for a content hash, or None"""
+        if key is None:
+            self.misses += 1
+            return None
+
+        if key in self._pending:
+            self.hits += 1
+            return self._pending[key]
+
+        row = self._index.get(key)
+        matrix = self._get_matrix() if row is not None else None
+        if matrix is None or row >= matrix.shape[0]:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return np.array(matrix[row])
+
+    def put(self, key, embedding):
+        """Buffer an embedding for the next flush()"""
+        if key is None or key in self._index:
+            return
+        self._pending[key] = np.asarray(embedding, dtype=np.float32).reshape(self.dim)
+
+    def flush(self):
+        """Append buffered embeddings to the matrix file and rewrite the index"""
+        if not self._pending:
+            return
+
+        with open(self.lock_path, 'w') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+
+            # Another process may have appended since we loaded the index
+            index = self._read_index()
+            new_keys = [key for key in self._pending if key not in index]
+            start_row = self._row_count()
+
+            if new_keys:
+                block = np.stack([self._pending[key] for key in new_keys]).astype(np.float32)
+                mode = 'r+b' if self.matrix_path.exists() else 'wb'
+                with open(self.matrix_path, mode) as f:
+                    # Overwrite any partial row left by an interrupted writer
+                    f.seek(start_row * self._row_bytes)
+                    f.write(block.tobytes())
+                    f.truncate()
+
+                for offset, key in enumerate(new_keys):
+                    index[key] = start_row + offset
+
+            tmp_path = self.index_path.with_suffix('.json.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump({
+                    'version': INDEX_VERSION,
+                    'model_id': self.model_id,
+                    'dim': self.dim,
+                    'preprocessing': self.preprocessing,
+                    'rows': index
+                }, f)
+            os.replace(tmp_path, self.index_path)
+
+        self._index = index
+        self._pending = {}
+        self._matrix = None
+
+    def summary(self):
+        """One-line hit/miss summary for logging"""
+        return f"Embedding cache: {self.hits} hits, {self.misses} misses ({len(self)} entries)"
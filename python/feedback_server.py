@@ -7,6 +7,8 @@ Usage:
 
 Example:
     python feedback_server.py ../OUTPUT/VideoName/1
+
+    Add --startup-profile to print an import-time breakdown before serving.
 """
 
 import argparse
@@ -15,9 +17,11 @@ import shutil
 import subprocess
 import sys
 from pathlib import Path
+
+# Imported before Flask so --startup-profile covers the Flask import too
+import startup
+from startup import import_module
 from flask import Flask, request, jsonify, send_file
-from PIL import Image
-import imagehash
 
 app = Flask(__name__)
 
@@ -349,10 +353,9 @@ def handle_blocklist():
         if not source_path.exists():
             return jsonify({'error': f'Image not found: {filename}'}), 404
 
-        # Compute pHash using imagehash (same as sharp-phash)
-        img = Image.open(source_path)
-        phash = imagehash.phash(img, hash_size=8)  # 8x8 = 64 bits
-        hash_hex = str(phash)
+        # Compute the pHash as sharp-phash does, so the entry matches frame
+        # hashes and CLI-added entries; imported on first use (numpy, PIL)
+        phash = import_module('blocklist').image_hash(source_path)
 
         # Load existing blocklist
         if BLOCKLIST_PATH.exists():
@@ -362,14 +365,14 @@ def handle_blocklist():
             blocklist = {'version': 1, 'entries': []}
 
         # Check if hash already exists
-        existing = any(entry['hash'] == hash_hex for entry in blocklist['entries'])
+        existing = any(entry['hash'] == phash for entry in blocklist['entries'])
         if existing:
             return jsonify({'error': 'Image already in blocklist'}), 400
 
         # Add new entry
         from datetime import datetime
         entry = {
-            'hash': hash_hex,
+            'hash': phash,
             'description': f'Added via feedback UI',
             'source': str(source_path.relative_to(OUTPUT_DIR.parent)),
             'addedAt': datetime.utcnow().isoformat() + 'Z'
@@ -385,7 +388,7 @@ def handle_blocklist():
 
         return jsonify({
             'success': True,
-            'hash': hash_hex,
+            'hash': phash,
             'description': entry['description']
         })
 
@@ -400,8 +403,12 @@ def main():
     parser.add_argument('--training-data', type=str, help='Path to training-data directory (default: ../training-data)')
     parser.add_argument('--model', type=str, help='Path to classifier model (default: ../models/classifier.pkl)')
     parser.add_argument('--blocklist', type=str, help='Path to blocklist file (default: ../models/blocklist.json)')
+    parser.add_argument('--startup-profile', action='store_true', help='Print an import-time breakdown before serving')
     args = parser.parse_args()
 
+    if args.startup_profile:
+        startup.enable()
+
     # Set global paths
     global OUTPUT_DIR, TRAINING_DATA_DIR, MODEL_PATH, BLOCKLIST_PATH
     OUTPUT_DIR = Path(args.output_dir).resolve()
@@ -435,6 +442,7 @@ def main():
     print(f"Blocklist path: {BLOCKLIST_PATH}")
     print(f"\nStarting server at http://localhost:{args.port}")
     print(f"Open browser to review and correct classifications.")
+    startup.ready()
 
     app.run(host='0.0.0.0', port=args.port, debug=False)
 
@@ -0,0 +1,95 @@
+"""
+Dependency-free logistic regression head.
+
+train_classifier.py exports the fitted scikit-learn LogisticRegression as a
+small .npz file (coef, intercept, classes, model version, backbone, layer
+depth) next to the pickle. classify_images.py scores with a single matmul + sigmoid over each
+batch, without importing scikit-learn.
+"""
+
+from pathlib import Path
+
+import numpy as np
+
+from backbones import DEFAULT_BACKBONE
+
+HEAD_SUFFIX = '.head.npz'
+
+
+def head_path_for(model_path):
+    """Path of the exported head for a classifier .pkl"""
+    return Path(model_path).with_suffix(HEAD_SUFFIX)
+
+
+class LinearHead:
+    """Binary logistic regression as plain NumPy weights"""
+
+    def __init__(self, coef, intercept, classes, model_version='', backbone=DEFAULT_BACKBONE, depth=None):
+        self.coef = np.asarray(coef, dtype=np.float32).reshape(-1)
+        self.intercept = float(np.asarray(intercept).reshape(-1)[0])
+        self.classes = np.asarray(classes)
+        self.model_version = str(model_version)
+        # Registry name of the backbone whose embeddings the head was fit on,
+        # and the encoder layer they were taken after (None: all layers)
+        self.backbone = str(backbone)
+        self.depth = int(depth) if depth else None
+
+        if len(self.classes) != 2:
+            raise ValueError(f"LinearHead supports binary classifiers only, got {len(self.classes)} classes")
+
+    @classmethod
+    def from_sklearn(cls, classifier, model_version='', backbone=DEFAULT_BACKBONE, depth=None):
+        """Build from a fitted sklearn LogisticRegression"""
+        return cls(classifier.coef_, classifier.intercept_, classifier.classes_, model_version, backbone, depth)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            # Heads exported before the backbone registry are clip-vit-b32
+            backbone = data['backbone'].item() if 'backbone' in data.files else DEFAULT_BACKBONE
+            depth = data['depth'].item() if 'depth' in data.files else None
+            return cls(data['coef'], data['intercept'], data['classes'], data['model_version'].item(),
+                       backbone, depth)
+
+    @property
+    def dim(self):
+        """Embedding dimension the head expects"""
+        return self.coef.shape[0]
+
+    def save(self, path):
+        # Write through a file handle so np.savez doesn't append its own .npz suffix
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                coef=self.coef.reshape(1, -1),
+                intercept=np.array([self.intercept], dtype=np.float32),
+                classes=self.classes,
+                model_version=np.array(self.model_version),
+                backbone=np.array(self.backbone),
+                # 0 stands for all layers
+                depth=np.array(self.depth or 0)
+            )
+
+    def predict_proba(self, embeddings):
+        """Probability of classes[1] for each row"""
+        logits = np.asarray(embeddings, dtype=np.float32) @ self.coef + self.intercept
+        # Numerically stable sigmoid
+        return np.exp(-np.logaddexp(0.0, -logits))
+
+    def predict(self, embeddings):
+        """
+        Score embeddings in one pass.
+
+        Returns:
+            (predictions, confidences): predicted class values and the
+            probability of the predicted class
+        """
+        return self.decide(self.predict_proba(embeddings))
+
+    def decide(self, positive):
+        """Turn probabilities of classes[1] into (predictions, confidences)"""
+        positive = np.asarray(positive)
+        is_positive = positive > 0.5
+        predictions = np.where(is_positive, self.classes[1], self.classes[0])
+        confidences = np.where(is_positive, positive, 1.0 - positive)
+        return predictions, confidences
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Parity checks for classification speedups.
+
+Each check embeds the same images through the optimized path and the
+reference path, reports how far the embeddings drift apart (cosine
+distance), and exits non-zero if the worst case exceeds the tolerance.
+
+Usage:
+    python parity_check.py <check> <image_directory> [--limit 200] [--tolerance 0.01]
+    python parity_check.py precision ../training-data [--precision int8] [--min-agreement 0.99]
+
+Checks:
+    decode      Reduced-resolution decode (JPEG draft / reduce) vs full decode
+    preprocess  Vectorized preprocessing vs HuggingFace CLIPProcessor
+    precision   int8 / bf16 vision tower vs fp32: embedding drift, plus label
+                agreement and confidence drift through the trained classifier.
+                Passes on label agreement; run it on the training set.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+from transformers import CLIPProcessor
+
+from backbones import DEFAULT_BACKBONE, get_backbone
+from classify_images import PRECISIONS, get_clip_model, load_images, load_model
+from preprocessing import open_image, preprocess_images
+from vision_bundle import apply_precision, load_clip_vision
+
+DEFAULT_MODEL_PATH = Path(__file__).resolve().parent.parent / 'models' / 'classifier.pkl'
+
+# The reference CLIPProcessor is the default backbone's
+BACKBONE = get_backbone(DEFAULT_BACKBONE)
+
+BATCH_SIZE = 32
+
+_processor = None
+
+
+def get_processor():
+    """Lazy-load the HuggingFace CLIPProcessor used as the reference"""
+    global _processor
+    if _processor is None:
+        _processor = CLIPProcessor.from_pretrained(BACKBONE.model_id)
+    return _processor
+
+
+def sample_paths(image_paths, limit):
+    """Pick up to limit images spread evenly across the list"""
+    if len(image_paths) <= limit:
+        return image_paths
+    indices = np.linspace(0, len(image_paths) - 1, limit).round().astype(int)
+    return [image_paths[i] for i in indices]
+
+
+def reference_pixels(images):
+    """Preprocess with HuggingFace CLIPProcessor"""
+    return get_processor()(images=images, return_tensors="pt")['pixel_values']
+
+
+def embed_pil_images(images, preprocess=reference_pixels, model=None):
+    """
+    CLIP embeddings (unit-normalized), preprocessed by CLIPProcessor unless
+    overridden, using classify_images' model unless one is given (on the CPU)
+    """
+    if model is None:
+        model, device = get_clip_model()
+    else:
+        device = 'cpu'
+    embeddings = []
+
+    for start in range(0, len(images), BATCH_SIZE):
+        pixel_values = preprocess(images[start:start + BATCH_SIZE]).to(device)
+        with torch.no_grad():
+            features = model.get_image_features(pixel_values=pixel_values).cpu().numpy()
+        embeddings.append(features / np.linalg.norm(features, axis=1, keepdims=True))
+
+    return np.concatenate(embeddings)
+
+
+def report_drift(name, candidate, reference, tolerance=None):
+    """
+    Print cosine distance stats between two embedding matrices; return
+    pass/fail against tolerance (always True when tolerance is None)
+    """
+    distances = 1.0 - np.sum(candidate * reference, axis=1)
+    worst = float(distances.max())
+    passed = tolerance is None or worst <= tolerance
+
+    print(f"{name}: {len(distances)} images")
+    print(f"  Cosine distance mean: {distances.mean():.6f}")
+    print(f"  Cosine distance p99:  {np.percentile(distances, 99):.6f}")
+    if tolerance is None:
+        print(f"  Cosine distance max:  {worst:.6f}")
+    else:
+        print(f"  Cosine distance max:  {worst:.6f} (tolerance {tolerance})")
+        print(f"  {'PASS' if passed else 'FAIL'}")
+    return passed
+
+
+def check_decode(image_paths, args):
+    """Reduced-resolution decode must embed like a full decode"""
+    fast = embed_pil_images([open_image(path) for path in image_paths])
+    full = embed_pil_images([open_image(path, fast=False) for path in image_paths])
+    return report_drift('Reduced-resolution decode vs full decode', fast, full, args.tolerance)
+
+
+def check_preprocess(image_paths, args):
+    """Vectorized resize / crop / normalize must match CLIPProcessor"""
+    images = [open_image(path, fast=False) for path in image_paths]
+
+    pixel_diff = 0.0
+    for start in range(0, len(images), BATCH_SIZE):
+        batch = images[start:start + BATCH_SIZE]
+        diff = (preprocess_images(batch) - reference_pixels(batch)).abs().max().item()
+        pixel_diff = max(pixel_diff, diff)
+    print(f"Max absolute pixel difference vs CLIPProcessor: {pixel_diff:.6f}")
+
+    ours = embed_pil_images(images, preprocess=preprocess_images)
+    reference = embed_pil_images(images)
+    return report_drift('Vectorized preprocessing vs CLIPProcessor', ours, reference, args.tolerance)
+
+
+def embed_at_precision(images, backbone, precision):
+    """Embed with a freshly loaded CPU vision tower at the given precision; also return images/sec"""
+    model, _ = apply_precision(load_clip_vision(backbone), precision)
+    start = time.perf_counter()
+    embeddings = embed_pil_images(images, preprocess=preprocess_images, model=model)
+    return embeddings, len(images) / (time.perf_counter() - start)
+
+
+def check_precision(image_paths, args):
+    """Reduced-precision vision tower must give the same labels as fp32"""
+    classifier = load_model(args.model)
+    backbone = get_backbone(classifier.backbone)
+    images = [open_image(path) for path in image_paths]
+
+    reference, reference_rate = embed_at_precision(images, backbone, 'fp32')
+    candidate, candidate_rate = embed_at_precision(images, backbone, args.precision)
+    report_drift(f'{args.precision} vs fp32', candidate, reference)
+    print(f"  Throughput: fp32 {reference_rate:.1f} images/sec, {args.precision} {candidate_rate:.1f} images/sec")
+
+    reference_labels, _ = classifier.predict(reference)
+    candidate_labels, _ = classifier.predict(candidate)
+    agreement = float(np.mean(reference_labels == candidate_labels))
+
+    # Compare P(exclude) so a flipped label shows up as drift too
+    drift = np.abs(classifier.predict_proba(candidate) - classifier.predict_proba(reference))
+    passed = agreement >= args.min_agreement
+
+    print(f"  Label agreement:  {agreement:.2%} ({int(np.sum(reference_labels != candidate_labels))} changed, "
+          f"minimum {args.min_agreement:.2%})")
+    print(f"  Confidence drift mean: {drift.mean():.4f}")
+    print(f"  Confidence drift max:  {drift.max():.4f}")
+    print(f"  {'PASS' if passed else 'FAIL'}")
+    return passed
+
+
+CHECKS = {
+    'decode': check_decode,
+    'preprocess': check_preprocess,
+    'precision': check_precision,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check optimized classification paths against the reference path')
+    parser.add_argument('check', choices=sorted(CHECKS), help='Which parity check to run')
+    parser.add_argument('image_dir', type=str, help='Directory of sample images (searched recursively)')
+    parser.add_argument('--limit', type=int, default=200, help='Maximum number of images to compare (default: 200)')
+    parser.add_argument('--tolerance', type=float, default=0.01,
+                        help='Maximum allowed cosine distance per image (default: 0.01)')
+    parser.add_argument('--precision', choices=[p for p in PRECISIONS if p != 'fp32'], default='int8',
+                        help='precision check: reduced precision to compare with fp32 (default: int8)')
+    parser.add_argument('--min-agreement', type=float, default=0.99,
+                        help='precision check: minimum fraction of unchanged labels (default: 0.99)')
+    parser.add_argument('--model', type=str, default=str(DEFAULT_MODEL_PATH),
+                        help='precision check: trained classifier (default: ../models/classifier.pkl)')
+    args = parser.parse_args()
+
+    try:
+        image_paths = sample_paths(load_images(args.image_dir), args.limit)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    passed = CHECKS[args.check](image_paths, args)
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == '__main__':
+    main()
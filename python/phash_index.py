@@ -0,0 +1,92 @@
+"""
+Perceptual-hash nearest-neighbour index over the labeled training images.
+
+First stage of the classify_images.py --cascade: stills from the same videos
+keep coming back (title cards, manuals, recurring scenes), and a still whose
+pHash nearly matches labeled training images of a single class doesn't need
+a CLIP forward pass to be classified. Everything else falls through to CLIP.
+
+train_classifier.py exports the index next to the pickle (classifier.phash.npz):
+one 64-bit pHash per training image plus its label. Hashes are computed on
+the same center crop CLIP sees, with imagehash.phash (same algorithm as
+sharp-phash on the TypeScript side).
+"""
+
+from pathlib import Path
+
+import numpy as np
+
+from startup import import_module
+
+PHASH_SUFFIX = '.phash.npz'
+
+# Default maximum Hamming distance (of 64 bits) for a confident match
+DEFAULT_MAX_DISTANCE = 4
+
+
+def phash_path_for(model_path):
+    """Path of the exported pHash index for a classifier .pkl"""
+    return Path(model_path).with_suffix(PHASH_SUFFIX)
+
+
+def image_phash(pixels):
+    """64-bit pHash of a uint8 (H, W, 3) crop, as an unsigned integer"""
+    Image = import_module('PIL.Image')
+    imagehash = import_module('imagehash')
+    return int(str(imagehash.phash(Image.fromarray(pixels), hash_size=8)), 16)
+
+
+def hamming_distances(hashes, reference):
+    """(len(hashes) x len(reference)) matrix of bit differences between uint64 hashes"""
+    diff = np.asarray(hashes, dtype=np.uint64)[:, None] ^ np.asarray(reference, dtype=np.uint64)[None, :]
+    return np.unpackbits(diff.view(np.uint8), axis=-1).reshape(diff.shape + (64,)).sum(axis=-1)
+
+
+class PhashIndex:
+    """Training-image pHashes and labels (0 keep, 1 exclude)"""
+
+    def __init__(self, hashes, labels, model_version=''):
+        self.hashes = np.asarray(hashes, dtype=np.uint64)
+        self.labels = np.asarray(labels, dtype=np.int8)
+        self.model_version = str(model_version)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['hashes'], data['labels'], data['model_version'].item())
+
+    def save(self, path):
+        # Write through a file handle so np.savez doesn't append its own .npz suffix
+        with open(path, 'wb') as f:
+            np.savez(f, hashes=self.hashes, labels=self.labels, model_version=np.array(self.model_version))
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def predict(self, pixel_values, max_distance=DEFAULT_MAX_DISTANCE):
+        """
+        Decide the images that confidently match the index.
+
+        An image is decided when its nearest training hash is within
+        max_distance bits and every training hash that close has the same
+        label. Its probability of exclude is that label, softened by the
+        distance (1 - distance / 64).
+
+        Returns:
+            float32 probability of exclude per image, NaN for undecided ones
+        """
+        probabilities = np.full(len(pixel_values), np.nan, dtype=np.float32)
+        if not len(self) or not len(pixel_values):
+            return probabilities
+
+        distances = hamming_distances([image_phash(pixels) for pixels in pixel_values], self.hashes)
+        near = distances <= max_distance
+        nearest = distances.min(axis=1)
+
+        for i in np.flatnonzero(near.any(axis=1)):
+            labels = self.labels[near[i]]
+            if (labels == labels[0]).all():
+                confidence = 1.0 - nearest[i] / 64.0
+                probabilities[i] = confidence if labels[0] == 1 else 1.0 - confidence
+
+        return probabilities
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Prepare local CLIP vision bundles used by classify_images.py and
+train_classifier.py.
+
+Downloads a backbone's CLIP checkpoint once, keeps only the vision tower and
+visual projection, and saves them as safetensors under
+models/clip-vision/<backbone>/. After that, classification and training run
+fully offline. Copy the bundle directory to air-gapped workers as-is.
+
+Usage:
+    python prepare_model.py [--backbone clip-vit-b32 | --all] [--output DIR] [--force]
+    python prepare_model.py --list
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import torch
+from transformers import CLIPModel
+
+from backbones import BACKBONES, DEFAULT_BACKBONE, get_backbone
+from vision_bundle import build_stand_in, bundle_dir_for, load_clip_vision, load_from_hub, read_bundle_info, save_bundle
+
+# Maximum allowed difference between bundle and full-model image features
+PARITY_TOLERANCE = 1e-5
+
+
+def check_parity(backbone, bundle_dir):
+    """Compare bundle image features with the full CLIPModel on a random batch"""
+    full = CLIPModel.from_pretrained(backbone.model_id)
+    full.eval()
+    tower = load_clip_vision(backbone, bundle_dir)
+
+    size = tower.config.image_size
+    pixel_values = torch.randn(4, 3, size, size, generator=torch.Generator().manual_seed(0))
+    with torch.no_grad():
+        diff = (tower.get_image_features(pixel_values) - full.get_image_features(pixel_values=pixel_values)).abs().max().item()
+
+    print(f"Max feature difference vs full CLIPModel: {diff:.2e} (tolerance {PARITY_TOLERANCE})")
+    return diff <= PARITY_TOLERANCE
+
+
+def prepare(backbone, bundle_dir, force=False):
+    """Build one backbone's bundle; return False if its parity check fails"""
+    info = read_bundle_info(bundle_dir)
+    if info is not None and info['model_id'] == backbone.model_id and not force:
+        print(f"Bundle already exists in {bundle_dir} ({info['model_id']}); use --force to rebuild")
+        return True
+
+    if backbone.stand_in:
+        # Nothing to download or compare against: build the random weights locally
+        info = save_bundle(build_stand_in(backbone), backbone.model_id, bundle_dir)
+        print(f"✓ Saved random-weight stand-in {backbone.name} to {bundle_dir} "
+              f"({info['projection_dim']}-d embeddings)")
+        return True
+
+    print(f"Loading vision tower of {backbone.model_id}...")
+    model = load_from_hub(backbone.model_id)
+
+    info = save_bundle(model, backbone.model_id, bundle_dir)
+    size_mb = sum(f.stat().st_size for f in bundle_dir.iterdir()) / (1024 * 1024)
+    print(f"✓ Saved {backbone.name} vision bundle to {bundle_dir} ({size_mb:.0f} MB, "
+          f"{info['projection_dim']}-d embeddings)")
+
+    return check_parity(backbone, bundle_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Save CLIP vision towers as local safetensors bundles')
+    parser.add_argument('--backbone', type=str, default=DEFAULT_BACKBONE,
+                        help=f'Backbone to bundle: a registered name or random-clip-<layers>x<hidden> '
+                             f'(default: {DEFAULT_BACKBONE})')
+    parser.add_argument('--all', action='store_true', help='Bundle every registered backbone')
+    parser.add_argument('--list', action='store_true', help='List registered backbones and exit')
+    parser.add_argument('--output', type=str,
+                        help='Bundle directory (default: ../models/clip-vision/<backbone>)')
+    parser.add_argument('--force', action='store_true', help='Overwrite an existing bundle')
+    args = parser.parse_args()
+
+    if args.list:
+        for backbone in BACKBONES.values():
+            status = 'prepared' if read_bundle_info(bundle_dir_for(backbone)) else 'not prepared'
+            print(f"{backbone.name:<18} {backbone.model_id:<45} {status:<13} {backbone.description}")
+        return
+
+    if args.all and args.output:
+        print("Error: --output can't be combined with --all", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        selected = list(BACKBONES.values()) if args.all else [get_backbone(args.backbone)]
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    failed = []
+    for backbone in selected:
+        bundle_dir = Path(args.output) if args.output else bundle_dir_for(backbone)
+        if not prepare(backbone, bundle_dir, force=args.force):
+            failed.append(backbone.name)
+
+    if failed:
+        print(f"Error: Bundle features differ from the full model for: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
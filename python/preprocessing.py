@@ -0,0 +1,133 @@
+"""
+Image loading and CLIP preprocessing shared by classify_images.py and
+train_classifier.py.
+
+Stills are written at full video resolution (often 1080p or 4K), but CLIP
+only looks at a 224px center crop. open_image() decodes close to that size
+instead of decoding every pixel and throwing most of them away.
+
+resize_and_crop() + normalize_batch() replace per-image CLIPProcessor calls:
+the geometric steps run per image (sizes differ) and produce uint8 arrays,
+then rescaling and normalization run once over the whole stacked batch.
+They reproduce CLIPImageProcessor's resize / center crop / normalize steps
+(see `parity_check.py preprocess`).
+
+PIL and torch are imported on first use (see startup.py).
+"""
+
+import math
+
+import numpy as np
+
+from startup import import_module
+
+# CLIP ViT input resolution (shortest side after resize, and crop size)
+CLIP_IMAGE_SIZE = 224
+
+# CLIP normalization constants (CLIPImageProcessor image_mean / image_std)
+CLIP_MEAN = (0.48145466, 0.4578275, 0.40821073)
+CLIP_STD = (0.26862954, 0.26130258, 0.27577711)
+
+# Keep at least this multiple of CLIP_IMAGE_SIZE on the shortest side after
+# reduced decode, so CLIP's own bicubic resize still does the final
+# downscale and embeddings stay within tolerance of a full decode
+DECODE_MARGIN = 2
+
+# Bump whenever a change to open_image, resize_and_crop or normalize_pixels
+# alters the pixels CLIP sees, so embeddings cached the old way are not reused
+PREPROCESS_VERSION = 1
+
+
+def open_image(img_path, fast=True, target=CLIP_IMAGE_SIZE * DECODE_MARGIN):
+    """
+    Open an image as RGB, decoded near the resolution CLIP needs.
+
+    JPEGs use Pillow's draft mode, which has libjpeg decode directly at
+    1/2, 1/4 or 1/8 scale. Other formats are decoded fully and shrunk with
+    Image.reduce(), a fast integer box filter. Aspect ratio is preserved,
+    so CLIP's resize-shortest-side + center-crop sees the same framing.
+
+    Args:
+        img_path: Path to the image file
+        fast: False decodes at full resolution (the reference path)
+        target: Minimum shortest side to keep after reduction
+    """
+    image = import_module('PIL.Image').open(img_path)
+    width, height = image.size
+    shortest = min(width, height)
+
+    if fast and image.format == 'JPEG' and shortest > target:
+        # draft() picks the largest scale that keeps both sides >= the request
+        scale = target / shortest
+        image.draft('RGB', (math.ceil(width * scale), math.ceil(height * scale)))
+
+    image = image.convert('RGB')
+
+    if fast:
+        factor = min(image.size) // target
+        if factor >= 2:
+            image = image.reduce(factor)
+
+    return image
+
+
+def preprocessing_id(fast=True):
+    """
+    Tag for the preprocessing implementation and decode mode, part of the
+    embedding cache key: reduced and full decodes give slightly different
+    embeddings, so each gets its own cache
+    """
+    decode = f"reduced{DECODE_MARGIN}x" if fast else 'full'
+    return f"pp{PREPROCESS_VERSION}-{decode}"
+
+
+def resize_and_crop(image, size=CLIP_IMAGE_SIZE):
+    """
+    Resize the shortest side to size (bicubic) and center crop to size x size.
+
+    Matches CLIPImageProcessor's resize (long side truncated to int) and
+    center crop offsets.
+
+    Returns:
+        uint8 numpy array of shape (size, size, 3)
+    """
+    width, height = image.size
+    if width <= height:
+        new_width, new_height = size, int(size * height / width)
+    else:
+        new_width, new_height = int(size * width / height), size
+
+    if (new_width, new_height) != (width, height):
+        Image = import_module('PIL.Image')
+        image = image.resize((new_width, new_height), resample=Image.BICUBIC)
+
+    top = (new_height - size) // 2
+    left = (new_width - size) // 2
+    return np.asarray(image.crop((left, top, left + size, top + size)), dtype=np.uint8)
+
+
+def normalize_pixels(pixels, mean=CLIP_MEAN, std=CLIP_STD):
+    """
+    Rescale and normalize a stacked uint8 batch in one vectorized pass.
+
+    Args:
+        pixels: uint8 array of shape (N, H, W, 3)
+
+    Returns:
+        contiguous float32 numpy array of shape (N, 3, H, W)
+    """
+    mean = np.asarray(mean, dtype=np.float32).reshape(1, 3, 1, 1) * 255.0
+    std = np.asarray(std, dtype=np.float32).reshape(1, 3, 1, 1) * 255.0
+    batch = np.asarray(pixels).transpose(0, 3, 1, 2).astype(np.float32)
+    return np.ascontiguousarray((batch - mean) / std)
+
+
+def normalize_batch(pixels, mean=CLIP_MEAN, std=CLIP_STD):
+    """normalize_pixels() as a float32 tensor, ready for the PyTorch vision encoder"""
+    torch = import_module('torch')
+    return torch.from_numpy(normalize_pixels(pixels, mean, std))
+
+
+def preprocess_images(images, size=CLIP_IMAGE_SIZE):
+    """Preprocess a list of PIL images into one (N, 3, size, size) tensor"""
+    return normalize_batch(np.stack([resize_and_crop(image, size) for image in images]))
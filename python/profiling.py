@@ -0,0 +1,160 @@
+"""
+Per-stage timing and throughput profile for the ML scripts (--profile).
+
+Stages (model load, file read, decode, preprocessing, forward pass, head,
+...) are wrapped in stage() blocks. When profiling is enabled each stage
+accumulates:
+
+    wall_seconds   Elapsed time inside the stage, summed over calls
+    cpu_seconds    Process CPU time (all threads) consumed while inside it
+    calls, items   How often it ran and how many images/rows it handled
+    peak_rss_mb    Peak resident set size of the process when it last ended
+
+Counters (e.g. how many images the pHash cascade decided) are added with
+count() and reported under "counters". The whole run is written as a JSON
+document with sorted keys on exit, so profiles from different runs and
+machines can be diffed directly.
+
+Stages run from the decode threads overlap the forward pass, so their wall
+and CPU times can add up to more than the run's total. Work done in forked
+--workers processes isn't recorded; profile with one process. When
+profiling is off, stage() costs one flag check.
+"""
+
+import atexit
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, peak RSS not reported
+    resource = None
+
+PROFILE_VERSION = 1
+
+_enabled = False
+_path = None
+_started_at = None
+_start_wall = 0.0
+_start_cpu = 0.0
+_stages = {}
+_counters = {}
+_lock = threading.Lock()
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MiB, or None when unavailable"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and KiB elsewhere
+    return round(peak / (1 << 20) if sys.platform == 'darwin' else peak / (1 << 10), 1)
+
+
+def host_info():
+    """Machine description recorded with profiles and benchmark results"""
+    return {
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version()
+    }
+
+
+def enable(path):
+    """Start profiling; the JSON document is written to path at exit"""
+    global _enabled, _path, _started_at, _start_wall, _start_cpu
+
+    if _enabled:
+        return
+    _enabled = True
+    _path = path
+    _started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    _start_wall = time.perf_counter()
+    _start_cpu = time.process_time()
+    atexit.register(write)
+
+
+def _entry(name):
+    return _stages.setdefault(name, {'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'calls': 0, 'items': 0})
+
+
+@contextmanager
+def stage(name, items=0):
+    """Time one run of a stage that handles items images/rows"""
+    if not _enabled:
+        yield
+        return
+
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - wall
+        cpu = time.process_time() - cpu
+        rss = peak_rss_mb()
+        with _lock:
+            entry = _entry(name)
+            entry['wall_seconds'] += wall
+            entry['cpu_seconds'] += cpu
+            entry['calls'] += 1
+            entry['items'] += items
+            entry['peak_rss_mb'] = rss
+
+
+def count(name, n=1):
+    """Add n to a named counter"""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def document():
+    """The profile as a JSON-serializable dict"""
+    wall = time.perf_counter() - _start_wall
+    with _lock:
+        stages = {}
+        for name, entry in _stages.items():
+            stage_entry = dict(entry, wall_seconds=round(entry['wall_seconds'], 4),
+                               cpu_seconds=round(entry['cpu_seconds'], 4))
+            if entry['items'] and entry['wall_seconds'] > 0:
+                stage_entry['items_per_sec'] = round(entry['items'] / entry['wall_seconds'], 2)
+            stages[name] = stage_entry
+        counters = dict(_counters)
+
+    return {
+        'version': PROFILE_VERSION,
+        'script': os.path.basename(sys.argv[0]),
+        'argv': sys.argv[1:],
+        'started_at': _started_at,
+        'host': host_info(),
+        'wall_seconds': round(wall, 4),
+        'cpu_seconds': round(time.process_time() - _start_cpu, 4),
+        'peak_rss_mb': peak_rss_mb(),
+        'stages': stages,
+        'counters': counters
+    }
+
+
+def write():
+    """Write the profile to the path given to enable() ('-' for stderr)"""
+    if not _enabled:
+        return
+
+    text = json.dumps(document(), indent=2, sort_keys=True)
+    if _path == '-':
+        print(text, file=sys.stderr)
+        return
+
+    with open(_path, 'w') as f:
+        f.write(text + '\n')
+    print(f"Profile written to {_path}", file=sys.stderr)
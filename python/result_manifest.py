@@ -0,0 +1,165 @@
+"""
+Per-directory sidecar manifests of classification results.
+
+Each directory classify_images.py scores gets a .classify-manifest.json
+recording, per still, its size, mtime, content hash, the classifier version
+it was scored with and the result. A later run returns the recorded result
+without decoding or embedding the still when:
+
+    - size and mtime are unchanged (no file read at all), or
+    - they changed but the content hash still matches (e.g. a re-extracted
+      still with identical bytes),
+
+and the classifier version matches. Anything new, changed or scored by a
+different classifier version is classified again and its entry rewritten.
+Stills that failed to decode are never recorded, so they are retried.
+
+Entries also keep the still's pHash once it is known, so the blocklist
+check of a reused result doesn't decode the still either.
+
+Manifests are rewritten atomically, so an interrupted run never leaves a
+half-written file behind.
+"""
+
+import json
+import os
+import sys
+from pathlib import Path
+
+from embedding_cache import hash_file
+
+MANIFEST_NAME = '.classify-manifest.json'
+MANIFEST_VERSION = 1
+
+
+class ResultManifests:
+    """Lazily loaded manifests for every directory touched by one classification run"""
+
+    def __init__(self, model_version):
+        self.model_version = model_version
+        self.hits = 0
+        self._manifests = {}
+        self._dirty = set()
+
+    def _entries(self, directory):
+        """Entries of one directory's manifest (filename -> entry), read on first use"""
+        if directory not in self._manifests:
+            entries = {}
+            manifest_path = directory / MANIFEST_NAME
+            if manifest_path.exists():
+                try:
+                    with open(manifest_path, 'r') as f:
+                        data = json.load(f)
+                    if data.get('version') == MANIFEST_VERSION:
+                        entries = data.get('entries', {})
+                except (OSError, ValueError) as e:
+                    print(f"Warning: Ignoring unreadable manifest {manifest_path}: {e}", file=sys.stderr)
+            self._manifests[directory] = entries
+        return self._manifests[directory]
+
+    def lookup(self, image_paths):
+        """
+        Split image_paths into recorded results and images to classify.
+
+        Returns:
+            (results, remaining) where results are the recorded result dicts,
+            with paths spelled as given
+        """
+        results = []
+        remaining = []
+
+        for img_path in image_paths:
+            img_path = Path(img_path)
+            entries = self._entries(img_path.parent)
+            entry = entries.get(img_path.name)
+
+            try:
+                stat = img_path.stat()
+            except OSError:
+                remaining.append(img_path)
+                continue
+
+            if entry is None or entry.get('model_version') != self.model_version:
+                remaining.append(img_path)
+                continue
+
+            if (entry['size'], entry['mtime_ns']) != (stat.st_size, stat.st_mtime_ns):
+                # Touched or rewritten: only reuse the result if the bytes are the same
+                try:
+                    same = hash_file(img_path) == entry['sha256']
+                except OSError:
+                    same = False
+                if not same:
+                    remaining.append(img_path)
+                    continue
+                entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+                self._dirty.add(img_path.parent)
+
+            results.append(dict(entry['result'], path=str(img_path)))
+
+        self.hits += len(results)
+        return results, remaining
+
+    def phashes(self, image_paths):
+        """Recorded pHashes of image_paths (str(path) -> hash), for entries that have one"""
+        phashes = {}
+        for img_path in image_paths:
+            img_path = Path(img_path)
+            entry = self._entries(img_path.parent).get(img_path.name)
+            if entry is not None and entry.get('phash'):
+                phashes[str(img_path)] = entry['phash']
+        return phashes
+
+    def remember_phashes(self, phashes):
+        """Store pHashes (str(path) -> hash) in the entries of images already recorded"""
+        for path, phash in phashes.items():
+            img_path = Path(path)
+            entry = self._entries(img_path.parent).get(img_path.name)
+            if entry is not None and phash and entry.get('phash') != phash:
+                entry['phash'] = phash
+                self._dirty.add(img_path.parent)
+
+    def record(self, results, digests=None, phashes=None):
+        """
+        Record freshly scored results; call save() to write them.
+
+        Args:
+            results: Result dicts of stills that were actually scored
+            digests: Optional str(path) -> SHA-256 already computed (e.g. by
+                the embedding cache), so those files aren't hashed again
+            phashes: Optional str(path) -> pHash to keep with the entries
+        """
+        digests = digests or {}
+        phashes = phashes or {}
+        for result in results:
+            img_path = Path(result['path'])
+            try:
+                stat = img_path.stat()
+                sha256 = digests.get(str(img_path)) or hash_file(img_path)
+            except OSError:
+                continue
+
+            entry = {
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'sha256': sha256,
+                'model_version': self.model_version,
+                'result': {key: value for key, value in result.items() if key != 'path'}
+            }
+            if phashes.get(str(img_path)):
+                entry['phash'] = phashes[str(img_path)]
+            self._entries(img_path.parent)[img_path.name] = entry
+            self._dirty.add(img_path.parent)
+
+    def save(self):
+        """Rewrite every manifest that changed"""
+        for directory in self._dirty:
+            manifest_path = directory / MANIFEST_NAME
+            tmp_path = manifest_path.with_suffix('.json.tmp')
+            try:
+                with open(tmp_path, 'w') as f:
+                    json.dump({'version': MANIFEST_VERSION, 'entries': self._manifests[directory]}, f)
+                os.replace(tmp_path, manifest_path)
+            except OSError as e:
+                print(f"Warning: Failed to write manifest {manifest_path}: {e}", file=sys.stderr)
+        self._dirty = set()
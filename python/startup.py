@@ -0,0 +1,90 @@
+"""
+Lazy imports and --startup-profile for the ML scripts.
+
+torch, transformers, scikit-learn, PIL and imagehash take seconds to import
+between them. The scripts pull them in through import_module() on the code
+paths that actually use them, so bad arguments or a missing model fail
+immediately instead of after the imports.
+
+With --startup-profile every first import and startup phase is timed, and a
+breakdown is printed to stderr once the script is ready to work (or when it
+exits, if it never gets that far).
+"""
+
+import atexit
+import importlib
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Taken when the first script module imports this one, so the profile also
+# covers module-level imports and argument parsing
+_START = time.perf_counter()
+
+_enabled = False
+_reported = False
+_timings = []
+_lock = threading.RLock()
+
+
+def enable():
+    """Start recording timings; the report is printed at ready() or exit"""
+    global _enabled
+
+    if not _enabled:
+        _enabled = True
+        _timings.append(('module imports + argument parsing', time.perf_counter() - _START))
+        atexit.register(report)
+
+
+@contextmanager
+def phase(label):
+    """Time a startup step when profiling is enabled"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if _enabled and not _reported:
+            _timings.append((label, time.perf_counter() - start))
+
+
+def import_module(name):
+    """
+    Import a module on first use.
+
+    Returns the already-imported module when possible; otherwise imports it,
+    timed as 'import <name>'. Serialized so decode threads racing to import
+    PIL record it once.
+    """
+    with _lock:
+        module = sys.modules.get(name)
+        if module is not None:
+            return module
+        with phase(f'import {name}'):
+            return importlib.import_module(name)
+
+
+def report(stream=None):
+    """Print the import-time breakdown (once)"""
+    global _reported
+
+    if not _enabled or _reported:
+        return
+    _reported = True
+
+    stream = stream or sys.stderr
+    total = time.perf_counter() - _START
+    width = max(len(label) for label, _ in _timings)
+
+    print("Startup profile:", file=stream)
+    for label, seconds in _timings:
+        share = 100.0 * seconds / total if total > 0 else 0.0
+        print(f"  {label:<{width}}  {seconds:7.3f}s  {share:5.1f}%", file=stream)
+    print(f"  {'total':<{width}}  {total:7.3f}s", file=stream)
+    stream.flush()
+
+
+def ready():
+    """Mark the end of startup: print the report if profiling"""
+    report()
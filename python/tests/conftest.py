@@ -0,0 +1,80 @@
+"""
+Shared fixtures for the offline Python tests.
+
+Run from the python/ directory:
+
+    python -m pytest tests
+
+Nothing here touches the network: models are random-weight stand-in
+backbones (see backbones.py) built in memory, and images are synthetic.
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# The scripts are flat modules in python/, imported as top-level names
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Landscape, portrait, square and a size smaller than CLIP's input
+IMAGE_SIZES = ((640, 360), (360, 640), (300, 300), (1280, 720), (150, 100))
+
+
+def synthetic_image(rng, width, height):
+    """Smooth random color field with noise, as an RGB PIL image"""
+    Image = pytest.importorskip('PIL.Image')
+    coarse = rng.randint(0, 256, size=(4, 4, 3), dtype=np.uint8)
+    field = np.asarray(Image.fromarray(coarse).resize((width, height), Image.BILINEAR), dtype=np.int16)
+    noise = rng.randint(-16, 17, size=field.shape, dtype=np.int16)
+    return Image.fromarray(np.clip(field + noise, 0, 255).astype(np.uint8))
+
+
+@pytest.fixture
+def images():
+    """One PIL image per IMAGE_SIZES entry, the same every run"""
+    rng = np.random.RandomState(0)
+    return [synthetic_image(rng, width, height) for width, height in IMAGE_SIZES]
+
+
+@pytest.fixture
+def image_paths(tmp_path, images):
+    """The images fixture saved as JPEGs under tmp_path/stills"""
+    still_dir = tmp_path / 'stills'
+    still_dir.mkdir()
+    paths = []
+    for i, image in enumerate(images):
+        path = still_dir / f"still_{i:04d}.jpg"
+        image.save(path, 'JPEG', quality=90)
+        paths.append(path)
+    return paths
+
+
+@pytest.fixture(scope='session')
+def stand_in_model():
+    """random-clip-tiny vision tower, built in memory"""
+    pytest.importorskip('torch')
+    pytest.importorskip('transformers')
+    from backbones import get_backbone
+    from vision_bundle import build_stand_in
+
+    backbone = get_backbone('random-clip-tiny')
+    return backbone, build_stand_in(backbone).eval()
+
+
+@pytest.fixture
+def classify_images(monkeypatch, stand_in_model):
+    """classify_images configured for random-clip-tiny, with its module state restored afterwards"""
+    import classify_images
+
+    backbone, model = stand_in_model
+    for name in ('_backbone', '_depth', '_clip_model', '_device', '_backend', '_fast_decode',
+                 '_io_threads', '_prefetch_depth', '_cascade'):
+        monkeypatch.setattr(classify_images, name, getattr(classify_images, name))
+
+    classify_images.set_backbone(backbone.name)
+    classify_images.set_depth(None)
+    classify_images.use_clip_model(model, 'cpu')
+    classify_images.set_io_options(io_threads=2, prefetch_depth=1)
+    return classify_images
@@ -0,0 +1,37 @@
+"""Blocklist entries written by `harvest --add-to-blocklist` against Python-computed pHashes"""
+
+import json
+
+import pytest
+
+from blocklist import check_blocklist, image_hash, load_blocklist
+
+
+def write_cli_blocklist(path, phash, source):
+    """models/blocklist.json as src/lib/blocklist.ts addToBlocklist() writes it"""
+    entry = {'hash': phash, 'description': 'title card', 'source': source, 'addedAt': '2026-01-01T00:00:00.000Z'}
+    path.write_text(json.dumps({'version': 1, 'entries': [entry]}, indent=2))
+
+
+def flip_bits(phash, count):
+    return ''.join('1' if bit == '0' else '0' for bit in phash[:count]) + phash[count:]
+
+
+def test_image_hash_is_a_sharp_phash_bit_string(image_paths):
+    pytest.importorskip('PIL.Image')
+    phash = image_hash(image_paths[0])
+
+    assert len(phash) == 64
+    assert set(phash) <= {'0', '1'}
+    assert phash == image_hash(image_paths[0])
+
+
+def test_cli_added_entry_matches_computed_hash(tmp_path, image_paths):
+    pytest.importorskip('PIL.Image')
+    # A few bits off, as sharp's and Pillow's resampling may differ slightly
+    blocklist_path = tmp_path / 'blocklist.json'
+    write_cli_blocklist(blocklist_path, flip_bits(image_hash(image_paths[0]), 3), str(image_paths[0]))
+    entries = load_blocklist(blocklist_path)
+
+    assert check_blocklist(image_hash(image_paths[0]), entries)['description'] == 'title card'
+    assert check_blocklist(image_hash(image_paths[0]), entries, threshold=2) is None
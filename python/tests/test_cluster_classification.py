@@ -0,0 +1,67 @@
+"""Dedupe-cluster classification: label propagation and the spot check"""
+
+import numpy as np
+import pytest
+
+from linear_head import LinearHead
+
+
+@pytest.fixture
+def classifier(classify_images, monkeypatch, tmp_path):
+    """Head that labels everything keep, with manifests on and no blocklist"""
+    # read_model_version looks for models/classifier.meta.json relative to the cwd
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(classify_images, '_blocklist', [])
+    monkeypatch.setattr(classify_images, '_use_manifests', True)
+    return LinearHead(np.zeros(64), -5.0, [0, 1], 'test-version', 'random-clip-tiny')
+
+
+def classify_clusters(classify_images, classifier, clusters, spot_check):
+    results = []
+    for batch_results in classify_images.iter_cluster_classifications(classifier, clusters, spot_check=spot_check,
+                                                                       batch_size=2):
+        results.extend(batch_results)
+    return {result['path']: result for result in results}
+
+
+def test_members_get_canonical_label(classify_images, classifier, image_paths):
+    canonical, *members = [str(path) for path in image_paths[:3]]
+
+    results = classify_clusters(classify_images, classifier, [(canonical, members)], spot_check=0.0)
+
+    assert set(results) == {canonical, *members}
+    for member in members:
+        assert results[member]['canonical'] == canonical
+        assert results[member]['label'] == results[canonical]['label']
+
+
+def test_spot_check_counts_members_reused_from_manifest(classify_images, classifier, image_paths, capsys):
+    canonical, member = str(image_paths[0]), str(image_paths[1])
+    # Record the member, so the cluster run reuses it before its canonical is classified
+    for _ in classify_images.iter_classifications(classifier, [image_paths[1]]):
+        pass
+    capsys.readouterr()
+
+    results = classify_clusters(classify_images, classifier, [(canonical, [member])], spot_check=1.0)
+
+    assert results[member]['label'] == results[canonical]['label'] == 'keep'
+    assert 'Spot check: 1/1 members agree' in capsys.readouterr().err
+
+
+def test_cluster_hashes_reach_the_blocklist_check(classify_images, classifier, image_paths, monkeypatch):
+    # Unreadable, so it can only be blocklisted by the hash sent with the cluster
+    canonical = image_paths[0].parent / 'broken.jpg'
+    canonical.write_bytes(b'not a jpeg')
+    member = str(image_paths[1])
+    phash = '10' * 32
+    monkeypatch.setattr(classify_images, '_blocklist', [{'hash': phash, 'description': 'title card'}])
+    records = [{'canonical': str(canonical), 'members': [str(canonical), member], 'hashes': [phash, None]}]
+
+    results = {}
+    for batch_results in classify_images.iter_cluster_classifications(
+            classifier, classify_images.parse_clusters(records), batch_size=2,
+            hashes=classify_images.parse_cluster_hashes(records)):
+        results.update((result['path'], result) for result in batch_results)
+
+    assert results[str(canonical)]['blocklist'] == 'title card'
+    assert results[member]['label'] == 'exclude'
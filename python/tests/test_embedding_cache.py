@@ -0,0 +1,126 @@
+"""Round trips through the on-disk embedding cache, directly and through classify_images"""
+
+import hashlib
+
+import numpy as np
+
+from embedding_cache import EmbeddingCache, hash_file
+from preprocessing import preprocessing_id
+
+DIM = 8
+MODEL_ID = 'random/clip-vit-L2-H64-P32-D64'
+
+
+def unit_rows(count, seed=0):
+    rows = np.random.RandomState(seed).randn(count, DIM).astype(np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+def test_hash_file_is_sha256_of_contents(tmp_path):
+    path = tmp_path / 'still.jpg'
+    path.write_bytes(b'not really a jpeg' * 1000)
+    assert hash_file(path, chunk_size=64) == hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def test_round_trip(tmp_path):
+    rows = unit_rows(3)
+    cache = EmbeddingCache(tmp_path, MODEL_ID, DIM, 'pp1-full')
+    for i, row in enumerate(rows):
+        cache.put(f"key{i}", row)
+
+    # Buffered entries are served before the flush
+    np.testing.assert_array_equal(cache.get('key1'), rows[1])
+    cache.flush()
+
+    reopened = EmbeddingCache(tmp_path, MODEL_ID, DIM, 'pp1-full')
+    assert len(reopened) == 3
+    for i, row in enumerate(rows):
+        np.testing.assert_array_equal(reopened.get(f"key{i}"), row)
+    assert reopened.get('missing') is None
+    assert reopened.get(None) is None
+    assert (reopened.hits, reopened.misses) == (3, 2)
+
+
+def test_appends_across_flushes(tmp_path):
+    rows = unit_rows(4)
+    cache = EmbeddingCache(tmp_path, MODEL_ID, DIM)
+    cache.put('a', rows[0])
+    cache.put('b', rows[1])
+    cache.flush()
+    cache.put('c', rows[2])
+    # Already stored keys are never written twice
+    cache.put('a', rows[3])
+    cache.flush()
+
+    reopened = EmbeddingCache(tmp_path, MODEL_ID, DIM)
+    assert len(reopened) == 3
+    np.testing.assert_array_equal(reopened.get('a'), rows[0])
+    np.testing.assert_array_equal(reopened.get('c'), rows[2])
+    assert reopened.matrix_path.stat().st_size == 3 * DIM * 4
+
+
+def test_preprocessing_tags_get_separate_caches(tmp_path):
+    reduced = EmbeddingCache(tmp_path, MODEL_ID, DIM, 'pp1-reduced2x')
+    reduced.put('key', unit_rows(1)[0])
+    reduced.flush()
+
+    full = EmbeddingCache(tmp_path, MODEL_ID, DIM, 'pp1-full')
+    assert full.dir != reduced.dir
+    assert full.get('key') is None
+    assert EmbeddingCache(tmp_path, MODEL_ID, DIM, 'pp1-reduced2x').get('key') is not None
+
+
+def test_index_for_other_model_is_ignored(tmp_path):
+    cache = EmbeddingCache(tmp_path, MODEL_ID, DIM)
+    cache.put('key', unit_rows(1)[0])
+    cache.flush()
+
+    # Same directory, different dimension: stale rows must not be read back
+    assert EmbeddingCache(tmp_path, MODEL_ID, DIM * 2).get('key') is None
+
+
+def test_partial_row_is_dropped(tmp_path):
+    rows = unit_rows(2)
+    cache = EmbeddingCache(tmp_path, MODEL_ID, DIM)
+    cache.put('a', rows[0])
+    cache.put('b', rows[1])
+    cache.flush()
+
+    # Simulate a writer interrupted halfway through its second row
+    with open(cache.matrix_path, 'r+b') as f:
+        f.truncate(DIM * 4 + DIM * 2)
+
+    reopened = EmbeddingCache(tmp_path, MODEL_ID, DIM)
+    np.testing.assert_array_equal(reopened.get('a'), rows[0])
+    assert reopened.get('b') is None
+
+    reopened.put('b', rows[1])
+    reopened.flush()
+    np.testing.assert_array_equal(EmbeddingCache(tmp_path, MODEL_ID, DIM).get('b'), rows[1])
+
+
+def test_preprocessing_id_depends_on_decode_mode():
+    assert preprocessing_id(True) != preprocessing_id(False)
+    assert preprocessing_id(True) == preprocessing_id(True)
+
+
+def test_pipeline_round_trip(classify_images, image_paths, tmp_path):
+    cache = classify_images.open_embedding_cache(tmp_path / 'cache')
+    computed = classify_images.get_embeddings(image_paths, batch_size=2, cache=cache)
+    assert (cache.hits, cache.misses) == (0, len(image_paths))
+
+    reopened = classify_images.open_embedding_cache(tmp_path / 'cache')
+    cached = classify_images.get_embeddings(image_paths, batch_size=2, cache=reopened)
+    assert (reopened.hits, reopened.misses) == (len(image_paths), 0)
+    np.testing.assert_array_equal(cached, computed)
+
+
+def test_full_decode_uses_its_own_cache(classify_images, image_paths, tmp_path):
+    reduced = classify_images.open_embedding_cache(tmp_path / 'cache')
+    classify_images.get_embeddings(image_paths, cache=reduced)
+
+    classify_images.set_io_options(fast_decode=False)
+    full = classify_images.open_embedding_cache(tmp_path / 'cache')
+    assert full.dir != reduced.dir
+    classify_images.get_embeddings(image_paths, cache=full)
+    assert full.hits == 0
@@ -0,0 +1,25 @@
+"""classify_images' batched embedding pipeline on a stand-in backbone"""
+
+import numpy as np
+
+
+def test_batched_embeddings_match_single_images(classify_images, image_paths):
+    batched = classify_images.get_embeddings(image_paths, batch_size=3)
+    single = np.concatenate([classify_images.get_embeddings([path], batch_size=1) for path in image_paths])
+
+    assert batched.shape == (len(image_paths), 64)
+    np.testing.assert_allclose(np.linalg.norm(batched, axis=1), 1.0, atol=1e-5)
+    np.testing.assert_allclose(batched, single, atol=1e-5)
+
+
+def test_unreadable_image_gets_zero_row(classify_images, image_paths):
+    broken = image_paths[0].parent / 'broken.jpg'
+    broken.write_bytes(b'not a jpeg')
+
+    valid = []
+    for _, _, _, batch_valid, _ in classify_images.iter_embeddings([broken] + image_paths, batch_size=4):
+        valid.extend(bool(v) for v in batch_valid)
+    assert valid == [False] + [True] * len(image_paths)
+
+    embeddings = classify_images.get_embeddings([broken] + image_paths, batch_size=4)
+    assert not embeddings[0].any()
@@ -0,0 +1,66 @@
+"""Round trips through the exported NumPy classifier head"""
+
+import numpy as np
+import pytest
+
+from linear_head import LinearHead, head_path_for
+
+DIM = 16
+
+
+@pytest.fixture
+def embeddings():
+    rows = np.random.RandomState(0).randn(200, DIM).astype(np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+def test_head_path_for():
+    assert str(head_path_for('models/classifier.pkl')) == 'models/classifier.head.npz'
+
+
+def test_save_load_round_trip(tmp_path, embeddings):
+    rng = np.random.RandomState(1)
+    head = LinearHead(rng.randn(DIM), 0.25, [0, 1], 'abc12345', 'random-clip-tiny', 2)
+    path = tmp_path / 'classifier.head.npz'
+    head.save(path)
+
+    loaded = LinearHead.load(path)
+    np.testing.assert_array_equal(loaded.coef, head.coef)
+    assert loaded.intercept == pytest.approx(0.25)
+    assert list(loaded.classes) == [0, 1]
+    assert (loaded.model_version, loaded.backbone, loaded.depth) == ('abc12345', 'random-clip-tiny', 2)
+    assert loaded.dim == DIM
+    np.testing.assert_array_equal(loaded.predict_proba(embeddings), head.predict_proba(embeddings))
+
+
+def test_full_depth_round_trips_as_none(tmp_path):
+    path = tmp_path / 'classifier.head.npz'
+    LinearHead(np.ones(DIM), 0.0, [0, 1]).save(path)
+    assert LinearHead.load(path).depth is None
+
+
+def test_matches_sklearn(embeddings):
+    linear_model = pytest.importorskip('sklearn.linear_model')
+    labels = (embeddings[:, 0] + 0.3 * embeddings[:, 1] > 0).astype(int)
+    classifier = linear_model.LogisticRegression(max_iter=1000, random_state=42).fit(embeddings, labels)
+
+    head = LinearHead.from_sklearn(classifier, 'abc12345', 'random-clip-tiny')
+    np.testing.assert_allclose(head.predict_proba(embeddings), classifier.predict_proba(embeddings)[:, 1],
+                               atol=1e-5)
+
+    predictions, confidences = head.predict(embeddings)
+    np.testing.assert_array_equal(predictions, classifier.predict(embeddings))
+    np.testing.assert_allclose(confidences, classifier.predict_proba(embeddings).max(axis=1), atol=1e-5)
+
+
+def test_rejects_multiclass():
+    with pytest.raises(ValueError):
+        LinearHead(np.ones(DIM), 0.0, [0, 1, 2])
+
+
+def test_extreme_logits_stay_finite():
+    head = LinearHead(np.ones(DIM), 0.0, [0, 1])
+    probabilities = head.predict_proba(np.array([np.full(DIM, 1e4), np.full(DIM, -1e4)], dtype=np.float32))
+    assert np.all(np.isfinite(probabilities))
+    assert probabilities[0] == pytest.approx(1.0)
+    assert probabilities[1] == pytest.approx(0.0)
@@ -0,0 +1,61 @@
+"""Parity of preprocessing.py with HuggingFace's CLIPImageProcessor (parity_check.py preprocess, offline)"""
+
+import numpy as np
+import pytest
+
+from preprocessing import (
+    CLIP_IMAGE_SIZE, DECODE_MARGIN, normalize_pixels, open_image, resize_and_crop
+)
+
+
+@pytest.fixture(scope='module')
+def processor():
+    transformers = pytest.importorskip('transformers')
+    # The defaults are CLIP's: shortest side 224 bicubic, 224 center crop, CLIP mean / std
+    return transformers.CLIPImageProcessor()
+
+
+def our_pixels(images):
+    return normalize_pixels(np.stack([resize_and_crop(image, CLIP_IMAGE_SIZE) for image in images]))
+
+
+def test_resize_and_crop_shape(images):
+    for image in images:
+        pixels = resize_and_crop(image, CLIP_IMAGE_SIZE)
+        assert pixels.shape == (CLIP_IMAGE_SIZE, CLIP_IMAGE_SIZE, 3)
+        assert pixels.dtype == np.uint8
+
+
+def test_pixels_match_clip_image_processor(images, processor):
+    reference = processor(images=images, return_tensors='np')['pixel_values']
+    ours = our_pixels(images)
+
+    assert ours.shape == reference.shape
+    assert ours.dtype == np.float32
+    np.testing.assert_allclose(ours, reference, atol=1e-4)
+
+
+def test_embeddings_match_clip_image_processor(images, processor, stand_in_model):
+    torch = pytest.importorskip('torch')
+    _, model = stand_in_model
+    reference = processor(images=images, return_tensors='pt')['pixel_values']
+
+    with torch.no_grad():
+        expected = model.get_image_features(pixel_values=reference).numpy()
+        actual = model.get_image_features(pixel_values=torch.from_numpy(our_pixels(images))).numpy()
+
+    expected /= np.linalg.norm(expected, axis=1, keepdims=True)
+    actual /= np.linalg.norm(actual, axis=1, keepdims=True)
+    assert np.min(np.sum(expected * actual, axis=1)) > 1 - 1e-4
+
+
+def test_reduced_decode_keeps_margin(image_paths):
+    target = CLIP_IMAGE_SIZE * DECODE_MARGIN
+    for path in image_paths:
+        full = open_image(path, fast=False)
+        reduced = open_image(path, fast=True, target=target)
+
+        assert min(reduced.size) >= min(target, min(full.size))
+        # Aspect ratio is kept, so the center crop frames the same content
+        assert reduced.size[0] / reduced.size[1] == pytest.approx(full.size[0] / full.size[1], rel=0.02)
+
@@ -0,0 +1,28 @@
+"""train_classifier.py --probe-depths embedding through the batched pipeline"""
+
+import copy
+
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+from preprocessing import preprocessing_id
+
+
+def test_probe_depths_match_training_at_each_depth(classify_images, stand_in_model, image_paths, tmp_path):
+    import train_classifier
+
+    backbone, model = stand_in_model
+    full = classify_images.get_embeddings(image_paths, batch_size=2)
+
+    # Truncation is in place, so probe a copy of the shared stand-in
+    layer_embeddings, ok = train_classifier.extract_layer_embeddings(
+        image_paths, copy.deepcopy(model), 'cpu', [1, 2], batch_size=2, cache_dir=tmp_path / 'cache'
+    )
+
+    assert ok == list(range(len(image_paths)))
+    np.testing.assert_allclose(layer_embeddings[2], full, atol=1e-5)
+    assert not np.allclose(layer_embeddings[1], full, atol=1e-3)
+
+    # Each depth is cached under the key training or classifying at that depth uses
+    cache = EmbeddingCache(tmp_path / 'cache', f"{backbone.model_id}@L1", 64, preprocessing_id(True))
+    assert len(cache) == len(image_paths)
@@ -0,0 +1,106 @@
+"""Round trips through the per-directory result manifests"""
+
+import json
+import os
+
+import pytest
+
+from embedding_cache import hash_file
+from result_manifest import MANIFEST_NAME, ResultManifests
+
+VERSION = 'abc12345:random/clip-vit-L2-H64-P32-D64:pp1-reduced2x:torch'
+
+
+@pytest.fixture
+def stills(tmp_path):
+    still_dir = tmp_path / 'stills'
+    still_dir.mkdir()
+    paths = []
+    for i in range(3):
+        path = still_dir / f"still_{i:04d}.jpg"
+        path.write_bytes(bytes([i]) * 100)
+        paths.append(path)
+    return paths
+
+
+def result_for(path, label='keep'):
+    return {'path': str(path), 'label': label, 'confidence': 0.9}
+
+
+def record_all(stills, version=VERSION, **kwargs):
+    manifests = ResultManifests(version)
+    manifests.record([result_for(path) for path in stills], **kwargs)
+    manifests.save()
+    return manifests
+
+
+def test_round_trip(stills):
+    record_all(stills)
+
+    manifests = ResultManifests(VERSION)
+    results, remaining = manifests.lookup(stills)
+    assert remaining == []
+    assert results == [result_for(path) for path in stills]
+    assert manifests.hits == len(stills)
+
+
+def test_other_version_is_reclassified(stills):
+    record_all(stills)
+
+    results, remaining = ResultManifests('other').lookup(stills)
+    assert results == []
+    assert remaining == stills
+
+
+def test_unrecorded_and_missing_stills_remain(stills, tmp_path):
+    record_all(stills[:2])
+    missing = tmp_path / 'stills' / 'gone.jpg'
+
+    results, remaining = ResultManifests(VERSION).lookup(stills + [missing])
+    assert [result['path'] for result in results] == [str(path) for path in stills[:2]]
+    assert remaining == [stills[2], missing]
+
+
+def test_touched_still_with_same_bytes_is_reused(stills):
+    record_all(stills)
+    stat = stills[0].stat()
+    os.utime(stills[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    manifests = ResultManifests(VERSION)
+    results, remaining = manifests.lookup(stills)
+    assert remaining == []
+    manifests.save()
+
+    # The new mtime was written back, so the next lookup skips the hash
+    with open(stills[0].parent / MANIFEST_NAME) as f:
+        entry = json.load(f)['entries'][stills[0].name]
+    assert entry['mtime_ns'] == stills[0].stat().st_mtime_ns
+
+
+def test_rewritten_still_is_reclassified(stills):
+    record_all(stills)
+    stills[1].write_bytes(b'different pixels' * 10)
+
+    results, remaining = ResultManifests(VERSION).lookup(stills)
+    assert remaining == [stills[1]]
+    assert len(results) == 2
+
+
+def test_digests_and_phashes_are_kept(stills):
+    digests = {str(stills[0]): hash_file(stills[0])}
+    record_all(stills, digests=digests, phashes={str(stills[1]): 'f0f0f0f0f0f0f0f0'})
+
+    manifests = ResultManifests(VERSION)
+    assert manifests.phashes(stills) == {str(stills[1]): 'f0f0f0f0f0f0f0f0'}
+
+    manifests.remember_phashes({str(stills[2]): '0f0f0f0f0f0f0f0f'})
+    manifests.save()
+    assert set(ResultManifests(VERSION).phashes(stills)) == {str(stills[1]), str(stills[2])}
+
+
+def test_unreadable_manifest_is_ignored(stills):
+    (stills[0].parent / MANIFEST_NAME).write_text('{not json')
+
+    results, remaining = ResultManifests(VERSION).lookup(stills)
+    assert results == []
+    assert remaining == stills
@@ -3,65 +3,189 @@
 Train image classifier using CLIP embeddings.
 
 Usage:
-    python train_classifier.py --data ../training-data --output ../models/classifier.pkl
+    python train_classifier.py --data ../training-data --output ../models/classifier.pkl [--backbone NAME]
+
+    The backbone defaults to the one the existing model at --output was
+    trained with (clip-vit-b32 for a new model); see backbones.py.
+
+    python train_classifier.py --data ../training-data --output ../models/classifier.pkl --probe-depths 4,6,8,10,12
+    python train_classifier.py --data ../training-data --output ../models/classifier.pkl --depth 8
+
+    --probe-depths reports cross-validated accuracy of linear probes on
+    features from several encoder depths (nothing is saved); --depth trains
+    on features after that layer, and classify_images.py then only runs
+    the encoder up to it.
+
+    Add --startup-profile to print an import-time breakdown once CLIP is loaded.
+    Add --profile PATH to write per-stage wall/CPU time, item counts and
+    peak RSS as JSON (see profiling.py).
 """
 
+from __future__ import annotations
+
 import argparse
 import pickle
 import json
 import hashlib
 import shutil
+import sys
 from datetime import datetime
 from pathlib import Path
-from typing import Tuple, List
+from typing import TYPE_CHECKING, Tuple, List, Optional
 
 import numpy as np
-import torch
-from PIL import Image
-from transformers import CLIPProcessor, CLIPModel
-from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import train_test_split, cross_validate
-from sklearn.metrics import accuracy_score, precision_score, recall_score, confusion_matrix, classification_report
+
+import classify_images
+import profiling
+import startup
+from startup import import_module
+from backbones import DEFAULT_BACKBONE, get_backbone
+from embedding_cache import EmbeddingCache, DEFAULT_CACHE_DIR
+from preprocessing import DECODE_MARGIN, open_image, resize_and_crop
+from linear_head import LinearHead, head_path_for
+from phash_index import PhashIndex, image_phash, phash_path_for
+
+if TYPE_CHECKING:
+    from vision_bundle import CLIPVisionTower
 
 
 def extract_clip_embeddings(
     image_paths: List[Path],
-    model: CLIPModel,
-    processor: CLIPProcessor,
-    device: str
-) -> np.ndarray:
+    batch_size: int = classify_images.DEFAULT_BATCH_SIZE,
+    cache: Optional[EmbeddingCache] = None
+) -> Tuple[np.ndarray, List[int]]:
     """
     Extract CLIP embeddings for a list of images.
 
+    Runs classify_images.iter_embeddings, so training decodes, batches and
+    caches exactly like classification: images are decoded on the prefetch
+    threads and embedded one batch per forward pass. Configure the model
+    with classify_images.use_clip_model() first.
+
     Args:
         image_paths: List of paths to image files
-        model: CLIP model
-        processor: CLIP processor
-        device: Device to run inference on ('cpu' or 'cuda')
+        batch_size: Images per CLIP forward pass
+        cache: Optional embedding cache to consult before running CLIP
 
     Returns:
-        numpy array of embeddings (N x embedding_dim)
+        (embeddings, ok) where embeddings is an (N x embedding_dim) array
+        and ok lists the indices of the images that loaded
     """
     embeddings = []
+    ok = []
 
-    for img_path in image_paths:
-        try:
-            image = Image.open(img_path).convert('RGB')
-            inputs = processor(images=image, return_tensors="pt").to(device)
+    for start, batch, _, valid, _ in classify_images.iter_embeddings(image_paths, batch_size=batch_size,
+                                                                     cache=cache):
+        embeddings.append(batch[valid])
+        ok.extend(int(i) for i in start + np.flatnonzero(valid))
+    if cache is not None:
+        cache.flush()
 
-            with torch.no_grad():
-                image_features = model.get_image_features(**inputs)
+    if not embeddings:
+        return np.zeros((0, classify_images.load_backend().dim), dtype=np.float32), ok
+    return np.concatenate(embeddings), ok
 
-            # Normalize embedding
-            embedding = image_features.cpu().numpy()[0]
-            embedding = embedding / np.linalg.norm(embedding)
-            embeddings.append(embedding)
 
+def extract_layer_embeddings(
+    image_paths: List[Path],
+    model: CLIPVisionTower,
+    device: str,
+    depths: List[int],
+    batch_size: int = classify_images.DEFAULT_BATCH_SIZE,
+    cache_dir: Optional[Path] = None
+) -> Tuple[dict, List[int]]:
+    """
+    Extract CLIP embeddings from several encoder depths.
+
+    Each depth runs through extract_clip_embeddings with the model truncated
+    to it, deepest first since truncation is in place, so probes batch and
+    prefetch like training does and share the cache entries of training or
+    classifying at that --depth. Configure classify_images' backbone and I/O
+    options first; the model is left truncated to the shallowest depth.
+
+    Returns:
+        (embeddings, ok) where embeddings maps depth to an (N x embedding_dim)
+        array and ok lists the indices of the images that loaded
+    """
+    vision_bundle = import_module('vision_bundle')
+    total_layers = vision_bundle.num_layers(model)
+    embeddings = {}
+    ok = []
+
+    for depth in sorted(depths, reverse=True):
+        vision_bundle.truncate_layers(model, depth)
+        classify_images.unload_backend()
+        classify_images.set_depth(depth if depth < total_layers else None)
+        classify_images.use_clip_model(model, device)
+        cache = None
+        if cache_dir is not None:
+            cache = classify_images.open_embedding_cache(cache_dir, model.config.projection_dim)
+
+        print(f"Depth {depth}:")
+        # Decode failures don't depend on the depth, so ok is the same every time
+        embeddings[depth], ok = extract_clip_embeddings(image_paths, batch_size=batch_size, cache=cache)
+
+    return embeddings, ok
+
+
+def probe_depths(layer_embeddings: dict, labels: np.ndarray, total_layers: int):
+    """
+    Cross-validate a linear probe on each depth's embeddings and print the
+    accuracy next to the fraction of encoder layers it needs.
+    """
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.model_selection import cross_validate
+
+    print(f"\n{'='*50}")
+    print(f"LINEAR PROBE RESULTS BY DEPTH (5-fold):")
+    print(f"{'='*50}")
+    print(f"Depth  Layers  Accuracy           F1-Score")
+
+    results = {}
+    for depth in sorted(layer_embeddings):
+        cv_results = cross_validate(
+            LogisticRegression(max_iter=1000, random_state=42),
+            layer_embeddings[depth],
+            labels,
+            cv=5,
+            scoring=['accuracy', 'f1']
+        )
+        accuracy = cv_results['test_accuracy'].mean()
+        results[depth] = accuracy
+        print(f"{depth:5d}  {depth / total_layers:6.0%}  "
+              f"{accuracy:.3f} (+/- {cv_results['test_accuracy'].std():.3f})  {cv_results['test_f1'].mean():.3f}")
+
+    # Shallowest depth that stays within a point of the deepest probe
+    deepest = results[max(results)]
+    shallowest = min(depth for depth, accuracy in results.items() if accuracy >= deepest - 0.01)
+    print(f"{'='*50}")
+    print(f"Shallowest depth within 0.01 accuracy of depth {max(results)}: {shallowest} "
+          f"(train with --depth {shallowest})")
+
+
+def build_phash_index(
+    image_paths: List[Path],
+    labels: np.ndarray,
+    image_size: int,
+    model_version: str,
+    fast_decode: bool = True
+) -> PhashIndex:
+    """
+    pHash every training image on the crop CLIP sees, for the first stage
+    of classify_images.py --cascade
+    """
+    hashes = []
+    hash_labels = []
+
+    for img_path, label in zip(image_paths, labels):
+        try:
+            image = open_image(img_path, fast=fast_decode, target=image_size * DECODE_MARGIN)
+            hashes.append(image_phash(resize_and_crop(image, image_size)))
+            hash_labels.append(label)
         except Exception as e:
-            print(f"Warning: Failed to process {img_path}: {e}")
-            continue
+            print(f"Warning: Failed to hash {img_path}: {e}")
 
-    return np.array(embeddings)
+    return PhashIndex(np.array(hashes, dtype=np.uint64), hash_labels, model_version)
 
 
 def load_labeled_data(data_dir: Path) -> Tuple[List[Path], List[int]]:
@@ -116,11 +240,23 @@ def compute_data_hash(image_paths: List[Path]) -> str:
     return hasher.hexdigest()[:8]
 
 
+def previous_backbone(output_path: Path) -> Optional[str]:
+    """Backbone recorded in the metadata of an existing model, if any"""
+    meta_path = output_path.with_suffix('.meta.json')
+    if not meta_path.exists():
+        return None
+    with open(meta_path, 'r') as f:
+        return json.load(f).get('backbone', DEFAULT_BACKBONE)
+
+
 def save_model_metadata(
     output_path: Path,
     data_hash: str,
     metrics: dict,
-    training_info: dict
+    training_info: dict,
+    backbone: str = DEFAULT_BACKBONE,
+    embedding_dim: int = 512,
+    depth: Optional[int] = None
 ):
     """
     Save model metadata to JSON file alongside the model.
@@ -130,11 +266,18 @@ def save_model_metadata(
         data_hash: Hash of training data
         metrics: Dictionary of cross-validation metrics
         training_info: Additional training information (image counts, etc.)
+        backbone: Registry name of the backbone the embeddings came from
+        embedding_dim: Embedding dimension of that backbone
+        depth: Encoder layer the embeddings were taken after (None: all layers)
     """
     metadata = {
         'version': 1,
         'timestamp': datetime.utcnow().isoformat() + 'Z',
         'data_hash': data_hash,
+        'backbone': backbone,
+        'backbone_model_id': get_backbone(backbone).model_id,
+        'embedding_dim': embedding_dim,
+        'depth': depth,
         'metrics': metrics,
         'training_info': training_info
     }
@@ -150,7 +293,7 @@ def archive_previous_model(output_path: Path):
     """
     Archive existing model to archive/ directory before overwriting.
 
-    Archives both .pkl and .meta.json files if they exist.
+    Archives the .pkl, .head.npz and .meta.json files if they exist.
     """
     if not output_path.exists():
         return
@@ -174,6 +317,11 @@ def archive_previous_model(output_path: Path):
         meta_archive_path = archive_dir / f"{output_path.stem}_{timestamp}.meta.json"
         shutil.copy2(meta_path, meta_archive_path)
 
+    # Archive exported head and pHash index if they exist
+    for path in (head_path_for(output_path), phash_path_for(output_path)):
+        if path.exists():
+            shutil.copy2(path, archive_dir / f"{output_path.stem}_{timestamp}{path.suffixes[-2]}{path.suffix}")
+
 
 def main():
     parser = argparse.ArgumentParser(description='Train image classifier using CLIP embeddings')
@@ -181,27 +329,125 @@ def main():
     parser.add_argument('--output', type=str, required=True, help='Path to save trained model (.pkl)')
     parser.add_argument('--device', type=str, default='cpu', help='Device to use (cpu or cuda)')
     parser.add_argument('--dry-run', action='store_true', help='Evaluate model without saving')
+    parser.add_argument('--cache-dir', type=str, default=str(DEFAULT_CACHE_DIR),
+                        help='Embedding cache directory (default: ../models/embedding-cache)')
+    parser.add_argument('--no-cache', action='store_true', help='Disable the embedding cache')
+    parser.add_argument('--batch-size', type=int, default=classify_images.DEFAULT_BATCH_SIZE,
+                        help=f'Images per CLIP forward pass (default: {classify_images.DEFAULT_BATCH_SIZE})')
+    parser.add_argument('--io-threads', type=int, default=classify_images.DEFAULT_IO_THREADS,
+                        help=f'Background image decode threads (default: {classify_images.DEFAULT_IO_THREADS})')
+    parser.add_argument('--full-decode', action='store_true',
+                        help='Decode images at full resolution instead of near CLIP input size')
+    parser.add_argument('--backbone', type=str,
+                        help=f'Vision backbone: a registered name or random-clip-<layers>x<hidden> '
+                             f'(default: the existing model\'s, else {DEFAULT_BACKBONE})')
+    parser.add_argument('--depth', type=int,
+                        help='Train on features after this encoder layer (default: all layers)')
+    parser.add_argument('--probe-depths', type=str, metavar='LIST',
+                        help='Report probe accuracy for these comma-separated depths, e.g. 4,6,8,10,12 (saves nothing)')
+    parser.add_argument('--startup-profile', action='store_true',
+                        help='Print an import-time breakdown once CLIP is loaded')
+    parser.add_argument('--profile', type=str, metavar='PATH',
+                        help="Write per-stage wall/CPU time, item counts and peak RSS as JSON to PATH ('-' for stderr)")
     args = parser.parse_args()
 
+    if args.startup_profile:
+        startup.enable()
+
+    if args.profile:
+        profiling.enable(args.profile)
+
     data_dir = Path(args.data)
     output_path = Path(args.output)
-
-    print("Loading CLIP model...")
-    model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-    processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
-    model.to(args.device)
-    model.eval()
+    try:
+        backbone = get_backbone(args.backbone or previous_backbone(output_path) or DEFAULT_BACKBONE)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    # Validate inputs before paying for the torch / transformers / sklearn imports
+    if args.depth is not None and args.probe_depths:
+        print("Error: --depth and --probe-depths can't be combined")
+        sys.exit(1)
+
+    if args.batch_size <= 0 or args.io_threads <= 0:
+        print("Error: --batch-size and --io-threads must be positive")
+        sys.exit(1)
+
+    try:
+        depths = sorted({int(d) for d in args.probe_depths.split(',')}) if args.probe_depths else None
+    except ValueError:
+        print(f"Error: --probe-depths must be comma-separated layer numbers, got {args.probe_depths}")
+        sys.exit(1)
+
+    if not data_dir.is_dir():
+        print(f"Error: Training data directory not found: {data_dir}")
+        sys.exit(1)
 
     print(f"\nLoading training data from {data_dir}...")
-    image_paths, labels = load_labeled_data(data_dir)
+    try:
+        image_paths, labels = load_labeled_data(data_dir)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
     labels = np.array(labels)
 
+    torch = import_module('torch')
+    # vision_bundle imports transformers at module level; import it first so
+    # the startup profile times it as its own stage
+    import_module('transformers')
+    vision_bundle = import_module('vision_bundle')
+    if args.device.startswith('cuda') and not torch.cuda.is_available():
+        print(f"Error: --device {args.device} requested but CUDA is not available")
+        sys.exit(1)
+
+    print(f"Loading CLIP model ({backbone.name}: {backbone.model_id})...")
+    with startup.phase('load CLIP model'), profiling.stage('load CLIP model'):
+        model = vision_bundle.load_clip_vision(backbone)
+        model.to(args.device)
+    embedding_dim = model.config.projection_dim
+    total_layers = vision_bundle.num_layers(model)
+
+    for depth in (depths or []) + ([args.depth] if args.depth is not None else []):
+        if not 1 <= depth <= total_layers:
+            print(f"Error: Depth {depth} is out of range; {backbone.name} has {total_layers} layers")
+            sys.exit(1)
+
+    # Full depth is the untruncated model
+    depth = args.depth if args.depth is not None and args.depth < total_layers else None
+    if depth is not None:
+        vision_bundle.truncate_layers(model, depth)
+        print(f"Using features after layer {depth} of {total_layers}")
+
+    with startup.phase('import sklearn'):
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.model_selection import train_test_split, cross_validate
+        from sklearn.metrics import confusion_matrix, classification_report
+    startup.ready()
+
+    # Embed through classify_images.py's pipeline with the model loaded above;
+    # its backbone and depth select the same cache entries classification uses
+    classify_images.set_backbone(backbone.name)
+    classify_images.set_io_options(args.io_threads, fast_decode=not args.full_decode)
+
+    if depths:
+        print(f"\nExtracting CLIP embeddings at depths {', '.join(map(str, depths))} for {len(image_paths)} images...")
+        layer_embeddings, ok = extract_layer_embeddings(image_paths, model, args.device, depths,
+                                                        batch_size=args.batch_size,
+                                                        cache_dir=None if args.no_cache else args.cache_dir)
+        probe_depths(layer_embeddings, labels[ok], total_layers)
+        return
+
     print(f"\nExtracting CLIP embeddings for {len(image_paths)} images...")
-    embeddings = extract_clip_embeddings(image_paths, model, processor, args.device)
+    classify_images.set_depth(depth)
+    classify_images.use_clip_model(model, args.device)
+    cache = None if args.no_cache else classify_images.open_embedding_cache(args.cache_dir, embedding_dim)
+    embeddings, ok = extract_clip_embeddings(image_paths, batch_size=args.batch_size, cache=cache)
 
-    if len(embeddings) != len(labels):
-        print(f"Warning: Some images failed to process. Using {len(embeddings)}/{len(labels)} images")
-        # This shouldn't happen with our error handling, but be safe
+    if len(ok) != len(labels):
+        print(f"Warning: Some images failed to process. Using {len(ok)}/{len(labels)} images")
+        image_paths = [image_paths[i] for i in ok]
+        labels = labels[ok]
 
     # Check for class imbalance
     keep_count = np.sum(labels == 0)
@@ -218,14 +464,15 @@ def main():
     classifier = LogisticRegression(max_iter=1000, random_state=42)
 
     # Cross-validation with multiple metrics
-    cv_results = cross_validate(
-        classifier,
-        embeddings,
-        labels,
-        cv=5,
-        scoring=['accuracy', 'precision', 'recall', 'f1'],
-        return_train_score=False
-    )
+    with profiling.stage('cross-validation', len(embeddings)):
+        cv_results = cross_validate(
+            classifier,
+            embeddings,
+            labels,
+            cv=5,
+            scoring=['accuracy', 'precision', 'recall', 'f1'],
+            return_train_score=False
+        )
 
     # Calculate mean and std for each metric
     accuracy_mean = cv_results['test_accuracy'].mean()
@@ -247,7 +494,8 @@ def main():
 
     # Train on full dataset for final model
     print(f"\nTraining final model on full dataset ({len(embeddings)} images)...")
-    classifier.fit(embeddings, labels)
+    with profiling.stage('fit', len(embeddings)):
+        classifier.fit(embeddings, labels)
 
     # Generate per-class metrics using a held-out test set
     print(f"\nEvaluating per-class performance (80/20 split)...")
@@ -255,9 +503,10 @@ def main():
         embeddings, labels, test_size=0.2, random_state=42, stratify=labels
     )
 
-    temp_classifier = LogisticRegression(max_iter=1000, random_state=42)
-    temp_classifier.fit(X_train, y_train)
-    y_pred = temp_classifier.predict(X_test)
+    with profiling.stage('evaluate', len(embeddings)):
+        temp_classifier = LogisticRegression(max_iter=1000, random_state=42)
+        temp_classifier.fit(X_train, y_train)
+        y_pred = temp_classifier.predict(X_test)
 
     print(f"\nPer-Class Metrics:")
     print(classification_report(
@@ -311,8 +560,20 @@ def main():
             pickle.dump(classifier, f)
         print(f"\n✓ Model saved to {output_path}")
 
+        # Export NumPy head so classification doesn't need scikit-learn
+        head_path = head_path_for(output_path)
+        LinearHead.from_sklearn(classifier, data_hash, backbone.name, depth).save(head_path)
+        print(f"✓ Classifier head exported to {head_path}")
+
+        # Export training-image pHashes for the classify_images.py --cascade first stage
+        phash_path = phash_path_for(output_path)
+        with profiling.stage('phash index', len(image_paths)):
+            build_phash_index(image_paths, labels, model.config.image_size, data_hash,
+                              fast_decode=not args.full_decode).save(phash_path)
+        print(f"✓ pHash index exported to {phash_path}")
+
         # Save metadata
-        save_model_metadata(output_path, data_hash, metrics, training_info)
+        save_model_metadata(output_path, data_hash, metrics, training_info, backbone.name, embedding_dim, depth)
 
 
 if __name__ == '__main__':
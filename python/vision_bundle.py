@@ -0,0 +1,203 @@
+"""
+Local CLIP vision bundles.
+
+Classification and training only ever call the image side of CLIP, so
+prepare_model.py saves just the vision tower and visual projection of a
+backbone (see backbones.py) as a safetensors bundle under
+models/clip-vision/<backbone>/:
+
+    config.json         CLIPVisionConfig (including projection_dim)
+    model.safetensors   vision tower + projection weights (float32)
+    bundle.json         {"version", "model_id", "projection_dim", "image_size"}
+
+load_clip_vision() loads the bundle with local_files_only, so it never
+touches the HuggingFace hub; safetensors memory-maps the weight file instead
+of unpickling it. Without a bundle it falls back to downloading the vision
+tower from the hub (and says so). Stand-in backbones are never downloaded:
+their seeded random weights are built and saved as a bundle on first load.
+
+apply_precision() optionally switches the loaded tower to int8 dynamic
+quantization or bf16 autocast for faster CPU inference; check the effect on
+labels with `parity_check.py precision`.
+
+truncate_layers() drops the encoder layers after a given depth, so the CLS
+token of an intermediate layer goes through post_layernorm and the visual
+projection in place of the last layer's (train_classifier.py --depth and
+--probe-depths).
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import torch
+from transformers import CLIPConfig, CLIPVisionConfig, CLIPVisionModelWithProjection
+
+BUNDLE_ROOT = Path(__file__).resolve().parent.parent / 'models' / 'clip-vision'
+
+BUNDLE_VERSION = 1
+BUNDLE_INFO = 'bundle.json'
+WEIGHTS_FILE = 'model.safetensors'
+
+# Seed for the random weights of stand-in backbones
+STAND_IN_SEED = 0
+
+
+class CLIPVisionTower(CLIPVisionModelWithProjection):
+    """CLIPVisionModelWithProjection with CLIPModel's get_image_features() API"""
+
+    # Set by apply_precision('bf16'); None runs in the weights' own dtype
+    autocast_dtype = None
+
+    def get_image_features(self, pixel_values):
+        if self.autocast_dtype is None:
+            return self(pixel_values=pixel_values).image_embeds
+
+        with torch.autocast(device_type=pixel_values.device.type, dtype=self.autocast_dtype):
+            features = self(pixel_values=pixel_values).image_embeds
+        return features.float()
+
+
+def bundle_dir_for(backbone):
+    """Default bundle directory for a registry Backbone"""
+    return BUNDLE_ROOT / backbone.name
+
+
+def load_from_hub(model_id):
+    """
+    Load the vision tower of a full CLIP checkpoint from the HuggingFace hub.
+
+    The vision config inside a CLIPConfig doesn't always carry the joint
+    projection size, so it is copied over before loading the projection.
+    """
+    config = CLIPConfig.from_pretrained(model_id)
+    vision_config = config.vision_config
+    vision_config.projection_dim = config.projection_dim
+    return CLIPVisionTower.from_pretrained(model_id, config=vision_config)
+
+
+def build_stand_in(backbone):
+    """
+    Random-weight CLIPVisionTower with a stand-in backbone's geometry.
+
+    Weights are drawn from a fixed seed without disturbing the global torch
+    RNG, so every process building the same stand-in gets the same model.
+    """
+    with torch.random.fork_rng(devices=[]):
+        torch.manual_seed(STAND_IN_SEED)
+        return CLIPVisionTower(CLIPVisionConfig(**backbone.config))
+
+
+def read_bundle_info(bundle_dir):
+    """Return bundle.json contents, or None if there is no complete bundle"""
+    bundle_dir = Path(bundle_dir)
+    info_path = bundle_dir / BUNDLE_INFO
+    if not info_path.exists() or not (bundle_dir / WEIGHTS_FILE).exists():
+        return None
+
+    with open(info_path, 'r') as f:
+        info = json.load(f)
+
+    if info.get('version') != BUNDLE_VERSION:
+        return None
+    return info
+
+
+def save_bundle(model, model_id, bundle_dir):
+    """Write a CLIPVisionTower to bundle_dir as safetensors + bundle.json"""
+    bundle_dir = Path(bundle_dir)
+    bundle_dir.mkdir(parents=True, exist_ok=True)
+    model.save_pretrained(bundle_dir, safe_serialization=True)
+
+    info = {
+        'version': BUNDLE_VERSION,
+        'model_id': model_id,
+        'projection_dim': model.config.projection_dim,
+        'image_size': model.config.image_size
+    }
+    # Written last: a bundle without bundle.json is treated as incomplete
+    with open(bundle_dir / BUNDLE_INFO, 'w') as f:
+        json.dump(info, f, indent=2)
+
+    return info
+
+
+def load_clip_vision(backbone, bundle_dir=None):
+    """
+    Load a backbone's vision tower, preferring the local bundle.
+
+    Args:
+        backbone: Registry Backbone (see backbones.py)
+        bundle_dir: Bundle directory (default: models/clip-vision/<backbone>)
+
+    Returns:
+        CLIPVisionTower in eval mode, on the CPU
+    """
+    model_id = backbone.model_id
+    bundle_dir = bundle_dir or bundle_dir_for(backbone)
+    info = read_bundle_info(bundle_dir)
+
+    if info is not None and info['model_id'] == model_id:
+        model = CLIPVisionTower.from_pretrained(bundle_dir, local_files_only=True)
+    elif backbone.stand_in:
+        print(f"Creating random-weight stand-in {backbone.name} in {bundle_dir}", file=sys.stderr)
+        model = build_stand_in(backbone)
+        save_bundle(model, model_id, bundle_dir)
+    else:
+        if info is not None:
+            print(f"Warning: CLIP bundle in {bundle_dir} is for {info['model_id']}, not {model_id}", file=sys.stderr)
+        print(
+            f"Warning: No local CLIP bundle in {bundle_dir}, loading {model_id} from HuggingFace "
+            f"(run prepare_model.py --backbone {backbone.name} to work offline)",
+            file=sys.stderr
+        )
+        model = load_from_hub(model_id)
+
+    model.eval()
+    return model
+
+
+def num_layers(model):
+    """Number of transformer layers in the vision encoder"""
+    return len(model.vision_model.encoder.layers)
+
+
+def truncate_layers(model, depth):
+    """
+    Keep only the first depth encoder layers; later layers are never run.
+
+    The model's features then come from the CLS token after layer depth,
+    through the same post_layernorm + projection as the full model, so a
+    truncated model is a drop-in replacement with the same embedding size.
+    """
+    total = num_layers(model)
+    if not 1 <= depth <= total:
+        raise ValueError(f"Depth must be between 1 and {total}, got {depth}")
+
+    model.vision_model.encoder.layers = model.vision_model.encoder.layers[:depth]
+    model.config.num_hidden_layers = depth
+    return model
+
+
+def apply_precision(model, precision, device='cpu'):
+    """
+    Switch a loaded CLIPVisionTower to a reduced inference precision.
+
+    int8 applies dynamic quantization to every nn.Linear (weights stored as
+    int8, activations quantized on the fly); it only runs on the CPU. bf16
+    runs the forward pass under autocast and returns float32 features.
+
+    Returns:
+        (model, precision) where precision is what was actually applied
+    """
+    if precision == 'int8':
+        if device != 'cpu':
+            print(f"Warning: int8 quantization is CPU-only, using fp32 on {device}", file=sys.stderr)
+            return model, 'fp32'
+        torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    elif precision == 'bf16':
+        model.autocast_dtype = torch.bfloat16
+    elif precision != 'fp32':
+        raise ValueError(f"Unknown precision: {precision}")
+
+    return model, precision
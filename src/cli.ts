@@ -58,6 +58,11 @@ async function validateConfig(config: Config): Promise<void> {
     throw new Error('--hash-distance must be non-negative');
   }
 
+  // Check spot-check is a fraction (0 turns it off)
+  if (config.spotCheck !== undefined && !(config.spotCheck >= 0 && config.spotCheck <= 1)) {
+    throw new Error('--spot-check must be a number between 0 and 1');
+  }
+
   // Check format is valid
   if (!['jpg', 'png'].includes(config.format)) {
     throw new Error('--format must be jpg or png');
@@ -92,6 +97,8 @@ export function parseArgs(argv: string[]): Config {
     .option('--json <filename>', 'report filename', 'report.json')
     .option('--verbose', 'log FFmpeg commands and detailed output', false)
     .option('--classify', 'run ML classification on extracted frames', false)
+    .option('--classify-canonicals', 'embed only one frame per dedupe cluster and copy its label to duplicates', false)
+    .option('--spot-check <fraction>', 'with --classify-canonicals, fraction of duplicates to classify anyway', '0')
     .option('--add-to-blocklist <imagePath>', 'add image to blocklist by computing its pHash')
     .option('--blocklist-description <text>', 'description for blocklist entry (required with --add-to-blocklist)');
 
@@ -149,7 +156,9 @@ export function parseArgs(argv: string[]): Config {
     keepDuplicates: opts.keepDuplicates,
     json: opts.json,
     verbose: opts.verbose,
-    classify: opts.classify
+    classify: opts.classify,
+    classifyCanonicals: opts.classifyCanonicals,
+    spotCheck: parseFloat(opts.spotCheck)
   };
 }
 
@@ -1,12 +1,26 @@
-import { execa } from 'execa';
 import { existsSync } from 'fs';
 import { join } from 'path';
 import { logger } from '../../utils/logger.js';
-import type { ClassificationResult, Frame } from '../types.js';
+import { ClassifierServer } from './server.js';
+import type { ClassifyProgress, ClassifyTarget, ClusterTarget } from './server.js';
+import type { ClassificationResult, DedupeCluster, Frame } from '../types.js';
 
 // Re-export for convenience
 export type { ClassificationResult } from '../types.js';
 
+const SCRIPT_PATH = 'python/classify_images.py';
+// Kill the classifier when a request makes no progress for this long (covers
+// torch/CLIP startup before the first batch); long runs that keep reporting
+// progress are never cut off
+const STALL_TIMEOUT_MS = 120000;
+const PROGRESS_LOG_INTERVAL_MS = 10000;
+
+// Shared classifier process, reused by every classifyBatch call in a harvest
+let server: ClassifierServer | null = null;
+
+// Hamming distance for the classifier's own blocklist check (null: its default)
+let blocklistDistance: number | null = null;
+
 /**
  * Find Python interpreter (prefer venv, fallback to system python3)
  */
@@ -29,13 +43,51 @@ function checkModelExists(): boolean {
 }
 
 /**
- * Classify a batch of images using Python subprocess
- *
- * @param imageDir - Directory containing images to classify
- * @returns Map of image path to classification result
+ * Match the classifier's blocklist check to the harvest's --hash-distance, so
+ * both filters agree on which frames are blocklisted. Takes effect when the
+ * classifier process is next started.
  */
-export async function classifyBatch(
-  imageDir: string
+export function setBlocklistDistance(distance: number | null): void {
+  blocklistDistance = distance;
+}
+
+/**
+ * Get the running classifier server, starting one if needed
+ */
+function getServer(pythonPath: string): ClassifierServer {
+  if (!server || !server.alive) {
+    logger.verbose('Starting classifier server...');
+    const args = blocklistDistance === null ? [] : ['--blocklist-distance', String(blocklistDistance)];
+    server = new ClassifierServer(pythonPath, SCRIPT_PATH, args);
+  }
+  return server;
+}
+
+/**
+ * Stop the shared classifier server (call once the harvest is done)
+ */
+export async function shutdownClassifier(): Promise<void> {
+  if (server) {
+    const current = server;
+    server = null;
+    await current.close();
+  }
+}
+
+/**
+ * Format a progress event for the harvest log
+ */
+export function formatProgress(progress: ClassifyProgress): string {
+  const eta = progress.eta === null ? '' : `, ETA ${Math.round(progress.eta)}s`;
+  return `${progress.done}/${progress.total} images (${progress.rate.toFixed(1)} images/sec${eta})`;
+}
+
+/**
+ * Classify a directory or path list using the resident Python classifier
+ */
+async function runClassification(
+  target: ClassifyTarget,
+  description: string
 ): Promise<Map<string, ClassificationResult>> {
   // Check if model exists
   if (!checkModelExists()) {
@@ -45,39 +97,42 @@ export async function classifyBatch(
   }
 
   const pythonPath = findPythonInterpreter();
-  const scriptPath = 'python/classify_images.py';
 
-  if (!existsSync(scriptPath)) {
-    logger.info(`Classification script not found: ${scriptPath}`);
+  if (!existsSync(SCRIPT_PATH)) {
+    logger.info(`Classification script not found: ${SCRIPT_PATH}`);
     return new Map();
   }
 
-  try {
-    logger.verbose(`Running classification on ${imageDir}...`);
-
-    const { stdout, stderr } = await execa(pythonPath, [scriptPath, imageDir], {
-      timeout: 300000  // 5 minute timeout for large batches
-    });
-
-    if (stderr) {
-      logger.verbose(`Python stderr: ${stderr}`);
-    }
+  // Filled in as results stream back, so a failure keeps what was already scored
+  const resultMap = new Map<string, ClassificationResult>();
 
-    // Parse JSON output
-    const results: ClassificationResult[] = JSON.parse(stdout);
+  try {
+    logger.verbose(`Running classification on ${description}...`);
 
-    // Convert to Map for easy lookup
-    const resultMap = new Map<string, ClassificationResult>();
-    for (const result of results) {
-      resultMap.set(result.path, result);
-    }
+    const startedAt = Date.now();
+    let lastLogged = startedAt;
+    await getServer(pythonPath).classify(
+      target,
+      STALL_TIMEOUT_MS,
+      result => {
+        resultMap.set(result.path, result);
+      },
+      progress => {
+        if (Date.now() - lastLogged >= PROGRESS_LOG_INTERVAL_MS && progress.done < progress.total) {
+          lastLogged = Date.now();
+          logger.info(`Classifying: ${formatProgress(progress)}`);
+        }
+      }
+    );
 
-    logger.info(`Classified ${resultMap.size} images`);
+    const seconds = (Date.now() - startedAt) / 1000;
+    const rate = seconds > 0 ? resultMap.size / seconds : 0;
+    logger.info(`Classified ${resultMap.size} images in ${seconds.toFixed(1)}s (${rate.toFixed(1)} images/sec)`);
     return resultMap;
 
   } catch (error) {
     if (error && typeof error === 'object' && 'exitCode' in error) {
-      const exitCode = (error as { exitCode: number }).exitCode;
+      const exitCode = (error as { exitCode?: number }).exitCode;
       if (exitCode === 1) {
         logger.error('Classification failed: Model file error');
       } else if (exitCode === 2) {
@@ -85,22 +140,127 @@ export async function classifyBatch(
       }
     }
 
-    logger.info('Classification failed, continuing without classification data');
     logger.verbose(`Error: ${error instanceof Error ? error.message : String(error)}`);
+
+    if (resultMap.size > 0) {
+      logger.info(`Classification failed, keeping ${resultMap.size} partial results`);
+      return resultMap;
+    }
+
+    logger.info('Classification failed, continuing without classification data');
+    return new Map();
+  }
+}
+
+/**
+ * Classify every image under a directory
+ *
+ * @param imageDir - Directory containing images to classify
+ * @returns Map of image path to classification result
+ */
+export async function classifyBatch(
+  imageDir: string
+): Promise<Map<string, ClassificationResult>> {
+  return runClassification({ dir: imageDir }, imageDir);
+}
+
+/**
+ * Classify exactly the given image paths (nothing else is decoded or embedded)
+ *
+ * @param paths - Image paths to classify
+ * @param hashes - pHash of each path, so the classifier's blocklist check needn't recompute them
+ * @returns Map of image path (as passed in) to classification result
+ */
+export async function classifyPaths(
+  paths: string[],
+  hashes?: string[]
+): Promise<Map<string, ClassificationResult>> {
+  if (paths.length === 0) {
     return new Map();
   }
+  return runClassification(hashes ? { paths, hashes } : { paths }, `${paths.length} images`);
+}
+
+/**
+ * Classify dedupe clusters, embedding only each cluster's canonical image
+ *
+ * @param clusters - Clusters by image path
+ * @param spotCheck - Fraction of non-canonical members to classify anyway
+ * @returns Map of image path (canonicals and members) to classification result
+ */
+export async function classifyClusters(
+  clusters: ClusterTarget[],
+  spotCheck = 0
+): Promise<Map<string, ClassificationResult>> {
+  if (clusters.length === 0) {
+    return new Map();
+  }
+  const count = clusters.reduce((total, cluster) => total + cluster.members.length, 0);
+  return runClassification(
+    { clusters, spot_check: spotCheck },
+    `${count} images in ${clusters.length} dedupe clusters`
+  );
+}
+
+/**
+ * Turn a video's dedupe clusters into path-based cluster targets (with the
+ * frames' pHashes) covering exactly the given frames. A cluster whose canonical isn't among them
+ * (e.g. it was blocklisted) is led by its first remaining member, and
+ * frames outside every cluster become single-member clusters.
+ *
+ * @param outputRoot - Output root directory that frame.file paths are relative to
+ * @param frames - Frames to classify
+ * @param clusters - Dedupe clusters of the video the frames belong to
+ */
+export function clusterTargets(
+  outputRoot: string,
+  frames: Frame[],
+  clusters: DedupeCluster[]
+): ClusterTarget[] {
+  const paths = new Map(frames.map(frame => [frame.id, join(outputRoot, frame.file)]));
+  const hashes = new Map(frames.map(frame => [frame.id, frame.hash]));
+  const targets: ClusterTarget[] = [];
+  const covered = new Set<string>();
+
+  for (const cluster of clusters) {
+    const ids = [cluster.canonicalFrameId, ...cluster.members.filter(id => id !== cluster.canonicalFrameId)]
+      .filter(id => paths.has(id) && !covered.has(id));
+    if (ids.length === 0) continue;
+
+    ids.forEach(id => covered.add(id));
+    const members = ids.map(id => paths.get(id)!);
+    targets.push({ canonical: members[0], members, hashes: ids.map(id => hashes.get(id)!) });
+  }
+
+  for (const [id, path] of paths) {
+    if (!covered.has(id)) {
+      targets.push({ canonical: path, members: [path], hashes: [hashes.get(id)!] });
+    }
+  }
+
+  return targets;
 }
 
 /**
  * Classify frames for a single video
  *
- * @param outputDir - Output directory for the video
+ * @param outputRoot - Output root directory that frame.file paths are relative to
  * @param frames - Frames to classify
- * @returns Map of frame path to classification result
+ * @param clusters - Dedupe clusters; when given, only canonicals are embedded
+ * @param spotCheck - With clusters, fraction of duplicates to classify anyway
+ * @returns Map of frame path (outputRoot joined with frame.file) to classification result
  */
 export async function classifyFrames(
-  outputDir: string,
-  frames: Frame[]
+  outputRoot: string,
+  frames: Frame[],
+  clusters?: DedupeCluster[],
+  spotCheck = 0
 ): Promise<Map<string, ClassificationResult>> {
-  return classifyBatch(outputDir);
+  if (clusters) {
+    return classifyClusters(clusterTargets(outputRoot, frames, clusters), spotCheck);
+  }
+  return classifyPaths(
+    frames.map(frame => join(outputRoot, frame.file)),
+    frames.map(frame => frame.hash)
+  );
 }
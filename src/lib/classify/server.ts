@@ -0,0 +1,291 @@
+import { execa } from 'execa';
+import { createInterface } from 'readline';
+import { logger } from '../../utils/logger.js';
+import type { ClassificationResult } from '../types.js';
+
+/**
+ * Error raised when the classifier process exits or a request fails.
+ * exitCode is set when the Python process terminated.
+ */
+export class ClassifierError extends Error {
+  exitCode?: number;
+
+  constructor(message: string, exitCode?: number) {
+    super(message);
+    this.name = 'ClassifierError';
+    this.exitCode = exitCode;
+  }
+}
+
+/**
+ * A dedupe cluster by image path: only the canonical is embedded and its
+ * result is copied to the other members (hashes, if known, are the members'
+ * pHashes for the blocklist check)
+ */
+export interface ClusterTarget {
+  canonical: string;
+  members: string[];
+  hashes?: string[];
+}
+
+/**
+ * What to classify: every image under a directory, an explicit list of paths
+ * (with their pHashes, if known, for the blocklist check), or dedupe clusters
+ * (with an optional fraction of members spot-checked)
+ */
+export type ClassifyTarget =
+  | { dir: string }
+  | { paths: string[]; hashes?: string[] }
+  | { clusters: ClusterTarget[]; spot_check?: number };
+
+/**
+ * Progress event written to stderr after each batch (rate in images/sec, eta in seconds)
+ */
+export interface ClassifyProgress {
+  done: number;
+  total: number;
+  rate: number;
+  eta: number | null;
+}
+
+interface PendingRequest {
+  onResult: (result: ClassificationResult) => void;
+  onProgress?: (progress: ClassifyProgress) => void;
+  count: number;
+  resolve: (count: number) => void;
+  reject: (error: ClassifierError) => void;
+  stallTimeoutMs: number;
+  timer: NodeJS.Timeout;
+}
+
+/**
+ * Per-request counts sent with the completion marker: frames blocklisted,
+ * reused from the result manifests and classified, plus (with --cascade)
+ * frames the pHash cascade decided and frames sent to CLIP
+ */
+export interface ClassifyStats {
+  blocklisted?: number;
+  reused?: number;
+  classified?: number;
+  cascade_decided?: number;
+  cascade_embedded?: number;
+}
+
+/**
+ * One JSON line from the server: a single result, a completion marker, or an error
+ */
+interface ServerMessage {
+  id: number;
+  result?: ClassificationResult;
+  done?: boolean;
+  stats?: ClassifyStats;
+  error?: string;
+}
+
+/**
+ * Format completion stats for the log, e.g. "12 classified, 30 reused, 0 blocklisted"
+ */
+export function formatStats(stats: ClassifyStats): string {
+  const parts = [
+    `${stats.classified ?? 0} classified`,
+    `${stats.reused ?? 0} reused`,
+    `${stats.blocklisted ?? 0} blocklisted`
+  ];
+  if (stats.cascade_decided !== undefined) {
+    parts.push(`${stats.cascade_decided} decided by pHash cascade, ${stats.cascade_embedded ?? 0} sent to CLIP`);
+  }
+  return parts.join(', ');
+}
+
+/**
+ * Long-lived `classify_images.py --serve` process.
+ *
+ * CLIP and the classifier are loaded once and reused for every request,
+ * instead of paying the Python/torch startup cost per classifyBatch call.
+ * Requests are JSON lines; results stream back one JSON line per image
+ * (matched by id) and are handed to the caller as they arrive, so nothing
+ * is buffered beyond one line and partial progress survives failures.
+ *
+ * Hangs are detected by a stall watchdog rather than a wall-clock limit:
+ * every result, completion and progress line re-arms the timers of all
+ * pending requests, so a long run that keeps making progress never times
+ * out. The server handles requests one at a time, so a request queued
+ * behind a long one is waiting on that progress, not stalled.
+ */
+export class ClassifierServer {
+  private subprocess: ReturnType<typeof execa>;
+  private pending = new Map<number, PendingRequest>();
+  private nextId = 1;
+  private exited = false;
+
+  /**
+   * @param pythonPath - Python interpreter
+   * @param scriptPath - classify_images.py
+   * @param args - Extra classify_images.py options, e.g. ['--blocklist-distance', '6']
+   */
+  constructor(pythonPath: string, scriptPath: string, args: string[] = []) {
+    this.subprocess = execa(pythonPath, [scriptPath, '--serve', ...args], {
+      stdin: 'pipe',
+      stdout: 'pipe',
+      stderr: 'pipe',
+      buffer: false
+    });
+
+    // Attach exit handlers first so a failed spawn never surfaces as an unhandled rejection
+    Promise.resolve(this.subprocess).then(
+      () => this.handleExit(0),
+      (error: unknown) => {
+        const exitCode = error && typeof error === 'object' && 'exitCode' in error
+          ? (error as { exitCode?: number }).exitCode
+          : undefined;
+        this.handleExit(exitCode, error);
+      }
+    );
+
+    if (!this.subprocess.stdout || !this.subprocess.stdin) {
+      throw new ClassifierError('Classifier process has no stdio pipes');
+    }
+
+    createInterface({ input: this.subprocess.stdout }).on('line', line => this.handleLine(line));
+
+    if (this.subprocess.stderr) {
+      createInterface({ input: this.subprocess.stderr }).on('line', line => this.handleStderr(line));
+    }
+  }
+
+  /**
+   * Whether the process can still accept requests
+   */
+  get alive(): boolean {
+    return !this.exited;
+  }
+
+  /**
+   * Classify a directory or an explicit list of image paths
+   *
+   * @param target - Directory to scan, or exact paths to classify
+   * @param stallTimeoutMs - Time without any result or progress event before killing the server
+   * @param onResult - Called for each result as soon as it is received
+   * @param onProgress - Called for each progress event
+   * @returns Number of results received
+   */
+  classify(
+    target: ClassifyTarget,
+    stallTimeoutMs: number,
+    onResult: (result: ClassificationResult) => void,
+    onProgress?: (progress: ClassifyProgress) => void
+  ): Promise<number> {
+    if (this.exited) {
+      return Promise.reject(new ClassifierError('Classifier process has exited'));
+    }
+
+    const id = this.nextId++;
+
+    return new Promise((resolve, reject) => {
+      const timer = this.startWatchdog(id, stallTimeoutMs);
+      this.pending.set(id, { onResult, onProgress, count: 0, resolve, reject, stallTimeoutMs, timer });
+      this.subprocess.stdin!.write(JSON.stringify({ id, ...target }) + '\n');
+    });
+  }
+
+  /**
+   * Close stdin and wait for the process to exit
+   */
+  async close(): Promise<void> {
+    if (this.exited) {
+      return;
+    }
+    this.subprocess.stdin?.end();
+    await Promise.resolve(this.subprocess).catch(() => {});
+  }
+
+  private startWatchdog(id: number, stallTimeoutMs: number): NodeJS.Timeout {
+    return setTimeout(() => {
+      this.fail(id, new ClassifierError(`Classification timed out after ${stallTimeoutMs}ms without progress`));
+      // A stuck process would block every later request
+      this.subprocess.kill();
+    }, stallTimeoutMs);
+  }
+
+  /**
+   * Push every pending request's stall deadline back after the server made progress
+   */
+  private rearmAll(): void {
+    for (const [id, request] of this.pending) {
+      clearTimeout(request.timer);
+      request.timer = this.startWatchdog(id, request.stallTimeoutMs);
+    }
+  }
+
+  private handleStderr(line: string): void {
+    if (line.startsWith('{')) {
+      try {
+        const message = JSON.parse(line) as { id?: number; progress?: ClassifyProgress };
+        if (message.progress && message.id !== undefined) {
+          this.rearmAll();
+          this.pending.get(message.id)?.onProgress?.(message.progress);
+          return;
+        }
+      } catch {
+        // Not a progress event; log it like any other line
+      }
+    }
+    logger.verbose(`Python stderr: ${line}`);
+  }
+
+  private handleLine(line: string): void {
+    let message: ServerMessage;
+    try {
+      message = JSON.parse(line);
+    } catch {
+      logger.verbose(`Ignoring non-JSON classifier output: ${line}`);
+      return;
+    }
+
+    const request = this.pending.get(message.id);
+    if (!request) {
+      return;
+    }
+
+    if (message.result) {
+      request.count++;
+      this.rearmAll();
+      request.onResult(message.result);
+    } else if (message.error !== undefined) {
+      this.fail(message.id, new ClassifierError(message.error));
+      // The next queued request starts now
+      this.rearmAll();
+    } else if (message.done) {
+      if (message.stats) {
+        logger.verbose(`Classifier stats: ${formatStats(message.stats)}`);
+      }
+      this.pending.delete(message.id);
+      clearTimeout(request.timer);
+      request.resolve(request.count);
+      this.rearmAll();
+    }
+  }
+
+  private fail(id: number, error: ClassifierError): void {
+    const request = this.pending.get(id);
+    if (!request) {
+      return;
+    }
+
+    this.pending.delete(id);
+    clearTimeout(request.timer);
+    request.reject(error);
+  }
+
+  private handleExit(exitCode?: number, error?: unknown): void {
+    this.exited = true;
+
+    if (error) {
+      logger.verbose(`Classifier process exited: ${error instanceof Error ? error.message : String(error)}`);
+    }
+
+    for (const id of [...this.pending.keys()]) {
+      this.fail(id, new ClassifierError('Classifier process exited unexpectedly', exitCode));
+    }
+  }
+}
@@ -1,7 +1,7 @@
 import { logger } from '../utils/logger.js';
 import { validateYtDlp, downloadUrl } from './download/ytdlp.js';
 import { processVideo } from './pipeline.js';
-import { classifyBatch } from './classify/classify.js';
+import { classifyClusters, classifyPaths, clusterTargets } from './classify/classify.js';
 import { tmpdir } from 'os';
 import { mkdtemp, rm } from 'fs/promises';
 import { join } from 'path';
@@ -114,22 +114,33 @@ export async function processChannelVideos(
   if (config.classify && results.length > 0) {
     logger.info('Running batch classification on all extracted frames...');
 
-    const channelDir = join(config.output, channelInfo.channelName);
-    const classifications = await classifyBatch(channelDir);
-
-    // Update all video results with classification data
-    for (const result of results) {
-      for (const frame of result.frames) {
-        const framePath = join(config.output, frame.file);
-        const classResult = classifications.get(framePath);
-        if (classResult) {
-          frame.classification = {
-            label: classResult.label,
-            confidence: classResult.confidence
-          };
-        } else {
-          frame.classification = null;
-        }
+    // Only frames from this run that have no verdict yet (blocklist hits keep theirs)
+    const pending = results.flatMap(result => result.frames.filter(frame => !frame.classification));
+    const classifications = config.classifyCanonicals
+      ? await classifyClusters(
+          results.flatMap(result => clusterTargets(
+            config.output,
+            result.frames.filter(frame => !frame.classification),
+            result.dedupe.clusters
+          )),
+          config.spotCheck
+        )
+      : await classifyPaths(
+          pending.map(frame => join(config.output, frame.file)),
+          pending.map(frame => frame.hash)
+        );
+
+    // Update video results with classification data
+    for (const frame of pending) {
+      const framePath = join(config.output, frame.file);
+      const classResult = classifications.get(framePath);
+      if (classResult) {
+        frame.classification = {
+          label: classResult.label,
+          confidence: classResult.confidence
+        };
+      } else {
+        frame.classification = null;
       }
     }
 
@@ -3,18 +3,16 @@ import { detectFreezeIntervals } from './ffmpeg/freezedetect.js';
 import { extractFrame, calculateTimestamp } from './ffmpeg/extract.js';
 import { computeHash } from './hash/phash.js';
 import { deduplicateFrames } from './hash/dedupe.js';
-import { classifyFrames } from './classify/classify.js';
+import { classifyFrames, setBlocklistDistance, shutdownClassifier } from './classify/classify.js';
 import { loadBlocklist, checkBlocklist } from './blocklist.js';
 import { generateReport, writeReport } from './report.js';
 import {
   ensureOutputDir,
   getStillPath,
   ensureStillsDir,
-  getNextScanNumber,
-  getStillsDir
+  getNextScanNumber
 } from '../utils/fs.js';
 import {
-  getChannelVideoPath,
   getChannelStillPath,
   ensureChannelVideoDir
 } from '../utils/channel-fs.js';
@@ -51,18 +49,15 @@ export async function processVideo(
 
   // Determine scan number and output paths
   let scanNumber: number;
-  let stillsDir: string;
 
   if (channelContext) {
     // Channel mode: use fixed scan number and channel-specific paths
     scanNumber = 1;
-    stillsDir = getChannelVideoPath(config.output, channelContext.channelName, channelContext.videoTitle);
     logger.verbose(`  Channel mode: ${channelContext.channelName}/${channelContext.videoTitle}`);
   } else {
     // Single video mode: calculate scan number
     const videoName = basename(inputPath, extname(inputPath));
     scanNumber = await getNextScanNumber(config.output, videoName);
-    stillsDir = getStillsDir(config.output, inputPath, scanNumber);
     logger.info(`  Scan number: ${scanNumber}`);
   }
 
@@ -186,7 +181,12 @@ export async function processVideo(
     const framesToClassify = frames.filter(f => !f.classification);
 
     if (framesToClassify.length > 0) {
-      const classifications = await classifyFrames(stillsDir, framesToClassify);
+      const classifications = await classifyFrames(
+        config.output,
+        framesToClassify,
+        config.classifyCanonicals ? clusters : undefined,
+        config.spotCheck
+      );
 
       // Update frames with classification results
       for (const frame of framesToClassify) {
@@ -340,10 +340,18 @@ async function processSingleVideo(config: Config): Promise<void> {
 }
 
 export async function runPipeline(config: Config): Promise<void> {
-  // Route to correct mode based on config
-  if (config.channelUrl) {
-    await processChannel(config);
-  } else {
-    await processSingleVideo(config);
+  // The classifier re-checks frames against the blocklist; use the same threshold
+  setBlocklistDistance(config.hashDistance);
+
+  try {
+    // Route to correct mode based on config
+    if (config.channelUrl) {
+      await processChannel(config);
+    } else {
+      await processSingleVideo(config);
+    }
+  } finally {
+    // Stop the resident classifier process shared by all videos
+    await shutdownClassifier();
   }
 }
@@ -15,6 +15,7 @@ export interface ClassificationResult {
   path: string;
   label: 'keep' | 'exclude';
   confidence: number;
+  blocklist?: string; // Description of the blocklist entry that excluded the frame
 }
 
 /**
@@ -115,4 +116,6 @@ export interface Config {
   json: string;
   verbose: boolean;
   classify: boolean;
+  classifyCanonicals?: boolean; // Embed only dedupe canonicals, copying labels to members
+  spotCheck?: number; // Fraction of duplicates classified anyway with classifyCanonicals
 }
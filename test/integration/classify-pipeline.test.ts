@@ -3,6 +3,7 @@ import { mkdtemp, rm, writeFile, mkdir } from 'fs/promises';
 import { tmpdir } from 'os';
 import { join } from 'path';
 import { processVideo } from '../../src/lib/pipeline.js';
+import { shutdownClassifier } from '../../src/lib/classify/classify.js';
 import type { Config } from '../../src/lib/types.js';
 import { execSync } from 'child_process';
 
@@ -47,27 +48,32 @@ import json
 import os
 from pathlib import Path
 
-# Mock classification: alternate between keep/exclude
-image_dir = sys.argv[1]
-images = sorted(Path(image_dir).glob('**/*.jpg'))
-results = []
-
-for i, img_path in enumerate(images):
-    label = 'keep' if i % 2 == 0 else 'exclude'
-    confidence = 0.85 + (i * 0.01)  # Varying confidence
-    results.append({
-        'path': str(img_path),
-        'label': label,
-        'confidence': confidence
-    })
-
-print(json.dumps(results))
+# Mock classifier server: alternate between keep/exclude
+for line in sys.stdin:
+    request = json.loads(line)
+    if 'paths' in request:
+        images = request['paths']
+    else:
+        images = sorted(Path(request['dir']).glob('**/*.jpg'))
+
+    for i, img_path in enumerate(images):
+        label = 'keep' if i % 2 == 0 else 'exclude'
+        confidence = 0.85 + (i * 0.01)  # Varying confidence
+        result = {
+            'path': str(img_path),
+            'label': label,
+            'confidence': confidence
+        }
+        print(json.dumps({'id': request['id'], 'result': result}), flush=True)
+
+    print(json.dumps({'id': request['id'], 'done': True, 'count': len(images)}), flush=True)
 `
     );
     execSync(`chmod +x ${mockScriptPath}`);
   });
 
   afterAll(async () => {
+    await shutdownClassifier();
     await rm(testDir, { recursive: true, force: true });
     await rm(mockModelPath, { force: true });
     await rm(mockScriptPath, { force: true });
@@ -1,5 +1,8 @@
-import { describe, it, expect, vi, beforeEach } from 'vitest';
-import { classifyBatch } from '../../src/lib/classify/classify.js';
+import { describe, it, expect, vi, beforeEach, afterEach } from 'vitest';
+import { PassThrough } from 'stream';
+import { createInterface } from 'readline';
+import { classifyBatch, classifyPaths, shutdownClassifier } from '../../src/lib/classify/classify.js';
+import { logger } from '../../src/utils/logger.js';
 import { existsSync } from 'fs';
 
 // Mock fs and execa
@@ -11,20 +14,65 @@ vi.mock('execa', () => ({
   execa: vi.fn()
 }));
 
+/**
+ * Fake `classify_images.py --serve` process with real stdio pipes: answers
+ * each request line with the raw stdout lines returned by respond
+ */
+function createFakeProcess(respond: (request: { id: number; paths?: string[] }) => string[]) {
+  const stdin = new PassThrough();
+  const stdout = new PassThrough();
+  const stderr = new PassThrough();
+
+  let exit!: () => void;
+  let fail!: (error: Error) => void;
+  const promise = new Promise<void>((resolve, reject) => {
+    exit = resolve;
+    fail = reject;
+  });
+
+  createInterface({ input: stdin }).on('line', line => {
+    for (const output of respond(JSON.parse(line))) {
+      stdout.write(output + '\n');
+    }
+  });
+  stdin.on('finish', () => exit());
+
+  return Object.assign(promise, {
+    stdin,
+    stdout,
+    stderr,
+    kill: vi.fn(() => fail(Object.assign(new Error('killed'), { exitCode: 143 }))),
+    crash: (exitCode: number) => fail(Object.assign(new Error(`exited with code ${exitCode}`), { exitCode }))
+  });
+}
+
+const resultLine = (id: number, path: string) =>
+  JSON.stringify({ id, result: { path, label: 'keep', confidence: 0.9 } });
+
 describe('Classification Error Handling', () => {
   beforeEach(() => {
     vi.clearAllMocks();
+    vi.spyOn(logger, 'info').mockImplementation(() => {});
+    vi.spyOn(logger, 'error').mockImplementation(() => {});
+  });
+
+  afterEach(async () => {
+    await shutdownClassifier();
+    vi.restoreAllMocks();
   });
 
   it('should return empty Map when model file missing', async () => {
+    const { execa } = await import('execa');
     vi.mocked(existsSync).mockReturnValue(false);
 
     const result = await classifyBatch('/tmp/test');
 
     expect(result.size).toBe(0);
+    expect(execa).not.toHaveBeenCalled();
   });
 
   it('should return empty Map when Python script missing', async () => {
+    const { execa } = await import('execa');
     vi.mocked(existsSync)
       .mockReturnValueOnce(true)   // model exists
       .mockReturnValueOnce(false)  // venv doesn't exist
@@ -33,30 +81,82 @@ describe('Classification Error Handling', () => {
     const result = await classifyBatch('/tmp/test');
 
     expect(result.size).toBe(0);
+    expect(execa).not.toHaveBeenCalled();
   });
 
-  it('should handle subprocess errors gracefully', async () => {
+  it('should return empty Map when the process fails to start', async () => {
     const { execa } = await import('execa');
-
     vi.mocked(existsSync).mockReturnValue(true);
-    vi.mocked(execa).mockRejectedValue(new Error('Python error'));
+    const fake = createFakeProcess(() => []);
+    vi.mocked(execa).mockReturnValue(fake as any);
+    fake.crash(127);
 
     const result = await classifyBatch('/tmp/test');
 
     expect(result.size).toBe(0);
+    expect(execa).toHaveBeenCalledTimes(1);
   });
 
-  it('should handle invalid JSON output', async () => {
+  it('should report a model file error when the process exits with code 1', async () => {
     const { execa } = await import('execa');
+    vi.mocked(existsSync).mockReturnValue(true);
+    const fake = createFakeProcess(() => {
+      fake.crash(1);
+      return [];
+    });
+    vi.mocked(execa).mockReturnValue(fake as any);
 
+    const result = await classifyBatch('/tmp/test');
+
+    expect(result.size).toBe(0);
+    expect(logger.error).toHaveBeenCalledWith('Classification failed: Model file error');
+  });
+
+  it('should report a dependency error when the process exits with code 2', async () => {
+    const { execa } = await import('execa');
     vi.mocked(existsSync).mockReturnValue(true);
-    vi.mocked(execa).mockResolvedValue({
-      stdout: 'invalid json',
-      stderr: ''
-    } as any);
+    const fake = createFakeProcess(() => {
+      fake.crash(2);
+      return [];
+    });
+    vi.mocked(execa).mockReturnValue(fake as any);
 
     const result = await classifyBatch('/tmp/test');
 
     expect(result.size).toBe(0);
+    expect(logger.error).toHaveBeenCalledWith('Classification failed: Python dependency error');
+  });
+
+  it('should skip malformed JSON lines and keep the valid results', async () => {
+    const { execa } = await import('execa');
+    vi.mocked(existsSync).mockReturnValue(true);
+    vi.mocked(execa).mockReturnValue(createFakeProcess(request => [
+      'invalid json',
+      'Loading CLIP model...',
+      resultLine(request.id, '/tmp/test/still_0001.jpg'),
+      '{"id": ',
+      JSON.stringify({ id: request.id, done: true, count: 1 })
+    ]) as any);
+
+    const result = await classifyBatch('/tmp/test');
+
+    expect(result.size).toBe(1);
+    expect(result.get('/tmp/test/still_0001.jpg')?.label).toBe('keep');
+  });
+
+  it('should return empty Map on an error response and keep the process for the next call', async () => {
+    const { execa } = await import('execa');
+    vi.mocked(existsSync).mockReturnValue(true);
+    vi.mocked(execa).mockReturnValue(createFakeProcess(request => request.paths
+      ? [resultLine(request.id, request.paths[0]), JSON.stringify({ id: request.id, done: true, count: 1 })]
+      : [JSON.stringify({ id: request.id, error: 'Directory not found: /tmp/missing' })]
+    ) as any);
+
+    const failed = await classifyBatch('/tmp/missing');
+    const succeeded = await classifyPaths(['/tmp/test/still_0001.jpg']);
+
+    expect(failed.size).toBe(0);
+    expect(succeeded.size).toBe(1);
+    expect(execa).toHaveBeenCalledTimes(1);
   });
 });
@@ -0,0 +1,408 @@
+import { describe, it, expect, vi, beforeEach, afterEach } from 'vitest';
+import { PassThrough } from 'stream';
+import { createInterface } from 'readline';
+import { existsSync } from 'fs';
+import {
+  classifyBatch,
+  classifyFrames,
+  classifyPaths,
+  clusterTargets,
+  formatProgress,
+  setBlocklistDistance,
+  shutdownClassifier
+} from '../../src/lib/classify/classify.js';
+import type { DedupeCluster, Frame } from '../../src/lib/types.js';
+import { ClassifierServer, formatStats } from '../../src/lib/classify/server.js';
+
+vi.mock('fs', () => ({
+  existsSync: vi.fn()
+}));
+
+vi.mock('execa', () => ({
+  execa: vi.fn()
+}));
+
+type Responder = (request: {
+  id: number;
+  dir?: string;
+  paths?: string[];
+  hashes?: string[];
+  clusters?: Array<{ canonical: string; members: string[]; hashes?: string[] }>;
+  spot_check?: number;
+}) => object[];
+
+/**
+ * Fake `classify_images.py --serve` process: answers each stdin line via responder
+ */
+function createFakeServer(responder: Responder) {
+  const stdin = new PassThrough();
+  const stdout = new PassThrough();
+  const stderr = new PassThrough();
+
+  let exit!: () => void;
+  let fail!: (error: Error) => void;
+  const promise = new Promise<void>((resolve, reject) => {
+    exit = resolve;
+    fail = reject;
+  });
+
+  createInterface({ input: stdin }).on('line', line => {
+    for (const message of responder(JSON.parse(line))) {
+      stdout.write(JSON.stringify(message) + '\n');
+    }
+  });
+  stdin.on('finish', () => exit());
+
+  return Object.assign(promise, {
+    stdin,
+    stdout,
+    stderr,
+    kill: vi.fn(() => fail(Object.assign(new Error('killed'), { exitCode: 143 }))),
+    crash: (exitCode: number) => fail(Object.assign(new Error('crashed'), { exitCode }))
+  });
+}
+
+const okResponder: Responder = request => {
+  const paths = request.paths ?? [`${request.dir}/still_0001.jpg`];
+  return [
+    ...paths.map(path => ({ id: request.id, result: { path, label: 'keep', confidence: 0.9 } })),
+    { id: request.id, done: true, count: paths.length }
+  ];
+};
+
+const silentResponder: Responder = () => [];
+
+describe('ClassifierServer', () => {
+  beforeEach(() => {
+    vi.clearAllMocks();
+  });
+
+  it('should match responses to requests by id', async () => {
+    const { execa } = await import('execa');
+    const fake = createFakeServer(okResponder);
+    vi.mocked(execa).mockReturnValue(fake as any);
+
+    const server = new ClassifierServer('python3', 'python/classify_images.py');
+    const a: string[] = [];
+    const b: string[] = [];
+    const counts = await Promise.all([
+      server.classify({ dir: '/tmp/a' }, 1000, result => a.push(result.path)),
+      server.classify({ dir: '/tmp/b' }, 1000, result => b.push(result.path))
+    ]);
+
+    expect(counts).toEqual([1, 1]);
+    expect(a).toEqual(['/tmp/a/still_0001.jpg']);
+    expect(b).toEqual(['/tmp/b/still_0001.jpg']);
+    expect(execa).toHaveBeenCalledWith('python3', ['python/classify_images.py', '--serve'], expect.any(Object));
+
+    await server.close();
+    expect(server.alive).toBe(false);
+  });
+
+  it('should reject requests that return an error', async () => {
+    const { execa } = await import('execa');
+    vi.mocked(execa).mockReturnValue(
+      createFakeServer(request => [{ id: request.id, error: 'Directory not found' }]) as any
+    );
+
+    const server = new ClassifierServer('python3', 'python/classify_images.py');
+
+    await expect(server.classify({ dir: '/tmp/missing' }, 1000, () => {})).rejects.toThrow('Directory not found');
+    await server.close();
+  });
+
+  it('should kill the process when a request times out', async () => {
+    const { execa } = await import('execa');
+    const fake = createFakeServer(silentResponder);
+    vi.mocked(execa).mockReturnValue(fake as any);
+
+    const server = new ClassifierServer('python3', 'python/classify_images.py');
+
+    await expect(server.classify({ dir: '/tmp/slow' }, 10, () => {})).rejects.toThrow('timed out');
+    expect(fake.kill).toHaveBeenCalled();
+  });
+
+  it('should reject pending requests with the exit code when the process dies', async () => {
+    const { execa } = await import('execa');
+    const fake = createFakeServer(silentResponder);
+    vi.mocked(execa).mockReturnValue(fake as any);
+
+    const server = new ClassifierServer('python3', 'python/classify_images.py');
+    const request = server.classify({ dir: '/tmp/a' }, 1000, () => {});
+    fake.crash(1);
+
+    await expect(request).rejects.toMatchObject({ exitCode: 1 });
+    expect(server.alive).toBe(false);
+  });
+
+  it('should keep a request alive while progress events arrive', async () => {
+    const { execa } = await import('execa');
+    const fake = createFakeServer(silentResponder);
+    vi.mocked(execa).mockReturnValue(fake as any);
+
+    const server = new ClassifierServer('python3', 'python/classify_images.py');
+    const done: number[] = [];
+    const request = server.classify({ dir: '/tmp/a' }, 50, () => {}, progress => done.push(progress.done));
+
+    // Four events 30ms apart outlast the 50ms stall limit only if each re-arms it
+    for (const count of [32, 64, 96, 128]) {
+      await new Promise(resolve => setTimeout(resolve, 30));
+      fake.stderr.write(JSON.stringify({ id: 1, progress: { done: count, total: 128, rate: 40, eta: 0 } }) + '\n');
+    }
+    await vi.waitFor(() => expect(done).toEqual([32, 64, 96, 128]));
+    fake.stdout.write(JSON.stringify({ id: 1, done: true, count: 0 }) + '\n');
+
+    await expect(request).resolves.toBe(0);
+    expect(fake.kill).not.toHaveBeenCalled();
+    await server.close();
+  });
+
+  it('should not time out a request queued behind a long-running one', async () => {
+    const { execa } = await import('execa');
+    const fake = createFakeServer(silentResponder);
+    vi.mocked(execa).mockReturnValue(fake as any);
+
+    const server = new ClassifierServer('python3', 'python/classify_images.py');
+    const first = server.classify({ dir: '/tmp/a' }, 50, () => {});
+    const second = server.classify({ dir: '/tmp/b' }, 50, () => {});
+
+    // The first request runs for 150ms, three times the stall limit, while the second waits in the queue
+    for (const count of [32, 64, 96, 128, 160]) {
+      await new Promise(resolve => setTimeout(resolve, 30));
+      fake.stderr.write(JSON.stringify({ id: 1, progress: { done: count, total: 160, rate: 40, eta: 0 } }) + '\n');
+    }
+    fake.stdout.write(JSON.stringify({ id: 1, done: true, count: 0 }) + '\n');
+
+    await new Promise(resolve => setTimeout(resolve, 30));
+    fake.stdout.write(JSON.stringify({ id: 2, result: { path: '/tmp/b/still_0001.jpg', label: 'keep', confidence: 0.9 } }) + '\n');
+    fake.stdout.write(JSON.stringify({ id: 2, done: true, count: 1 }) + '\n');
+
+    await expect(Promise.all([first, second])).resolves.toEqual([0, 1]);
+    expect(fake.kill).not.toHaveBeenCalled();
+    await server.close();
+  });
+
+  it('should deliver results incrementally before completion', async () => {
+    const { execa } = await import('execa');
+    const fake = createFakeServer(request => [
+      { id: request.id, result: { path: '/tmp/a/still_0001.jpg', label: 'keep', confidence: 0.9 } }
+    ]);
+    vi.mocked(execa).mockReturnValue(fake as any);
+
+    const server = new ClassifierServer('python3', 'python/classify_images.py');
+    const received: string[] = [];
+    const request = server.classify({ dir: '/tmp/a' }, 1000, result => received.push(result.path));
+
+    await vi.waitFor(() => expect(received).toEqual(['/tmp/a/still_0001.jpg']));
+
+    fake.stdout.write(JSON.stringify({ id: 1, done: true, count: 1 }) + '\n');
+    await expect(request).resolves.toBe(1);
+    await server.close();
+  });
+});
+
+describe('classifyBatch with resident server', () => {
+  beforeEach(() => {
+    vi.clearAllMocks();
+    vi.mocked(existsSync).mockReturnValue(true);
+  });
+
+  afterEach(async () => {
+    await shutdownClassifier();
+  });
+
+  it('should reuse one process across calls', async () => {
+    const { execa } = await import('execa');
+    vi.mocked(execa).mockImplementation((() => createFakeServer(okResponder)) as any);
+
+    const first = await classifyBatch('/tmp/video1');
+    const second = await classifyBatch('/tmp/video2');
+
+    expect(first.get('/tmp/video1/still_0001.jpg')?.label).toBe('keep');
+    expect(second.get('/tmp/video2/still_0001.jpg')?.label).toBe('keep');
+    expect(execa).toHaveBeenCalledTimes(1);
+  });
+
+  it('should pass the blocklist distance to the classifier process', async () => {
+    const { execa } = await import('execa');
+    vi.mocked(execa).mockImplementation((() => createFakeServer(okResponder)) as any);
+
+    setBlocklistDistance(3);
+    try {
+      await classifyBatch('/tmp/video1');
+    } finally {
+      setBlocklistDistance(null);
+    }
+
+    expect(execa).toHaveBeenCalledWith(
+      'python3',
+      ['python/classify_images.py', '--serve', '--blocklist-distance', '3'],
+      expect.any(Object)
+    );
+  });
+
+  it('should start a new process after the previous one exits', async () => {
+    const { execa } = await import('execa');
+    const crashed = createFakeServer(silentResponder);
+    vi.mocked(execa)
+      .mockReturnValueOnce(crashed as any)
+      .mockImplementation((() => createFakeServer(okResponder)) as any);
+
+    const failed = classifyBatch('/tmp/video1');
+    crashed.crash(2);
+    expect((await failed).size).toBe(0);
+
+    const result = await classifyBatch('/tmp/video2');
+    expect(result.size).toBe(1);
+    expect(execa).toHaveBeenCalledTimes(2);
+  });
+
+  it('should send only the requested frame paths', async () => {
+    const { execa } = await import('execa');
+    const requests: Array<{ paths?: string[] }> = [];
+    vi.mocked(execa).mockImplementation((() => createFakeServer(request => {
+      requests.push(request);
+      return okResponder(request);
+    })) as any);
+
+    const frames = [
+      { id: 'frm_001', file: 'Video/1/still_0001.jpg' },
+      { id: 'frm_003', file: 'Video/1/still_0003.jpg' }
+    ] as Frame[];
+
+    const result = await classifyFrames('OUTPUT', frames);
+
+    expect(requests[0].paths).toEqual(['OUTPUT/Video/1/still_0001.jpg', 'OUTPUT/Video/1/still_0003.jpg']);
+    expect(result.has('OUTPUT/Video/1/still_0003.jpg')).toBe(true);
+  });
+
+  it('should send frame hashes alongside their paths', async () => {
+    const { execa } = await import('execa');
+    const requests: Parameters<Responder>[0][] = [];
+    vi.mocked(execa).mockImplementation((() => createFakeServer(request => {
+      requests.push(request);
+      return okResponder(request);
+    })) as any);
+
+    const frames = [
+      { id: 'frm_001', file: 'Video/1/still_0001.jpg', hash: '0000000000000000' },
+      { id: 'frm_002', file: 'Video/1/still_0002.jpg', hash: 'ffffffffffffffff' }
+    ] as Frame[];
+
+    await classifyFrames('OUTPUT', frames);
+
+    expect(requests[0].hashes).toEqual(['0000000000000000', 'ffffffffffffffff']);
+  });
+
+  it('should not start a process for an empty frame list', async () => {
+    const { execa } = await import('execa');
+
+    const result = await classifyFrames('OUTPUT', []);
+
+    expect(result.size).toBe(0);
+    expect(execa).not.toHaveBeenCalled();
+  });
+
+  it('should keep partial results when the process dies mid-request', async () => {
+    const { execa } = await import('execa');
+    const fake = createFakeServer(request => [
+      { id: request.id, result: { path: 'OUTPUT/Video/1/still_0001.jpg', label: 'exclude', confidence: 0.8 } }
+    ]);
+    vi.mocked(execa).mockReturnValue(fake as any);
+
+    const pending = classifyPaths(['OUTPUT/Video/1/still_0001.jpg', 'OUTPUT/Video/1/still_0002.jpg']);
+    await new Promise(resolve => setTimeout(resolve, 10));
+    fake.crash(137);
+
+    const result = await pending;
+    expect(result.size).toBe(1);
+    expect(result.get('OUTPUT/Video/1/still_0001.jpg')?.label).toBe('exclude');
+  });
+
+  it('should send dedupe clusters with their pHashes and receive results for every member', async () => {
+    const { execa } = await import('execa');
+    const requests: Parameters<Responder>[0][] = [];
+    vi.mocked(execa).mockImplementation((() => createFakeServer(request => {
+      requests.push(request);
+      const clusters = request.clusters ?? [];
+      const members = clusters.flatMap(cluster => cluster.members);
+      return [
+        ...members.map(path => ({ id: request.id, result: { path, label: 'exclude', confidence: 0.7 } })),
+        { id: request.id, done: true, count: members.length }
+      ];
+    })) as any);
+
+    const frames = [
+      { id: 'frm_001', file: 'Video/1/still_0001.jpg', hash: '1'.repeat(64) },
+      { id: 'frm_002', file: 'Video/1/still_0002.jpg', hash: '0'.repeat(64) }
+    ] as Frame[];
+    const clusters: DedupeCluster[] = [{ canonicalFrameId: 'frm_001', members: ['frm_001', 'frm_002'], maxDistance: 2 }];
+
+    const result = await classifyFrames('OUTPUT', frames, clusters, 0.1);
+
+    expect(requests[0].paths).toBeUndefined();
+    expect(requests[0].clusters).toEqual([{
+      canonical: 'OUTPUT/Video/1/still_0001.jpg',
+      members: ['OUTPUT/Video/1/still_0001.jpg', 'OUTPUT/Video/1/still_0002.jpg'],
+      hashes: ['1'.repeat(64), '0'.repeat(64)]
+    }]);
+    expect(requests[0].spot_check).toBe(0.1);
+    expect(result.get('OUTPUT/Video/1/still_0002.jpg')?.label).toBe('exclude');
+  });
+});
+
+describe('clusterTargets', () => {
+  const frames = [
+    { id: 'frm_002', file: 'Video/1/still_0002.jpg', hash: 'hash_002' },
+    { id: 'frm_003', file: 'Video/1/still_0003.jpg', hash: 'hash_003' },
+    { id: 'frm_004', file: 'Video/1/still_0004.jpg', hash: 'hash_004' }
+  ] as Frame[];
+
+  it('should lead a cluster with its first remaining member when the canonical is not pending', () => {
+    const clusters: DedupeCluster[] = [
+      { canonicalFrameId: 'frm_001', members: ['frm_001', 'frm_002', 'frm_003'], maxDistance: 3 }
+    ];
+
+    expect(clusterTargets('OUTPUT', frames, clusters)).toEqual([
+      {
+        canonical: 'OUTPUT/Video/1/still_0002.jpg',
+        members: ['OUTPUT/Video/1/still_0002.jpg', 'OUTPUT/Video/1/still_0003.jpg'],
+        hashes: ['hash_002', 'hash_003']
+      },
+      {
+        canonical: 'OUTPUT/Video/1/still_0004.jpg',
+        members: ['OUTPUT/Video/1/still_0004.jpg'],
+        hashes: ['hash_004']
+      }
+    ]);
+  });
+
+  it('should skip clusters with no pending frames', () => {
+    const clusters: DedupeCluster[] = [{ canonicalFrameId: 'frm_009', members: ['frm_009'], maxDistance: 0 }];
+
+    expect(clusterTargets('OUTPUT', [], clusters)).toEqual([]);
+  });
+});
+
+describe('formatProgress', () => {
+  it('should include the rate and ETA', () => {
+    expect(formatProgress({ done: 320, total: 1200, rate: 45.24, eta: 19.4 }))
+      .toBe('320/1200 images (45.2 images/sec, ETA 19s)');
+  });
+
+  it('should omit the ETA before a rate is known', () => {
+    expect(formatProgress({ done: 0, total: 1200, rate: 0, eta: null })).toBe('0/1200 images (0.0 images/sec)');
+  });
+});
+
+describe('formatStats', () => {
+  it('should list classified, reused and blocklisted frames', () => {
+    expect(formatStats({ blocklisted: 2, reused: 30, classified: 12 }))
+      .toBe('12 classified, 30 reused, 2 blocklisted');
+  });
+
+  it('should include the cascade counts when present', () => {
+    expect(formatStats({ blocklisted: 0, reused: 0, classified: 12, cascade_decided: 5, cascade_embedded: 7 }))
+      .toBe('12 classified, 0 reused, 0 blocklisted, 5 decided by pHash cascade, 7 sent to CLIP');
+  });
+});